@@ -1,21 +1,122 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect, AutocompleteSelectMultiple
 
 # Register your models here.
-from .models import Author, Genre, Language, Book, BookInstance
+from .autocomplete import source_for
+from .models import Author, Genre, Language, Book, BookInstance, Hold
 
 # admin.site.register(Book)
 # admin.site.register(Author)
-admin.site.register(Genre)
-admin.site.register(Language)
 # admin.site.register(BookInstance)
 
+class PrefixAutocompleteMixin:
+    """Answer the admin's autocomplete requests with catalog.autocomplete's indexed prefix lookups."""
+
+    def get_search_results(self, request, queryset, search_term):
+        match = request.resolver_match
+        if match and match.url_name == 'autocomplete':
+            return source_for(self.model).filter(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
+
+# Genre and Language are searchable so that other admins can autocomplete them
+@admin.register(Genre, Language)
+class NameAdmin(PrefixAutocompleteMixin, admin.ModelAdmin):
+    search_fields = ['name']
+
+class LoadedAutocompleteMixin:
+    """Admin autocomplete widget labelling its selected options with objects already loaded.
+
+    The admin's widget queries the selected objects every time it renders:
+    once per row in an inline. The inlines below hand it the related objects
+    their queryset loaded (see InlineAutocompleteForm) instead.
+    """
+    loaded = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = {str(v) for v in value if str(v) not in self.choices.field.empty_values}
+        if self.loaded is None or selected != {str(obj.pk) for obj in self.loaded}:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required and not self.allow_multiple_selected:
+            options.append(self.create_option(name, '', '', False, 0))
+        for obj in self.loaded:
+            options.append(self.create_option(name, str(obj.pk), str(obj), True, len(options)))
+        return [(None, options, 0)]
+
+class LoadedAutocompleteSelect(LoadedAutocompleteMixin, AutocompleteSelect):
+    pass
+
+class LoadedAutocompleteSelectMultiple(LoadedAutocompleteMixin, AutocompleteSelectMultiple):
+    pass
+
+class InlineAutocompleteForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is None:
+            return
+        for name, field in self.fields.items():
+            widget = getattr(field.widget, 'widget', field.widget)
+            if not isinstance(widget, LoadedAutocompleteMixin):
+                continue
+            model_field = self.instance._meta.get_field(name)
+            if model_field.many_to_many:
+                # loaded by the inline's prefetch_related()
+                if name in getattr(self.instance, '_prefetched_objects_cache', {}):
+                    widget.loaded = list(getattr(self.instance, name).all())
+            elif model_field.is_cached(self.instance):
+                related = getattr(self.instance, name)
+                widget.loaded = [related] if related is not None else []
+
+class SharedChoicesMixin:
+    """Query the options of an inline's select boxes once per request.
+
+    Every form of an inline formset deep-copies its fields, so each row would
+    otherwise query the choices of every ForeignKey and ManyToManyField again:
+    N queries for an N-row inline. The form class is built per request, so the
+    choices read on the first row are reused by the others. Fields listed in
+    autocomplete_fields get the Loaded widgets above instead.
+    """
+    form = InlineAutocompleteForm
+
+    def share_choices(self, formfield):
+        if formfield is None:
+            return formfield
+        iterator, loaded = formfield.choices, []
+
+        def choices():
+            # the parent's foreign key is never rendered, so stay lazy until used
+            if not loaded:
+                loaded.append(list(iter(iterator)))
+            return loaded[0]
+
+        formfield.choices = choices
+        return formfield
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs['widget'] = LoadedAutocompleteSelect(db_field, self.admin_site, using=kwargs.get('using'))
+            return super().formfield_for_foreignkey(db_field, request, **kwargs)
+        return self.share_choices(super().formfield_for_foreignkey(db_field, request, **kwargs))
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs['widget'] = LoadedAutocompleteSelectMultiple(db_field, self.admin_site, using=kwargs.get('using'))
+            return super().formfield_for_manytomany(db_field, request, **kwargs)
+        return self.share_choices(super().formfield_for_manytomany(db_field, request, **kwargs))
+
 # define format of inline book insertion (used in AuthorAdmin)
-class BookInline(admin.TabularInline):
+class BookInline(SharedChoicesMixin, admin.TabularInline):
     model = Book
     extra = 0
+    autocomplete_fields = ['genre', 'language']
+
+    def get_queryset(self, request):
+        # label each row's selected genres and language
+        return super().get_queryset(request).select_related('language').prefetch_related('genre')
 
 # Define the admin class
-class AuthorAdmin(admin.ModelAdmin):
+class AuthorAdmin(PrefixAutocompleteMixin, admin.ModelAdmin):
     list_display = ('last_name', 'first_name', 'date_of_birth', 'date_of_death')
     fields  = ['first_name', 'last_name', ('date_of_birth', 'date_of_death')]
     search_fields = ['first_name', 'last_name']
@@ -25,24 +126,42 @@ class AuthorAdmin(admin.ModelAdmin):
 admin.site.register(Author, AuthorAdmin)
 
 # define  format of inline book instance insertion (used in BookAdmin)
-class BooksInstanceInline(admin.TabularInline):
+class BooksInstanceInline(SharedChoicesMixin, admin.TabularInline):
     model = BookInstance
     extra = 0
+    autocomplete_fields = ['borrower']
+
+    def get_queryset(self, request):
+        # label each row's selected borrower, and the row itself (str() names the book)
+        return super().get_queryset(request).select_related('borrower', 'book')
 
 # Register the Admin classes for Book using the decorator
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
     list_display = ('title', 'author', 'display_genre')
     list_filter = ('genre', 'language')
+    list_select_related = ('author',)
     search_fields = ['title', 'author__first_name', 'author__last_name']
+    autocomplete_fields = ['author', 'genre', 'language']
     inlines = [BooksInstanceInline]
 
+    def get_queryset(self, request):
+        # display_genre reads the prefetched genres
+        return super().get_queryset(request).prefetch_related('genre')
+
 # Register the Admin classes for BookInstance using the decorator
 @admin.register(BookInstance)
 class BookInstanceAdmin(admin.ModelAdmin):
     list_display = ('book', 'status', 'borrower', 'due_back', 'id')
     list_filter = ('status', 'due_back')
+    list_select_related = ('book', 'borrower')
     search_fields = ['book__title']
+    autocomplete_fields = ['book', 'borrower']
+
+    def get_queryset(self, request):
+        # str() of a copy names its book, e.g. in the change page's title. The
+        # changelist ignores list_select_related once the queryset has one.
+        return super().get_queryset(request).select_related(*self.list_select_related)
 
     fieldsets = (
         (None, {
@@ -51,4 +170,13 @@ class BookInstanceAdmin(admin.ModelAdmin):
         ('Availability', {
             'fields': ('status', 'due_back', 'borrower')
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(Hold)
+class HoldAdmin(admin.ModelAdmin):
+    list_display = ('book', 'patron', 'status', 'created', 'copy')
+    list_filter = ('status',)
+    list_select_related = ('book', 'patron', 'copy__book')
+    search_fields = ['book__title', 'patron__username']
+    autocomplete_fields = ('book', 'patron')
+    raw_id_fields = ('copy',)
@@ -0,0 +1,272 @@
+"""Read-only JSON API for the catalog: books, authors, copies and loans.
+
+    GET /catalog/api/<resource>/                 a page of objects
+    GET /catalog/api/<resource>/<id>/            one object
+    GET /catalog/api/<resource>/batch/?ids=1,2   up to MAX_BATCH objects in one request
+
+?fields=title,author limits the fields returned (the id is always there).
+?include=author,genre adds the related objects under "included", by
+resource, and ?fields[authors]=last_name limits their fields. Pages are
+addressed by the opaque ?cursor= of the "next" and "previous" links, and hold
+?limit= objects (at most MAX_LIMIT).
+
+Objects are read with values(), never as model instances. A page costs one
+query, plus one per to-many field returned (genre ids, say) and one per
+include, however many objects it holds. Books, authors, copies, genres and
+languages are public; loans are the signed-in user's own, or everybody's for
+librarians.
+"""
+import functools
+
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.http import Http404, JsonResponse
+
+from .models import Author, Book, BookInstance, Genre, Language
+from .pagination import CursorPaginator, InvalidCursor
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_BATCH = 100
+
+class ApiError(Exception):
+    """A bad request; the message is returned with a 400."""
+
+class Many:
+    """A to-many relation: the ids of resource objects whose lookup points back at ours."""
+
+    def __init__(self, resource, lookup):
+        self.resource = resource
+        self.lookup = lookup
+
+    def related(self, request, pks):
+        return RESOURCES[self.resource].get_queryset(request).filter(**{f'{self.lookup}__in': pks})
+
+    def ids(self, request, pks):
+        """{pk: [related ids]} for the objects pks, in one query."""
+        ids = {pk: [] for pk in pks}
+        rows = self.related(request, pks).order_by('pk').values_list(self.lookup, 'pk')
+        for pk, related_pk in rows:
+            ids[pk].append(related_pk)
+        return ids
+
+class Resource:
+    """A model exposed through the API.
+
+    fields maps the API's field names to values() lookups. one names the
+    fields that hold the id of another resource's object, many the to-many
+    relations. Objects are listed in ordering, which must end with a unique
+    field.
+    """
+
+    def __init__(self, model, fields, default_fields=None, ordering=('id',), one=None, many=None):
+        self.model = model
+        self.fields = fields
+        self.one = one or {}
+        self.many = many or {}
+        self.default_fields = default_fields or tuple(fields)
+        self.ordering = ordering
+
+    def get_queryset(self, request):
+        return self.model.objects.all()
+
+    def requested_fields(self, value):
+        if not value:
+            return self.default_fields
+        fields = [name for name in value.split(',') if name]
+        unknown = [name for name in fields if name not in self.fields and name not in self.many]
+        if unknown:
+            raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+        return ('id', *(name for name in fields if name != 'id'))
+
+    def serialize(self, request, rows, fields):
+        """The objects of values() rows, with fields."""
+        objects = [
+            {name: row[self.fields[name]] for name in fields if name in self.fields}
+            for row in rows
+        ]
+        pks = [row['id'] for row in rows]
+        for name in fields:
+            if name in self.many:
+                ids = self.many[name].ids(request, pks)
+                for obj, pk in zip(objects, pks):
+                    obj[name] = ids[pk]
+        return objects
+
+    def lookups(self, fields, includes=()):
+        # the ordering fields, for the cursors, and the ids of to-one includes
+        names = (*fields, *(name for name in includes if name in self.one))
+        return {
+            *(self.fields[name] for name in names if name in self.fields),
+            *(name.lstrip('-') for name in self.ordering),
+        }
+
+    def fetch(self, request, queryset, fields, includes=()):
+        rows = list(queryset.order_by(*self.ordering).values(*self.lookups(fields, includes)))
+        return rows, self.serialize(request, rows, fields)
+
+class LoanResource(Resource):
+    """Copies on loan: the signed-in user's, or everybody's for librarians."""
+
+    def get_queryset(self, request):
+        if not request.user.is_authenticated:
+            raise PermissionDenied('Sign in to see loans.')
+        loans = BookInstance.objects.on_loan().with_overdue()
+        if not request.user.has_perm('catalog.can_mark_returned'):
+            loans = loans.filter(borrower=request.user)
+        return loans
+
+RESOURCES = {
+    'books': Resource(
+        Book,
+        {
+            'id': 'id',
+            'title': 'title',
+            'summary': 'summary',
+            'isbn': 'isbn',
+            'author': 'author_id',
+            'language': 'language_id',
+            'available': 'availability__available',
+            'total': 'availability__total',
+            'next_due': 'availability__next_due',
+        },
+        default_fields=('id', 'title', 'summary', 'isbn', 'author', 'language', 'genre', 'available', 'total'),
+        one={'author': 'authors', 'language': 'languages'},
+        many={'genre': Many('genres', 'book'), 'copies': Many('copies', 'book')},
+    ),
+    'authors': Resource(
+        Author,
+        {'id': 'id', 'first_name': 'first_name', 'last_name': 'last_name',
+         'date_of_birth': 'date_of_birth', 'date_of_death': 'date_of_death'},
+        ordering=('last_name', 'first_name', 'id'),
+        many={'books': Many('books', 'author')},
+    ),
+    'copies': Resource(
+        BookInstance,
+        {'id': 'id', 'book': 'book_id', 'imprint': 'imprint', 'status': 'status', 'due_back': 'due_back'},
+        one={'book': 'books'},
+    ),
+    'loans': LoanResource(
+        BookInstance,
+        {'id': 'id', 'book': 'book_id', 'title': 'book__title', 'due_back': 'due_back',
+         'borrower': 'borrower__username', 'overdue': 'overdue'},
+        ordering=('due_back', 'id'),
+        one={'book': 'books'},
+    ),
+    'genres': Resource(Genre, {'id': 'id', 'name': 'name'}, ordering=('name', 'id')),
+    'languages': Resource(Language, {'id': 'id', 'name': 'name'}, ordering=('name', 'id')),
+}
+
+def get_resource(name):
+    try:
+        return RESOURCES[name]
+    except KeyError:
+        raise Http404(f'Unknown resource {name!r}')
+
+def requested_includes(resource, params):
+    includes = [name for name in params.get('include', '').split(',') if name]
+    unknown = [name for name in includes if name not in resource.one and name not in resource.many]
+    if unknown:
+        raise ApiError(f"Can't include: {', '.join(unknown)}")
+    return includes
+
+def included(request, resource, rows, includes):
+    """{resource name: [objects]} of the includes of rows, a query each (and their to-many fields)."""
+    result = {}
+    for name in includes:
+        if name in resource.one:
+            related_name = resource.one[name]
+            ids = {row[resource.fields[name]] for row in rows} - {None}
+            queryset = RESOURCES[related_name].get_queryset(request).filter(pk__in=ids)
+        else:
+            related_name = resource.many[name].resource
+            queryset = resource.many[name].related(request, [row['id'] for row in rows]).distinct()
+        related = RESOURCES[related_name]
+        fields = related.requested_fields(request.GET.get(f'fields[{related_name}]'))
+        _, objects = related.fetch(request, queryset, fields)
+        known = {obj['id'] for obj in result.get(related_name, [])}
+        result.setdefault(related_name, []).extend(obj for obj in objects if obj['id'] not in known)
+    return result
+
+def requested(resource, request):
+    includes = requested_includes(resource, request.GET)
+    fields = resource.requested_fields(request.GET.get('fields'))
+    # an include is linked from the objects by its field
+    fields = (*fields, *(name for name in includes if name not in fields))
+    return fields, includes
+
+def parse_id(resource, value):
+    try:
+        return resource.model._meta.pk.to_python(value)
+    except ValidationError:
+        raise ApiError(f'{value!r} is not an id')
+
+def parse_ids(resource, value):
+    return [parse_id(resource, pk) for pk in value.split(',') if pk]
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return f'{request.path}?{query.urlencode()}'
+
+def list_objects(request, name):
+    resource = get_resource(name)
+    fields, includes = requested(resource, request)
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('limit must be an integer')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(f'limit must be between 1 and {MAX_LIMIT}')
+    queryset = resource.get_queryset(request).values(*resource.lookups(fields, includes))
+    try:
+        page = CursorPaginator(queryset, limit, resource.ordering).page(request.GET.get('cursor'))
+    except InvalidCursor as e:
+        raise ApiError(str(e))
+    rows = page.object_list
+    return {
+        'data': resource.serialize(request, rows, fields),
+        'included': included(request, resource, rows, includes),
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    }
+
+def batch_objects(request, name):
+    resource = get_resource(name)
+    fields, includes = requested(resource, request)
+    ids = parse_ids(resource, request.GET.get('ids', ''))
+    if len(ids) > MAX_BATCH:
+        raise ApiError(f'At most {MAX_BATCH} ids at a time')
+    queryset = resource.get_queryset(request).filter(pk__in=ids)
+    rows, objects = resource.fetch(request, queryset, fields, includes)
+    found = {obj['id']: obj for obj in objects}
+    return {
+        # in the order asked for
+        'data': [found[pk] for pk in dict.fromkeys(ids) if pk in found],
+        'missing': [pk for pk in dict.fromkeys(ids) if pk not in found],
+        'included': included(request, resource, rows, includes),
+    }
+
+def get_object(request, name, pk):
+    resource = get_resource(name)
+    fields, includes = requested(resource, request)
+    queryset = resource.get_queryset(request).filter(pk=parse_id(resource, pk))
+    rows, objects = resource.fetch(request, queryset, fields, includes)
+    if not objects:
+        raise Http404(f'No {name} with id {pk}')
+    return {'data': objects[0], 'included': included(request, resource, rows, includes)}
+
+def json_api(function):
+    """Return function's result as JSON, and its errors as JSON with their status."""
+    @functools.wraps(function)
+    def view(request, *args, **kwargs):
+        try:
+            return JsonResponse(function(request, *args, **kwargs))
+        except ApiError as e:
+            return JsonResponse({'errors': {'__all__': [str(e)]}}, status=400)
+        except PermissionDenied as e:
+            return JsonResponse({'errors': {'__all__': [str(e) or 'Permission denied']}}, status=403)
+        except Http404 as e:
+            return JsonResponse({'errors': {'__all__': [str(e)]}}, status=404)
+    return view
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CatalogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'catalog'
+
+    def ready(self):
+        # Connect the signal handlers that maintain denormalized catalog data.
+        from . import signals  # noqa: F401
+        # Time every connection's queries for the request metrics, from the first one on.
+        import locallibrary.middleware  # noqa: F401
@@ -0,0 +1,179 @@
+"""Self-hosted Bootstrap and Font Awesome, bundled with the catalog's own files.
+
+VENDOR lists the third-party files, pinned, that `manage.py vendor_assets`
+downloads into catalog/static/vendor/. BUNDLES lists the files built by
+concatenating (and, for the catalog's own files, minifying) static files.
+BundleFinder builds them, so collectstatic collects them like any other static
+file. The manifest storage then gives them hashed names, served with
+far-future immutable headers, and WhiteNoise compresses them (gzip, plus
+Brotli when the Brotli package is installed).
+
+Until the vendor files have been downloaded the bundles hold only the
+catalog's own files, and the {% stylesheets %} and {% scripts %} tags (see
+catalog/templatetags/assets.py) link Bootstrap and Font Awesome from their
+CDNs.
+"""
+import functools
+import os
+import posixpath
+import re
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.files.storage import FileSystemStorage
+
+Vendored = namedtuple('Vendored', 'url integrity')
+
+BOOTSTRAP = 'https://cdn.jsdelivr.net/npm/bootstrap@5.0.0-beta1/dist'
+FONTAWESOME = 'https://cdn.jsdelivr.net/npm/@fortawesome/fontawesome-free@5.15.4'
+
+# static path: where it is downloaded from, and its Subresource Integrity hash
+# (None: not pinned yet, vendor_assets prints the hash to pin; the CDN links
+# must be pinned)
+VENDOR = {
+    'vendor/bootstrap/bootstrap.min.css': Vendored(
+        f'{BOOTSTRAP}/css/bootstrap.min.css',
+        'sha384-giJF6kkoqNQ00vy+HMDP7azOuL0xtbfIcaT9wjKHr8RbDVddVHyTfAAsrekwKmP1',
+    ),
+    'vendor/bootstrap/bootstrap.bundle.min.js': Vendored(
+        f'{BOOTSTRAP}/js/bootstrap.bundle.min.js',
+        'sha384-ygbV9kiqUc6oa4msXn9868pTtWMgiQaeYH7/t7LECLbyPA2x65Kgf80OJFdroafW',
+    ),
+    'vendor/fontawesome/css/fontawesome.min.css': Vendored(
+        f'{FONTAWESOME}/css/fontawesome.min.css',
+        'sha384-jLKHWM3JRmfMU0A5x5AkjWkw/EYfGUAGagvnfryNV3F9VqM98XiIH7VBGVoxVSc7',
+    ),
+    # only solid ("fas") icons are used
+    'vendor/fontawesome/css/solid.min.css': Vendored(
+        f'{FONTAWESOME}/css/solid.min.css',
+        'sha384-Tv5i09RULyHKMwX0E8wJUqSOaXlyu3SQxORObAI08iUwIalMmN5L6AvlPX2LMoSE',
+    ),
+    **{
+        f'vendor/fontawesome/webfonts/fa-solid-900.{extension}': Vendored(
+            f'{FONTAWESOME}/webfonts/fa-solid-900.{extension}', integrity,
+        )
+        for extension, integrity in (
+            ('eot', 'sha384-Isn3HvL5LRQY0I7TT17jJcUfqgQcsL8q8wutwIfENC9HsJskVdpHjJiM8xalwzAw'),
+            ('svg', 'sha384-PqhE+beEMAcHtdZ03v2DSm3p71LFmT1QqT+dbtha3ZGioNmxAAmIHWLuLLTrdLvI'),
+            ('ttf', 'sha384-ugSKcSBNjwVs/fk4YJ7sAZP7jXPvqjTyo+1iZtOl/iakH0k5ADgM+LrEnYEk40Sl'),
+            ('woff', 'sha384-8yvOn0Nc6x628D4z+3k0d+jXkJreZ3x8Vobm9frG+jCSR4BUjh48xEIYTOLfR04k'),
+            ('woff2', 'sha384-J+Hec+Cl+N/SJPtXkxffygzO3i2HKS6radtcWe9DhOd+0yka4r/u4y+I4+g29xKn'),
+        )
+    },
+}
+
+# What the pages link to in place of the vendor files until they are downloaded.
+CDN_STYLESHEETS = (
+    VENDOR['vendor/bootstrap/bootstrap.min.css'],
+    VENDOR['vendor/fontawesome/css/fontawesome.min.css'],
+    VENDOR['vendor/fontawesome/css/solid.min.css'],
+)
+CDN_SCRIPTS = (VENDOR['vendor/bootstrap/bootstrap.bundle.min.js'],)
+
+# The icon font, discovered late (only once the stylesheet is parsed), so preloaded.
+PRELOAD_FONT = 'vendor/fontawesome/webfonts/fa-solid-900.woff2'
+
+# bundle: its sources, in order
+BUNDLES = {
+    'bundles/site.css': (
+        'vendor/bootstrap/bootstrap.min.css',
+        'vendor/fontawesome/css/fontawesome.min.css',
+        'vendor/fontawesome/css/solid.min.css',
+        'css/styles.css',
+    ),
+    'bundles/site.js': ('vendor/bootstrap/bootstrap.bundle.min.js',),
+    'bundles/list.js': ('js/handlePaginateByForm.js',),
+    'bundles/autocomplete.js': ('js/autocomplete.js',),
+}
+
+@functools.lru_cache()
+def vendored():
+    """Whether every vendor file has been downloaded (checked once per process)."""
+    return all(finders.find(path) for path in VENDOR)
+
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+CSS_STRING = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''')
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+SOURCE_MAP = re.compile(r'^\s*(?://|/\*)# sourceMappingURL=.*$', re.M)
+
+def minify_css(css):
+    """css without comments and the whitespace that doesn't separate anything.
+
+    Strings are left alone, and so is the space before ':' (which matters in
+    selectors such as "a :hover").
+    """
+    parts = CSS_STRING.split(CSS_COMMENT.sub('', css))
+    for i in range(0, len(parts), 2):
+        code = re.sub(r'\s+', ' ', parts[i])
+        parts[i] = re.sub(r'\s*([{};,>])\s*', r'\1', code).replace(';}', '}')
+    return ''.join(parts).strip()
+
+def minify_js(js):
+    """js without indentation, blank lines and whole-line // comments.
+
+    Line breaks are kept, so automatic semicolon insertion is unaffected. A
+    template literal must not span lines, its indentation would be lost.
+    """
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+def rebase_urls(css, source, bundle):
+    """css with its relative url()s pointing at the same files from bundle's directory."""
+    def rebase(match):
+        quote, url = match.groups()
+        if url.startswith(('/', '#', 'data:', 'http:', 'https:')):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(source), url))
+        return f'url({quote}{posixpath.relpath(target, posixpath.dirname(bundle))}{quote})'
+    return CSS_URL.sub(rebase, css)
+
+def build(bundle):
+    """The contents of bundle from the sources that exist."""
+    parts = []
+    for source in BUNDLES[bundle]:
+        path = finders.find(source)
+        if not path:
+            continue
+        with open(path, encoding='utf-8') as f:
+            content = SOURCE_MAP.sub('', f.read())
+        minified = '.min.' in source
+        if bundle.endswith('.css'):
+            content = rebase_urls(content if minified else minify_css(content), source, bundle)
+        elif not minified:
+            content = minify_js(content)
+        parts.append(content.strip())
+    separator = '\n' if bundle.endswith('.css') else ';\n'
+    return separator.join(parts) + '\n'
+
+class BundleFinder(finders.BaseFinder):
+    """Finds the BUNDLES, built into ASSET_BUILD_DIR from their current sources."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.storage = FileSystemStorage(location=settings.ASSET_BUILD_DIR)
+
+    def ensure_built(self, bundle):
+        # rewritten only when it changes, so its mtime tells collectstatic
+        # whether to copy it again
+        path = self.storage.path(bundle)
+        content = build(bundle)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                if f.read() == content:
+                    return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def find(self, path, all=False):
+        if path not in BUNDLES:
+            return []
+        path = self.ensure_built(path)
+        return [path] if all else path
+
+    def list(self, ignore_patterns):
+        for bundle in BUNDLES:
+            self.ensure_built(bundle)
+            yield bundle, self.storage
@@ -0,0 +1,149 @@
+"""Async variants of the catalog's read-only views, for ASGI deployments.
+
+The ORM is synchronous, so every query still runs in a thread, but the
+queries a page needs that don't depend on one another are started together
+and awaited with asyncio.gather(): the page waits for its slowest query
+instead of the sum of them, and the worker's event loop keeps serving other
+requests meanwhile. Querysets, context, templates and the page cache are
+those of the class-based views in catalog.views.
+
+catalog/urls.py routes here when settings.CATALOG_ASYNC_VIEWS is set, which
+locallibrary/asgi.py does by default.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage, Page
+from django.db import close_old_connections
+from django.http import Http404, HttpResponseNotAllowed
+from django.shortcuts import get_object_or_404, render
+
+from .models import CatalogStats
+from .views import AuthorDetailView, AuthorListView, BookDetailView, BookListView
+
+def in_thread(func, *args, **kwargs):
+    """Run func in a thread of its own, so that it gets its own database connection.
+
+    Its queries are still reported to the request's RequestMetricsMiddleware
+    timer (see locallibrary.middleware.time_sql).
+    """
+    def call():
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # the worker thread outlives the request; don't let it hold on to
+            # a connection longer than CONN_MAX_AGE allows
+            close_old_connections()
+    return sync_to_async(call, thread_sensitive=False)()
+
+def related_queryset(model, pk, lookup):
+    """The rows prefetch_related(lookup) would load for the object pk.
+
+    lookup is a relation name or a Prefetch over a reverse foreign key.
+    """
+    if isinstance(lookup, str):
+        return getattr(model(pk=pk), lookup).all()
+    field = getattr(model, lookup.prefetch_to).field
+    return lookup.queryset.filter(**{field.name: pk})
+
+def attach_prefetched(instance, lookup, objects):
+    """Store objects on instance as if prefetch_related(lookup) had loaded them."""
+    name = lookup if isinstance(lookup, str) else lookup.prefetch_to
+    queryset = getattr(instance, name).all()
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    # forward many-to-many and reverse foreign key managers both look their
+    # prefetched rows up under the accessor name
+    if not hasattr(instance, '_prefetched_objects_cache'):
+        instance._prefetched_objects_cache = {}
+    instance._prefetched_objects_cache[name] = queryset
+
+async def index(request):
+    """View function for home page of site."""
+    counts = await in_thread(CatalogStats.counts)
+    num_visits = request.preferences.get('num_visits', 0)
+    request.preferences['num_visits'] = num_visits + 1
+    context = {
+        **counts,
+        'num_visits': num_visits,
+    }
+    return await sync_to_async(render)(request, 'index.html', context=context)
+
+async def list_view(request, view_class, **kwargs):
+    """Serve a ListView, running its COUNT(*) and its page of rows concurrently."""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    view = view_class()
+    view.setup(request, **kwargs)
+    response = await sync_to_async(view.get_cached_response)()
+    if response is not None:
+        return response
+    if view.get_pagination_mode() != 'offset' or request.GET.get(view.page_kwarg) == 'last':
+        # keyset pages have no count to wait for, and the last page needs it first
+        return await sync_to_async(lambda: view.cache_response(view.get(request, **kwargs).render()))()
+
+    def prepare():
+        view.object_list = view.get_queryset()
+        per_page = view.get_paginate_by(view.object_list)
+        return view.object_list, view.get_paginator(view.object_list, per_page)
+    queryset, paginator = await sync_to_async(prepare)()
+
+    try:
+        number = int(request.GET.get(view.page_kwarg) or 1)
+    except ValueError:
+        raise Http404('Page is not “last”, nor can it be converted to an int.')
+    bottom = (number - 1) * paginator.per_page
+    count, rows = await asyncio.gather(
+        in_thread(queryset.count),
+        in_thread(list, queryset[max(bottom, 0):bottom + paginator.per_page]),
+    )
+    paginator.count = count
+    try:
+        page = Page(rows, paginator.validate_number(number), paginator)
+    except InvalidPage as e:
+        raise Http404(f'Invalid page ({number}): {e}')
+    # get_context_data() asks for the page it would otherwise fetch itself
+    view.paginate_queryset = lambda queryset, page_size: (paginator, page, page.object_list, page.has_other_pages())
+
+    def respond():
+        return view.cache_response(view.render_to_response(view.get_context_data()).render())
+    return await sync_to_async(respond)()
+
+async def detail_view(request, view_class, pk):
+    """Serve a DetailView, loading the object and each prefetched relation concurrently."""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    view = view_class()
+    view.setup(request, pk=pk)
+    response = await sync_to_async(view.get_cached_response)()
+    if response is not None:
+        return response
+
+    model = view.model
+    queryset = model.objects.all()
+    if view.select_related:
+        queryset = queryset.select_related(*view.select_related)
+    lookups = await sync_to_async(view.get_prefetch_related)()
+    obj, *related = await asyncio.gather(
+        in_thread(get_object_or_404, queryset, pk=pk),
+        *(in_thread(list, related_queryset(model, pk, lookup)) for lookup in lookups),
+    )
+    for lookup, objects in zip(lookups, related):
+        attach_prefetched(obj, lookup, objects)
+    view.object = obj
+
+    def respond():
+        return view.cache_response(view.render_to_response(view.get_context_data(object=obj)).render())
+    return await sync_to_async(respond)()
+
+async def book_list(request):
+    return await list_view(request, BookListView)
+
+async def author_list(request):
+    return await list_view(request, AuthorListView)
+
+async def book_detail(request, pk):
+    return await detail_view(request, BookDetailView, pk)
+
+async def author_detail(request, pk):
+    return await detail_view(request, AuthorDetailView, pk)
@@ -0,0 +1,57 @@
+"""Prefix lookups behind the autocomplete endpoint and widgets.
+
+A source matches the lower-cased prefix a visitor has typed against the start
+of one or more columns. The match is written as a range,
+LOWER(column) >= prefix AND LOWER(column) < next prefix, so it is answered
+from the LOWER() expression indexes added in migration 0011 rather than by
+scanning the table. The results come back in index order, a page at a time.
+"""
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .models import Author, Genre, Language
+
+# results per page when the request doesn't say, and at most
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+def prefix_range(prefix):
+    """The half-open range of strings that start with prefix."""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+class Source:
+    """Objects of model whose fields (in index order) start with a typed prefix."""
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+
+    def filter(self, queryset, prefix):
+        """queryset narrowed to the matches of prefix, in index order."""
+        queryset = queryset.annotate(**{f'{field}_lower': Lower(field) for field in self.fields})
+        prefix = prefix.strip().lower()
+        if prefix:
+            start, stop = prefix_range(prefix)
+            q = Q()
+            for field in self.fields:
+                # the range uses the index; startswith drops the odd string a
+                # non-C collation sorts into the range
+                q |= Q(**{f'{field}_lower__gte': start, f'{field}_lower__lt': stop,
+                          f'{field}_lower__startswith': prefix})
+            queryset = queryset.filter(q)
+        return queryset.order_by(*(f'{field}_lower' for field in self.fields), 'pk')
+
+    def search(self, prefix, offset=0, limit=DEFAULT_LIMIT):
+        """Return (objects, more): one page of matches and whether there are more."""
+        # one extra row tells whether there is another page
+        objects = list(self.filter(self.model.objects.all(), prefix)[offset:offset + limit + 1])
+        return objects[:limit], len(objects) > limit
+
+SOURCES = {
+    'authors': Source(Author, ('last_name', 'first_name')),
+    'genres': Source(Genre, ('name',)),
+    'languages': Source(Language, ('name',)),
+}
+
+def source_for(model):
+    return next(source for source in SOURCES.values() if source.model is model)
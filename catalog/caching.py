@@ -0,0 +1,61 @@
+"""Version stamps for the cached catalog pages and template fragments.
+
+A stamp is the time its subject last changed, kept in the cache under
+stamp_key(). Cached pages and fragments are keyed on the stamps they depend
+on, and the signal handlers in catalog.signals replace the stamps whenever a
+Book, Author, BookInstance, Genre or Language changes, so entries rendered
+from old data are never read again and simply expire. The newest stamp of a
+page doubles as its Last-Modified time.
+
+Stamps:
+    catalog          every page; touched after bulk writes that bypass signals
+    books            the book list (titles, authors, genre/language filters)
+    authors          the author list
+    vocabulary       genre and language names, shown on book pages
+    book:<pk>        one book's detail page, including its copies
+    author:<pk>      one author's detail page, including their books
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+CATALOG = 'catalog'
+BOOKS = 'books'
+AUTHORS = 'authors'
+VOCABULARY = 'vocabulary'
+
+def stamp_key(name, pk=None):
+    return f'catalog:stamp:{name}' if pk is None else f'catalog:stamp:{name}:{pk}'
+
+def get_stamps(keys):
+    """{key: stamp} for keys, starting a stamp now for keys that have none."""
+    stamps = cache.get_many(keys)
+    missing = [key for key in keys if key not in stamps]
+    if missing:
+        now = time.time()
+        for key in missing:
+            # add() keeps a stamp another process started in the meantime
+            cache.add(key, now, None)
+        stamps.update(cache.get_many(missing))
+    return stamps
+
+def digest(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+def touch(*keys):
+    """Give keys a new stamp, now and again once the transaction commits.
+
+    The second stamp covers pages rendered between the first one and the
+    commit, which still saw the old rows.
+    """
+    def stamp():
+        now = time.time()
+        cache.set_many({key: now for key in keys}, None)
+    stamp()
+    transaction.on_commit(stamp)
+
+def expire_all():
+    """Retire every cached page and fragment, e.g. after a bulk import."""
+    touch(stamp_key(CATALOG))
@@ -0,0 +1,22 @@
+from django.conf import settings
+
+def navigation(request):
+    """What the cached sidebar of base_generic.html is keyed on.
+
+    The sidebar's links depend only on whether the visitor is signed in and
+    whether they are staff, and the highlighted link only on the page
+    (request.resolver_match.url_name), so one rendering per role and page
+    serves everyone. The username and the ?next= links stay outside the
+    cached fragment.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        role = 'staff'
+    elif user is not None and user.is_authenticated:
+        role = 'member'
+    else:
+        role = 'anonymous'
+    return {
+        'navigation_role': role,
+        'navigation_cache_timeout': settings.NAVIGATION_CACHE_TIMEOUT,
+    }
@@ -0,0 +1,137 @@
+"""Multi-select facets of the book list, and their counts.
+
+A facet is a book list parameter that may be given several times
+(?genre_select=1&genre_select=4). The values of one facet are OR'ed and the
+facets are AND'ed. Books are narrowed with semi-joins
+(id IN (SELECT book_id ...)), never by joining the genre table, so a book in
+two chosen genres is listed once.
+
+Each facet's counts are taken with every other facet applied but not its own
+(so choosing "Fantasy" still shows how many books "Poetry" would add). The
+counts of all facets come from one query: one GROUP BY per facet, glued
+together with UNION ALL, each row carrying the value's label so nothing else
+is looked up. The book list caches the rendered page under the BOOKS stamp,
+which every change to books, copies or the genre and language names moves on.
+"""
+from django.db.models import Count, F, IntegerField, Q, Value
+from django.db.models.functions import Concat
+
+from .models import Book
+
+# the authors with the most books are offered, plus any already chosen
+AUTHOR_FACET_SIZE = 10
+
+class Facet:
+    """A foreign key (or many-to-many) of Book offered as a set of checkboxes."""
+
+    def __init__(self, param, title, field, label=None, lookup=None):
+        self.param = param
+        self.title = title
+        self.field = field
+        self.label = label
+        self.lookup = lookup or f'{field}__in'
+
+    def selected(self, params):
+        """The ids chosen in params (a QueryDict); anything else is ignored."""
+        return sorted({int(value) for value in params.getlist(self.param) if value.isdigit()})
+
+    def query_value(self, value):
+        """How value is written in the query string."""
+        return value
+
+    def filter(self, queryset, selected):
+        return queryset.filter(**{self.lookup: selected})
+
+    def counts(self, queryset, selected):
+        """A values() queryset of (facet, value, label, n) rows, one per value of the facet."""
+        return (
+            queryset
+            .annotate(facet=Value(self.param), value=F(self.field), label=self.label)
+            .values('facet', 'value', 'label')
+            .annotate(n=Count('pk', distinct=True))
+        )
+
+class GenreFacet(Facet):
+    def filter(self, queryset, selected):
+        through = Book.genre.through.objects.filter(genre__in=selected)
+        return queryset.filter(pk__in=through.values('book_id'))
+
+class AuthorFacet(Facet):
+    def counts(self, queryset, selected):
+        top = (
+            queryset.order_by().values('author')
+            .annotate(n=Count('pk')).order_by('-n', 'author_id')
+            .values('author')[:AUTHOR_FACET_SIZE]
+        )
+        return super().counts(queryset.filter(Q(author__in=top) | Q(author__in=selected)), selected)
+
+class AvailableFacet(Facet):
+    """A single checkbox: books with a copy on the shelf."""
+
+    def selected(self, params):
+        return [1] if params.get(self.param) else []
+
+    def query_value(self, value):
+        return 'on'
+
+    def filter(self, queryset, selected):
+        return queryset.filter(availability__available__gt=0)
+
+    def counts(self, queryset, selected):
+        return (
+            self.filter(queryset, selected)
+            .annotate(facet=Value(self.param), value=Value(1, output_field=IntegerField()), label=Value(self.title))
+            .values('facet', 'value', 'label')
+            .annotate(n=Count('pk', distinct=True))
+        )
+
+FACETS = (
+    GenreFacet('genre_select', 'Genre', 'genre', F('genre__name')),
+    Facet('language_select', 'Language', 'language', F('language__name')),
+    AuthorFacet('author_select', 'Author', 'author',
+                Concat('author__last_name', Value(', '), 'author__first_name')),
+    AvailableFacet('available', 'Available copies only', 'availability__available'),
+)
+
+def selected_facets(params):
+    """{param: [ids]} of the facets chosen in params."""
+    return {facet.param: facet.selected(params) for facet in FACETS}
+
+def apply_facets(queryset, selected, exclude=None):
+    """queryset narrowed to the chosen values of every facet but exclude."""
+    for facet in FACETS:
+        if facet.param != exclude and selected.get(facet.param):
+            queryset = facet.filter(queryset, selected[facet.param])
+    return queryset
+
+def facet_counts(queryset, selected):
+    """The facets for the sidebar, counted over queryset (the books before any facet).
+
+    Returns a list of {'param', 'title', 'options'} dicts, options being
+    {'value', 'query_value', 'label', 'count', 'selected'} dicts, the chosen
+    ones first and then those with the most books.
+    """
+    parts = [
+        facet.counts(apply_facets(queryset, selected, exclude=facet.param).order_by(), selected[facet.param])
+        for facet in FACETS
+    ]
+    facets = {facet.param: facet for facet in FACETS}
+    options = {facet.param: [] for facet in FACETS}
+    for row in parts[0].union(*parts[1:], all=True):
+        if row['value'] is None:
+            continue
+        options[row['facet']].append({
+            'value': row['value'],
+            'query_value': facets[row['facet']].query_value(row['value']),
+            'label': row['label'],
+            'count': row['n'],
+            'selected': row['value'] in selected[row['facet']],
+        })
+    return [
+        {
+            'param': facet.param,
+            'title': facet.title,
+            'options': sorted(options[facet.param], key=lambda option: (not option['selected'], -option['count'], option['label'])),
+        }
+        for facet in FACETS
+    ]
@@ -1,11 +1,23 @@
 import datetime
+import re
 
 from django import forms
 from django.contrib.auth import models
+from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.forms import fields
 from django.utils.translation import ugettext_lazy as _
 
+def validate_renewal_date(data):
+    """The due date rules shared by RenewBookForm and LoanBatchForm."""
+    # Check if date is not in the past.
+    if data < datetime.date.today():
+        raise ValidationError(_('Invalid date - renewal in past'))
+
+    # Check if a date is in the allowed range (+4 weeks from today).
+    if data > datetime.date.today() + datetime.timedelta(weeks=4):
+        raise ValidationError(_('Invalid date - renewal more than 4 weeks ahead'))
+
 class RenewBookForm(forms.Form):
     renewal_date = forms.DateField(help_text="Enter a date between now and 4 weeks (default 3).")
 
@@ -16,19 +28,62 @@ class RenewBookForm(forms.Form):
 
     def clean_renewal_date(self):
         data = self.cleaned_data['renewal_date']
+        validate_renewal_date(data)
 
-        # Check if date is not in the past.
-        if data < datetime.date.today():
-            raise ValidationError(_('Invalid date - renewal in past'))
+        # Remember to always return the cleaned data.
+        return data
 
-        # Check if a date is in the allowed range (+4 weeks from today).
-        if data > datetime.date.today() + datetime.timedelta(weeks=4):
-            raise ValidationError(_('Invalid date - renewal more than 4 weeks ahead'))
+class LoanBatchForm(forms.Form):
+    """Check out, return or renew a list of copies (see catalog.loans)."""
+    ACTIONS = (
+        ('checkout', 'Check out'),
+        ('return', 'Return'),
+        ('renew', 'Renew'),
+    )
 
-        # Remember to always return the cleaned data.
+    action = forms.ChoiceField(choices=ACTIONS, widget=forms.RadioSelect)
+    copies = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 10, 'autofocus': True, 'placeholder': 'Scan or paste copy ids, one per line'}),
+        help_text='Copy ids separated by new lines, spaces or commas.',
+    )
+    borrower = forms.CharField(max_length=150, required=False, help_text='Username; required to check out.')
+    due_back = forms.DateField(required=False, help_text='Required to check out or renew; between now and 4 weeks.')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, field in self.fields.items():
+            if name != 'action':
+                field.widget.attrs['class'] = 'form-control w-50'
+
+    def clean_copies(self):
+        return [token for token in re.split(r'[\s,]+', self.cleaned_data['copies']) if token]
+
+    def clean_borrower(self):
+        username = self.cleaned_data['borrower']
+        if not username:
+            return None
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise ValidationError(_('No user with that username'))
+
+    def clean_due_back(self):
+        data = self.cleaned_data['due_back']
+        if data is not None:
+            validate_renewal_date(data)
         return data
 
+    def clean(self):
+        cleaned_data = super().clean()
+        action = cleaned_data.get('action')
+        if action == 'checkout' and not cleaned_data.get('borrower') and 'borrower' not in self.errors:
+            self.add_error('borrower', _('Required to check out'))
+        if action in ('checkout', 'renew') and not cleaned_data.get('due_back') and 'due_back' not in self.errors:
+            self.add_error('due_back', _('Required to check out or renew'))
+        return cleaned_data
+
 from .models import Author, Book
+from .widgets import AutocompleteSelect, AutocompleteSelectMultiple
 
 class AuthorCreateForm(forms.ModelForm):
     class Meta:
@@ -45,6 +100,11 @@ class BookCreateForm(forms.ModelForm):
     class Meta:
         model = Book
         fields = ['title', 'author', 'summary', 'isbn', 'genre', 'language']
+        widgets = {
+            'author': AutocompleteSelect('authors'),
+            'genre': AutocompleteSelectMultiple('genres'),
+            'language': AutocompleteSelect('languages'),
+        }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -65,8 +125,6 @@ class PaginateByForm(forms.Form):
         widget=forms.widgets.Select(attrs={'class': 'form-select'},),
     )
 
-from .models import Genre, Language
-
 class BookFilterForm(forms.Form):
     book_title = forms.CharField(
         max_length=200,
@@ -86,15 +144,13 @@ class BookFilterForm(forms.Form):
         label='Last name',
         widget=forms.TextInput(attrs={'class': 'form-control'}),
     )
-    genre_select = forms.ModelChoiceField(
-        Genre.objects.all(),
-        required=False,
-        label='Genre',
-        widget=forms.Select(attrs={'class': 'form-select'}),
-    )
-    language_select = forms.ModelChoiceField(
-        Language.objects.all(),
+    sort = forms.ChoiceField(
+        choices=(
+            ('', 'Default'),
+            ('available', 'Most available first'),
+            ('due', 'Next due back first'),
+        ),
         required=False,
-        label='Language',
+        label='Sort',
         widget=forms.Select(attrs={'class': 'form-select'}),
     )
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""The hold queue: patrons waiting for a copy of a book, served in order.
+
+Every change to a book's queue happens with its Book row locked
+(SELECT ... FOR UPDATE), so placing a hold and returning a copy can't miss
+each other: whichever commits second sees the other's row and pairs them.
+Copies are picked with SKIP LOCKED, so allocation never waits on a copy that
+another transaction is checking out or returning. The Book lock is taken
+after any copy locks (the order BookAvailability.refresh() uses too), which
+keeps concurrent returns and holds free of deadlocks. On SQLite, which has no
+row locks, the database serializes the writers instead.
+
+catalog.signals calls copies_updated() whenever copies change status, so a
+returned copy goes to the next patron whichever way it was returned.
+"""
+import datetime
+
+from django.db import transaction
+
+from .models import Book, BookInstance, Hold
+
+# Days a patron has to collect a copy reserved for them.
+PICKUP_DAYS = 7
+
+def lock_book(book_id):
+    return Book.objects.select_for_update().filter(pk=book_id).values_list('pk', flat=True).first()
+
+def allocate(book_id, copies=()):
+    """Reserve the book's available copies for its oldest waiting holds.
+
+    copies are instances the caller holds of copies that just became
+    available; a copy reserved from among them is updated in place. Returns
+    the holds that became ready.
+    """
+    instances = {copy.pk: copy for copy in copies}
+    ready = []
+    with transaction.atomic():
+        if lock_book(book_id) is None:
+            return ready
+        waiting = Hold.objects.filter(book_id=book_id, status='w').select_related('patron').order_by('created', 'id')
+        available = BookInstance.objects.select_for_update(skip_locked=True).filter(book_id=book_id, status='a')
+        while True:
+            hold = waiting.first()
+            if hold is None:
+                break
+            copy = available.order_by('pk').first()
+            if copy is None:
+                break
+            copy = instances.get(copy.pk, copy)
+            copy.status = 'r'
+            copy.borrower = hold.patron
+            copy.due_back = datetime.date.today() + datetime.timedelta(days=PICKUP_DAYS)
+            copy.save(update_fields=['status', 'borrower', 'due_back'])
+            hold.status = 'r'
+            hold.copy = copy
+            hold.ready_on = datetime.date.today()
+            hold.save(update_fields=['status', 'copy', 'ready_on'])
+            ready.append(hold)
+    return ready
+
+def copies_updated(copies, previous_status):
+    """Follow up status changes of copies (previous_status maps pk -> old status).
+
+    A reserved copy that was checked out completes its hold (any other change
+    cancels it); a copy that became available is reserved for the next hold.
+    """
+    left_reserved = [copy for copy in copies if previous_status.get(copy.pk) == 'r' and copy.status != 'r']
+    if left_reserved:
+        collected = [copy.pk for copy in left_reserved if copy.status == 'o']
+        Hold.objects.filter(copy__in=collected, status='r').update(status='f')
+        Hold.objects.filter(copy__in=left_reserved, status='r').update(status='c')
+
+    released = {}
+    for copy in copies:
+        if copy.status == 'a' and previous_status.get(copy.pk) != 'a':
+            released.setdefault(copy.book_id, []).append(copy)
+    for book_id in sorted(pk for pk in released if pk is not None):
+        allocate(book_id, released[book_id])
+
+def place_hold(book, patron):
+    """Queue patron for book, or return their hold if they already have one.
+
+    The hold is ready at once if a copy is available.
+    """
+    with transaction.atomic():
+        lock_book(book.pk)
+        hold = Hold.objects.filter(book=book, patron=patron, status__in=('w', 'r')).first()
+        if hold is None:
+            hold = Hold.objects.create(book=book, patron=patron)
+            for ready in allocate(book.pk):
+                if ready.pk == hold.pk:
+                    return ready
+    return hold
+
+def cancel_hold(hold):
+    """Cancel hold; a copy reserved for it goes to the next patron in line."""
+    with transaction.atomic():
+        # the copy before the book, as everywhere else
+        if hold.copy_id:
+            list(BookInstance.objects.select_for_update().filter(pk=hold.copy_id).values_list('pk'))
+        lock_book(hold.book_id)
+        hold.refresh_from_db()
+        if not hold.is_active:
+            return hold
+        copy = hold.copy if hold.status == 'r' else None
+        hold.status = 'c'
+        hold.save(update_fields=['status'])
+        if copy is not None:
+            # saving it available passes it on (see copies_updated)
+            copy.status = 'a'
+            copy.borrower = None
+            copy.due_back = None
+            copy.save(update_fields=['status', 'borrower', 'due_back'])
+    return hold
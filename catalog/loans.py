@@ -0,0 +1,89 @@
+"""Check out, return and renew many copies at once (the librarian's loan desk).
+
+process_loans() locks the listed copies, validates each one and writes every
+valid change with a single bulk_update(). bulk_update() sends no post_save, so
+it announces the change with the copies_changed signal instead, whose
+receiver keeps CatalogStats, BookAvailability and the page cache in step.
+"""
+import uuid
+from collections import namedtuple
+
+from django.db import transaction
+
+from .models import BookInstance
+from .signals import copies_changed
+
+LoanResult = namedtuple('LoanResult', 'copy_id ok message copy')
+
+def checkout_copy(copy, borrower, due_back):
+    # a reserved copy can only go to the patron it is held for (see catalog.holds)
+    held_for_borrower = copy.status == 'r' and copy.borrower_id == borrower.pk
+    if copy.status != 'a' and not held_for_borrower:
+        return f'Not available ({copy.get_status_display()})'
+    copy.status = 'o'
+    copy.borrower = borrower
+    copy.due_back = due_back
+
+def return_copy(copy, borrower, due_back):
+    if copy.status != 'o':
+        return f'Not on loan ({copy.get_status_display()})'
+    copy.status = 'a'
+    copy.borrower = None
+    copy.due_back = None
+
+def renew_copy(copy, borrower, due_back):
+    if copy.status != 'o':
+        return f'Not on loan ({copy.get_status_display()})'
+    copy.due_back = due_back
+
+# action -> (function changing a copy, or returning why it can't, fields it changes)
+ACTIONS = {
+    'checkout': (checkout_copy, ['status', 'borrower', 'due_back']),
+    'return': (return_copy, ['status', 'borrower', 'due_back']),
+    'renew': (renew_copy, ['due_back']),
+}
+
+def process_loans(action, copy_ids, borrower=None, due_back=None):
+    """Apply action to the copies copy_ids in one transaction.
+
+    Returns a LoanResult per id, in the order given. Copies that fail are left
+    unchanged; the rest are saved. borrower and due_back are expected to be
+    validated already (see LoanBatchForm).
+    """
+    apply, fields = ACTIONS[action]
+    parsed = []
+    for copy_id in copy_ids:
+        try:
+            parsed.append((copy_id, uuid.UUID(str(copy_id))))
+        except ValueError:
+            parsed.append((copy_id, None))
+
+    with transaction.atomic():
+        # Locking the copies (in a fixed order, so that two batches can't
+        # deadlock) keeps a copy from being lent twice by concurrent requests.
+        copies = BookInstance.objects.select_for_update(of=('self',)).select_related('book').order_by('pk')
+        copies = {copy.pk: copy for copy in copies.filter(pk__in=[pk for _, pk in parsed if pk])}
+
+        results, changed, previous_status, seen = [], [], {}, set()
+        for copy_id, pk in parsed:
+            copy = copies.get(pk)
+            if copy is None:
+                results.append(LoanResult(copy_id, False, 'No such copy', None))
+                continue
+            if pk in seen:
+                results.append(LoanResult(copy_id, False, 'Listed twice', copy))
+                continue
+            seen.add(pk)
+            status = copy.status
+            error = apply(copy, borrower, due_back)
+            if error:
+                results.append(LoanResult(copy_id, False, error, copy))
+                continue
+            previous_status[pk] = status
+            changed.append(copy)
+            results.append(LoanResult(copy_id, True, 'OK', copy))
+
+        if changed:
+            BookInstance.objects.bulk_update(changed, fields)
+            copies_changed.send(sender=BookInstance, copies=changed, previous_status=previous_status)
+    return results
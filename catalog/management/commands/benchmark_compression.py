@@ -0,0 +1,77 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from locallibrary.compression import brotli, choose_encoding, compress
+
+from .benchmark_servers import READ_ROUTES
+from .benchmark_urls import Command as BenchmarkUrlsCommand, git_revision
+
+def cpu_ms(function, repeat):
+    """Mean CPU milliseconds of function() over repeat calls."""
+    start = time.process_time()
+    for _ in range(repeat):
+        function()
+    return round((time.process_time() - start) * 1000 / repeat, 3)
+
+class Command(BaseCommand):
+    help = (
+        'Request the catalog read pages in-process (lists 50 rows a page) and report, as JSON, '
+        'the bytes on the wire and the CPU time per request for each gzip level and Brotli '
+        'quality, and for whole requests through CompressionMiddleware with and without compression.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Repetitions of each measurement.')
+        parser.add_argument('--routes', nargs='*', default=READ_ROUTES, help='URL names to request.')
+        parser.add_argument('--gzip-levels', nargs='*', type=int, default=[1, 6, 9])
+        parser.add_argument('--brotli-qualities', nargs='*', type=int, default=[1, 5, 11])
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        codecs = [('gzip', level) for level in options['gzip_levels']]
+        if brotli is None:
+            self.stderr.write('Brotli is not installed; measuring gzip only.')
+        else:
+            codecs += [('br', quality) for quality in options['brotli_qualities']]
+        served = choose_encoding('br, gzip')
+        repeat = options['requests']
+
+        report = {
+            'revision': git_revision(),
+            'served_encoding': served,
+            'gzip_level': settings.COMPRESSION_GZIP_LEVEL,
+            'brotli_quality': settings.COMPRESSION_BROTLI_QUALITY,
+            'routes': {},
+        }
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            client = Client()
+            for name, url in BenchmarkUrlsCommand().routes(options['routes']).items():
+                params = {'paginate_by': 50} if name in ('books', 'authors') else {}
+                content = client.get(url, params).content
+                result = report['routes'][name] = {'url': url, 'identity_bytes': len(content), 'codecs': {}}
+                for encoding, level in codecs:
+                    size = len(compress(content, encoding, level))
+                    result['codecs'][f'{encoding}-{level}'] = {
+                        'bytes': size,
+                        'ratio': round(size / len(content), 3),
+                        'cpu_ms': cpu_ms(lambda: compress(content, encoding, level), repeat),
+                    }
+                # whole requests (served from the page cache, so mostly the compression differs)
+                result['request_cpu_ms'] = {
+                    'identity': cpu_ms(lambda: client.get(url, params, HTTP_ACCEPT_ENCODING='identity'), repeat),
+                    served: cpu_ms(lambda: client.get(url, params, HTTP_ACCEPT_ENCODING='br, gzip'), repeat),
+                }
+                response = client.get(url, params, HTTP_ACCEPT_ENCODING='br, gzip')
+                result['served_bytes'] = len(response.content)
+                self.stderr.write(f"{name}: {len(content)} -> {result['served_bytes']} bytes")
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
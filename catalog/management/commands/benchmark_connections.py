@@ -0,0 +1,93 @@
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from django.test import override_settings
+
+from locallibrary.db_connections import stats
+
+from .benchmark_servers import READ_ROUTES
+from .benchmark_urls import Command as BenchmarkUrlsCommand, git_revision, percentile
+
+class Command(BaseCommand):
+    help = (
+        'Measure request latency with a new database connection per request '
+        '(CONN_MAX_AGE=0) and with kept, health-checked connections, by requesting '
+        'the catalog read pages in-process from several threads. Report JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per route and mode.')
+        parser.add_argument('--max-age', type=int, default=600, help='CONN_MAX_AGE of the persistent mode.')
+        parser.add_argument('--routes', nargs='*', default=READ_ROUTES, help='URL names to request.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def run_mode(self, max_age, routes, options):
+        for alias in connections:
+            connections.databases[alias]['CONN_MAX_AGE'] = max_age
+        stats.reset()
+        local = threading.local()
+        counter = itertools.count()
+
+        def fetch(url):
+            if not hasattr(local, 'client'):
+                local.client = BenchmarkUrlsCommand().make_client(None)
+            start = time.perf_counter()
+            # The test client leaves connections alone; close_old_connections()
+            # before and after is what the WSGI handler does around a request.
+            close_old_connections()
+            response = local.client.get(url, {'nocache': next(counter)})
+            close_old_connections()
+            return (time.perf_counter() - start) * 1000, response.status_code
+
+        results = {}
+        # fresh threads, so no connection of the previous mode is reused
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for name, url in routes.items():
+                list(pool.map(fetch, [url] * options['workers']))
+                start = time.perf_counter()
+                samples = list(pool.map(fetch, [url] * options['requests']))
+                wall = time.perf_counter() - start
+                latencies = sorted(elapsed for elapsed, _ in samples)
+                results[name] = {
+                    'errors': sum(1 for _, status in samples if status >= 400),
+                    'p50_ms': round(percentile(latencies, 0.50), 3),
+                    'p95_ms': round(percentile(latencies, 0.95), 3),
+                    'throughput_rps': round(len(samples) / wall, 1),
+                }
+        return {
+            'connections_opened': sum(alias['opened'] for alias in stats.snapshot().values()),
+            'routes': results,
+        }
+
+    def handle(self, *args, **options):
+        routes = BenchmarkUrlsCommand().routes(options['routes'])
+        saved = {alias: connections.databases[alias].get('CONN_MAX_AGE', 0) for alias in connections}
+        report = {'revision': git_revision(), 'workers': options['workers'], 'modes': {}}
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                for mode, max_age in (('per_request', 0), ('persistent', options['max_age'])):
+                    report['modes'][mode] = self.run_mode(max_age, routes, options)
+                    self.stderr.write(f"{mode}: {report['modes'][mode]['connections_opened']} connections opened")
+        finally:
+            for alias, max_age in saved.items():
+                connections.databases[alias]['CONN_MAX_AGE'] = max_age
+
+        per_request, persistent = report['modes']['per_request']['routes'], report['modes']['persistent']['routes']
+        # p50 latency with kept connections relative to connecting per request
+        report['relative_p50'] = {
+            name: round(persistent[name]['p50_ms'] / per_request[name]['p50_ms'], 2)
+            for name in per_request if per_request[name]['p50_ms']
+        }
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,70 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog import search, synthetic
+from catalog.models import Book
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = (
+        'Measure book search latency against synthetic catalogs of the given sizes. '
+        'The data is inserted inside a transaction that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, nargs='+', default=[100000, 1000000])
+        parser.add_argument('--authors', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument(
+            '--queries', nargs='+',
+            default=['dragon', 'silver storm', 'tanaka', 'orch', '9780000000042'],
+        )
+
+    def handle(self, *args, **options):
+        results = []
+        for size in options['books']:
+            try:
+                with transaction.atomic():
+                    results.append(self.run_size(size, options))
+                    raise Rollback
+            except Rollback:
+                pass
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run_size(self, size, options):
+        self.stderr.write(f'Inserting {size} books...')
+        author_ids = synthetic.create_authors(min(options['authors'], size))
+        synthetic.create_books(size, author_ids)
+
+        backends = {
+            'default': search.get_search_backend(Book),
+            'icontains': search.IContainsSearchBackend(),
+        }
+        report = {'books': size, 'queries': {}}
+        for query in options['queries']:
+            report['queries'][query] = {
+                name: self.measure(backend, query, options) for name, backend in backends.items()
+            }
+        return report
+
+    def measure(self, backend, query, options):
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            queryset = backend.search_books(Book.objects.all(), query)
+            count = queryset.count()
+            list(queryset[:options['page_size']])
+            timings.append((time.perf_counter() - start) * 1000)
+        return {
+            'backend': type(backend).__name__,
+            'matches': count,
+            'median_ms': round(statistics.median(timings), 2),
+            'max_ms': round(max(timings), 2),
+        }
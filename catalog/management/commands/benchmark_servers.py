@@ -0,0 +1,109 @@
+import itertools
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from .benchmark_urls import Command as BenchmarkUrlsCommand, git_revision, percentile
+
+# The pages catalog.async_views serves.
+READ_ROUTES = ('index', 'books', 'authors', 'book-detail', 'author-detail')
+
+class Command(BaseCommand):
+    help = (
+        'Compare running servers (e.g. gunicorn sync workers against uvicorn workers, '
+        'see README) by requesting the catalog read pages over HTTP with a fixed '
+        'number of requests in flight, and report throughput and latency as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', required=True, metavar='NAME=URL',
+            help='A server to benchmark, e.g. wsgi=http://127.0.0.1:8000. Repeat for each server.',
+        )
+        parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight at any time.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per route and target.')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per route and target.')
+        parser.add_argument('--routes', nargs='*', default=READ_ROUTES, help='URL names to request.')
+        parser.add_argument(
+            '--use-page-cache', action='store_true',
+            help="Don't add a unique query parameter to each request, so cached pages are served.",
+        )
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def parse_targets(self, targets):
+        parsed = {}
+        for target in targets:
+            name, sep, url = target.partition('=')
+            if not sep or not url.startswith(('http://', 'https://')):
+                raise CommandError(f'--target must look like NAME=http://host:port, not {target!r}')
+            parsed[name] = url.rstrip('/')
+        return parsed
+
+    def handle(self, *args, **options):
+        targets = self.parse_targets(options['target'])
+        routes = BenchmarkUrlsCommand().routes(options['routes'])
+        counter = itertools.count()
+
+        def fetch(url):
+            if not options['use_page_cache']:
+                url += ('&' if '?' in url else '?') + f'nocache={next(counter)}'
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=options['timeout']) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except OSError:
+                status = 0
+            return (time.perf_counter() - start) * 1000, status
+
+        report = {
+            'revision': git_revision(),
+            'concurrency': options['concurrency'],
+            'page_cache': options['use_page_cache'],
+            'targets': {},
+        }
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for target, base_url in targets.items():
+                results = report['targets'][target] = {}
+                for name, path in routes.items():
+                    url = base_url + path
+                    list(pool.map(fetch, [url] * options['warmup']))
+                    start = time.perf_counter()
+                    samples = list(pool.map(fetch, [url] * options['requests']))
+                    wall = time.perf_counter() - start
+
+                    latencies = sorted(elapsed for elapsed, _ in samples)
+                    results[name] = {
+                        'url': url,
+                        'errors': sum(1 for _, status in samples if not 200 <= status < 400),
+                        'p50_ms': round(percentile(latencies, 0.50), 2),
+                        'p95_ms': round(percentile(latencies, 0.95), 2),
+                        'p99_ms': round(percentile(latencies, 0.99), 2),
+                        'throughput_rps': round(len(samples) / wall, 1),
+                    }
+                    self.stderr.write(f'{target} {name}: {results[name]["throughput_rps"]} req/s')
+
+        if len(targets) > 1:
+            # throughput of every target relative to the first one
+            baseline, *others = targets
+            report['relative_throughput'] = {
+                other: {
+                    name: round(result['throughput_rps'] / report['targets'][baseline][name]['throughput_rps'], 2)
+                    for name, result in report['targets'][other].items()
+                }
+                for other in others
+            }
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,148 @@
+import json
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import Permission, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from catalog import urls as catalog_urls
+from catalog.models import Author, Book, BookInstance
+
+BENCHMARK_USER = 'benchmark-librarian'
+
+# Values for the URL converters that aren't a row's pk, by converter name.
+SAMPLE_VALUES = {
+    'format': 'csv',
+    'source': 'authors',
+    # the API's pk is a book's, see sample_pk()
+    'resource': 'books',
+}
+
+# Routes that only accept POST: this command sends GETs, which they answer with a 405.
+POST_ONLY_ROUTES = {'book-hold', 'hold-cancel'}
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+def count_writes(queries):
+    return sum(1 for query in queries if query['sql'].lstrip().upper().startswith(WRITE_STATEMENTS))
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class Command(BaseCommand):
+    help = (
+        'Request every named route in catalog/urls.py from several worker threads '
+        'and report latency percentiles, throughput and query counts as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per route.')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per route and worker.')
+        parser.add_argument('--routes', nargs='*', help='Only these URL names.')
+        parser.add_argument('--anonymous', action='store_true', help="Don't log in (protected routes then just redirect).")
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def sample_pk(self, pattern, converter):
+        """An existing row's pk for pattern."""
+        if pattern.name.startswith('author'):
+            pk = Author.objects.values_list('pk', flat=True).order_by('pk').first()
+        elif type(converter).__name__ == 'UUIDConverter':
+            pk = BookInstance.objects.filter(status='o').values_list('pk', flat=True).first()
+        else:
+            pk = Book.objects.values_list('pk', flat=True).order_by('pk').first()
+        if pk is None:
+            raise CommandError(f'No rows to request {pattern.name} with; run seed_library first.')
+        return pk
+
+    def sample_kwargs(self, pattern):
+        """URL kwargs for pattern: existing rows' pks, SAMPLE_VALUES for the other converters."""
+        kwargs = {}
+        for name, converter in pattern.pattern.converters.items():
+            if name == 'pk':
+                kwargs[name] = self.sample_pk(pattern, converter)
+            elif name in SAMPLE_VALUES:
+                kwargs[name] = SAMPLE_VALUES[name]
+            else:
+                raise CommandError(f'No sample value for <{name}> in {pattern.name}; add one to SAMPLE_VALUES.')
+        return kwargs
+
+    def routes(self, only):
+        routes = {}
+        for pattern in catalog_urls.urlpatterns:
+            if not isinstance(pattern, URLPattern) or not pattern.name or pattern.name in POST_ONLY_ROUTES:
+                continue
+            if only and pattern.name not in only:
+                continue
+            routes[pattern.name] = reverse(pattern.name, kwargs=self.sample_kwargs(pattern))
+        return routes
+
+    def make_client(self, user):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        return client
+
+    def handle(self, *args, **options):
+        user = None
+        if not options['anonymous']:
+            user, _ = User.objects.get_or_create(username=BENCHMARK_USER, defaults={'is_staff': True})
+            user.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+
+        local = threading.local()
+
+        def fetch(url):
+            if not hasattr(local, 'client'):
+                local.client = self.make_client(user)
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = local.client.get(url)
+                elapsed = (time.perf_counter() - start) * 1000
+            return elapsed, len(queries), count_writes(queries.captured_queries), response.status_code
+
+        report = {'revision': git_revision(), 'workers': options['workers'], 'routes': {}}
+        with override_settings(ALLOWED_HOSTS=['testserver']), \
+                ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for name, url in self.routes(options['routes']).items():
+                list(pool.map(fetch, [url] * options['warmup'] * options['workers']))
+                start = time.perf_counter()
+                results = list(pool.map(fetch, [url] * options['requests']))
+                wall = time.perf_counter() - start
+
+                latencies = sorted(elapsed for elapsed, _, _, _ in results)
+                statuses = sorted({status for _, _, _, status in results})
+                report['routes'][name] = {
+                    'url': url,
+                    'requests': len(results),
+                    'status': statuses,
+                    'errors': sum(1 for _, _, _, status in results if status >= 400),
+                    'p50_ms': round(percentile(latencies, 0.50), 2),
+                    'p95_ms': round(percentile(latencies, 0.95), 2),
+                    'p99_ms': round(percentile(latencies, 0.99), 2),
+                    'throughput_rps': round(len(results) / wall, 1),
+                    'queries_mean': round(statistics.mean(q for _, q, _, _ in results), 1),
+                    'queries_max': max(q for _, q, _, _ in results),
+                    # INSERT/UPDATE/DELETE per request, e.g. session saves
+                    'writes_mean': round(statistics.mean(w for _, _, w, _ in results), 2),
+                }
+                self.stderr.write(f'{name}: p50 {report["routes"][name]["p50_ms"]} ms')
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,72 @@
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from catalog import views
+from catalog.models import Author, Book, BookInstance
+
+# Plan lines that mean a whole table is read (SQLite / PostgreSQL).
+SEQ_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)(?! USING| VIRTUAL)\s*$|Seq Scan on (\w+)')
+# Plan lines that mean the rows are sorted after being read.
+SORT = re.compile(r'USE TEMP B-TREE FOR ORDER BY|^\s*(?:->\s*)?Sort\b')
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN for the queries behind each catalog view and flag sequential scans "
+        "and sorts. Run it against realistically sized data (see seed_library): on tiny "
+        "tables the planner prefers full scans regardless of indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not just flagged ones.')
+        parser.add_argument('--strict', action='store_true', help='Exit with an error if anything is flagged.')
+
+    def view_queryset(self, view_class, params=None, **kwargs):
+        """The queryset view_class would paginate for a GET with params."""
+        request = RequestFactory().get('/', params or {})
+        request.user = User.objects.filter(bookinstance__status='o').first() or User(pk=0)
+        request.session = {}
+        view = view_class()
+        view.setup(request, **kwargs)
+        queryset = view.get_queryset()
+        return queryset[:view.paginate_by] if view.paginate_by else queryset
+
+    def querysets(self):
+        book_id = Book.objects.values_list('pk', flat=True).first() or 0
+        author_id = Author.objects.values_list('pk', flat=True).first() or 0
+        return {
+            'books': self.view_queryset(views.BookListView),
+            'books (search)': self.view_queryset(views.BookListView, {'search': 'dragon'}),
+            'books (filtered)': self.view_queryset(views.BookListView, {'book_title': 'dragon'}),
+            'book-detail (copies)': BookInstance.objects.filter(book_id=book_id),
+            'authors': self.view_queryset(views.AuthorListView),
+            'author-detail (books)': Book.objects.filter(author_id=author_id),
+            'my-borrowed': self.view_queryset(views.LoanedBooksByUserListView),
+            'all-borrowed': self.view_queryset(views.LoanedBooksAllListView),
+            'all-borrowed (overdue)': self.view_queryset(views.LoanedBooksAllListView, {'overdue': '1'}),
+            'all-borrowed (latest due)': self.view_queryset(views.LoanedBooksAllListView, {'sort': '-due'}),
+            'available copies': BookInstance.objects.filter(status__exact='a').values('pk'),
+        }
+
+    def handle(self, *args, **options):
+        flagged = 0
+        for label, queryset in self.querysets().items():
+            plan = queryset.explain()
+            problems = []
+            for line in plan.splitlines():
+                match = SEQ_SCAN.search(line)
+                if match:
+                    problems.append(f'sequential scan of {match.group(1) or match.group(2)}')
+                if SORT.search(line):
+                    problems.append('sort')
+            if problems:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f'{label}: {", ".join(problems)}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{label}: ok'))
+            if problems or options['verbose_plans']:
+                self.stdout.write('    ' + plan.replace('\n', '\n    '))
+        if flagged and options['strict']:
+            raise CommandError(f'{flagged} queries need attention')
@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.importexport import FORMATS, export_catalog, guess_format
+
+class Command(BaseCommand):
+    help = 'Stream the whole catalog (books with authors, genres and copies) to a CSV, JSON Lines or MARC-like file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Output file, or '-' for stdout (the default).")
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            if path == '-':
+                raise CommandError('--format is required when writing to stdout')
+            try:
+                fmt = guess_format(path)
+            except ValueError as e:
+                raise CommandError(e)
+        chunks = export_catalog(fmt, chunk_size=options['chunk_size'])
+        if path == '-':
+            for chunk in chunks:
+                sys.stdout.write(chunk)
+        else:
+            with open(path, 'w', newline='', encoding='utf-8') as stream:
+                for chunk in chunks:
+                    stream.write(chunk)
@@ -0,0 +1,28 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.importexport import FORMATS, guess_format, import_catalog
+
+class Command(BaseCommand):
+    help = 'Bulk import books, authors, genres, languages and copies from a CSV, JSON Lines or MARC-like file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin (requires --format).")
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            fmt = options['format'] or guess_format(path)
+        except ValueError as e:
+            raise CommandError(e)
+        if path == '-':
+            stats = import_catalog(sys.stdin, fmt, options['batch_size'])
+        else:
+            with open(path, newline='', encoding='utf-8') as stream:
+                stats = import_catalog(stream, fmt, options['batch_size'])
+        stats['books_per_second'] = round(stats['books'] / stats['seconds']) if stats['seconds'] else None
+        self.stdout.write(json.dumps(stats))
@@ -0,0 +1,90 @@
+import json
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from locallibrary.compression import decompress
+
+from .benchmark_urls import Command as BenchmarkUrlsCommand, git_revision
+
+PAGE_WEIGHT_ROUTES = ('index', 'books', 'book-detail')
+
+class AssetParser(HTMLParser):
+    """The URLs of the stylesheets, preloads, icons, scripts and images a page loads."""
+
+    LINK_RELS = {'stylesheet', 'preload', 'icon', 'shortcut icon'}
+
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'link' and attrs.get('rel') in self.LINK_RELS and attrs.get('href'):
+            self.urls.append(attrs['href'])
+        elif tag in ('script', 'img') and attrs.get('src'):
+            self.urls.append(attrs['src'])
+
+def body(response):
+    return b''.join(response.streaming_content) if response.streaming else response.content
+
+class Command(BaseCommand):
+    help = (
+        'Request pages in-process, as a first-time anonymous visitor, and report the bytes '
+        'transferred for each page and the static files it loads as JSON. Run collectstatic first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--routes', nargs='*', default=PAGE_WEIGHT_ROUTES, help='URL names to request.')
+        parser.add_argument('--accept-encoding', default='br, gzip', help='Accept-Encoding header to send.')
+        parser.add_argument('--budget', type=int, help='Fail if a page weighs more than this many KiB.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        headers = {'HTTP_ACCEPT_ENCODING': options['accept_encoding']}
+        report = {'revision': git_revision(), 'accept_encoding': options['accept_encoding'], 'pages': {}}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            client = Client()
+            for name, url in BenchmarkUrlsCommand().routes(options['routes']).items():
+                response = client.get(url, **headers)
+                if response.status_code != 200:
+                    raise CommandError(f'{name}: {url} answered {response.status_code}')
+                content = body(response)
+                parser = AssetParser()
+                parser.feed(decompress(content, response.get('Content-Encoding')).decode())
+                page = report['pages'][name] = {
+                    'url': url,
+                    'html_bytes': len(content),
+                    'html_encoding': response.get('Content-Encoding'),
+                    'assets': [],
+                    # not measured: served by somebody else
+                    'external': [],
+                }
+                for asset_url in parser.urls:
+                    if not asset_url.startswith(settings.STATIC_URL):
+                        page['external'].append(asset_url)
+                        continue
+                    asset = client.get(asset_url, **headers)
+                    if asset.status_code != 200:
+                        raise CommandError(f'{name}: {asset_url} answered {asset.status_code}')
+                    page['assets'].append({
+                        'url': asset_url,
+                        'bytes': len(body(asset)),
+                        'encoding': asset.get('Content-Encoding'),
+                        'cache_control': asset.get('Cache-Control'),
+                    })
+                page['total_bytes'] = page['html_bytes'] + sum(asset['bytes'] for asset in page['assets'])
+                self.stderr.write(f"{name}: {page['total_bytes']} bytes, {len(page['external'])} external")
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+        if options['budget'] is not None:
+            over = [name for name, page in report['pages'].items() if page['total_bytes'] > options['budget'] * 1024]
+            if over:
+                raise CommandError(f"Over the {options['budget']} KiB budget: {', '.join(over)}")
@@ -0,0 +1,63 @@
+import itertools
+import json
+
+from django.contrib.auth.models import Permission, User
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from locallibrary.template_profiling import profiles
+
+from .benchmark_servers import READ_ROUTES
+from .benchmark_urls import BENCHMARK_USER, Command as BenchmarkUrlsCommand, git_revision
+
+class Command(BaseCommand):
+    help = (
+        'Request catalog pages in-process with every request profiled and report the '
+        'mean render time per template and per tag as JSON (see locallibrary.template_profiling).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Requests per route.')
+        parser.add_argument('--routes', nargs='*', default=READ_ROUTES, help='URL names to request.')
+        parser.add_argument('--anonymous', action='store_true', help="Don't log in (the staff sidebar is then left out).")
+        parser.add_argument('--no-navigation-cache', action='store_true', help='Render the sidebar on every request.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        user = None
+        if not options['anonymous']:
+            user, _ = User.objects.get_or_create(username=BENCHMARK_USER, defaults={'is_staff': True})
+            user.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        benchmark = BenchmarkUrlsCommand()
+        client = benchmark.make_client(user)
+        # a new query string each time, so the page cache doesn't skip the render
+        counter = itertools.count()
+
+        report = {
+            'revision': git_revision(),
+            'navigation_cache': not options['no_navigation_cache'],
+            'routes': {},
+        }
+        overrides = {'ALLOWED_HOSTS': ['testserver'], 'TEMPLATE_PROFILING': 1}
+        if options['no_navigation_cache']:
+            overrides['NAVIGATION_CACHE_TIMEOUT'] = 0
+        with override_settings(**overrides):
+            for name, url in benchmark.routes(options['routes']).items():
+                profiles.reset()
+                for _ in range(options['requests']):
+                    client.get(url, {'nocache': next(counter)})
+                profile = profiles.snapshot().get(name, {'templates_ms': {}, 'tags_ms': {}})
+                report['routes'][name] = {
+                    'url': url,
+                    'render_ms': round(sum(profile['templates_ms'].values()), 3),
+                    'templates_ms': profile['templates_ms'],
+                    'tags_ms': profile['tags_ms'],
+                }
+                self.stderr.write(f"{name}: {report['routes'][name]['render_ms']} ms")
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from catalog.models import CatalogStats
+
+
+class Command(BaseCommand):
+    help = 'Recount the catalog tables and reset the cached home page counters.'
+
+    def handle(self, *args, **options):
+        stats = CatalogStats.reconcile()
+        for name, value in stats.as_dict().items():
+            self.stdout.write(f'{name}: {value}')
+        self.stdout.write(self.style.SUCCESS('Catalog stats reconciled.'))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog import synthetic
+from catalog.models import CatalogStats
+
+class Command(BaseCommand):
+    help = 'Fill the database with a synthetic library for load tests, using bulk inserts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=10000)
+        parser.add_argument('--books', type=int, default=1000000)
+        parser.add_argument('--instances', type=int, default=5000000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def step(self, label, func, *args, **kwargs):
+        start = time.perf_counter()
+        with transaction.atomic():
+            result = func(*args, **kwargs)
+        self.stdout.write(f'{label}: {time.perf_counter() - start:.1f}s')
+        return result
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        seed = options['seed']
+        genres = self.step('genres', synthetic.create_genres)
+        languages = self.step('languages', synthetic.create_languages)
+        user_ids = self.step(f'{options["users"]} users', synthetic.create_users, options['users'], batch_size)
+        author_ids = self.step(
+            f'{options["authors"]} authors', synthetic.create_authors,
+            options['authors'], batch_size=batch_size, seed=seed,
+        )
+        book_ids = self.step(
+            f'{options["books"]} books', synthetic.create_books,
+            options['books'], author_ids, languages=languages, genres=genres, batch_size=batch_size, seed=seed,
+        )
+        self.step(
+            f'{options["instances"]} copies', synthetic.create_book_instances,
+            options['instances'], book_ids, user_ids, batch_size=batch_size, seed=seed,
+        )
+        # bulk inserts bypass the signals that maintain the denormalized data
+        self.step('reconcile', CatalogStats.reconcile)
+        self.stdout.write(self.style.SUCCESS('Synthetic library created.'))
@@ -0,0 +1,85 @@
+import datetime
+import itertools
+
+from django.conf import settings
+from django.core import mail
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.template.loader import render_to_string
+
+from catalog.models import BookInstance
+
+
+class Command(BaseCommand):
+    help = (
+        'Email every borrower one reminder listing their overdue copies, through '
+        'EMAIL_BACKEND. Meant to run once a day from a scheduler (e.g. cron or the '
+        'Heroku Scheduler); a copy is not reminded about again within --interval days.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=7, help='Days before a copy is reminded about again.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows read from the database at a time.')
+        parser.add_argument('--date', type=datetime.date.fromisoformat, help='Treat this day (YYYY-MM-DD) as today.')
+        parser.add_argument('--dry-run', action='store_true', help="Count the reminders but don't send them.")
+
+    def loans(self, today, interval):
+        # Ordered by borrower so that each borrower's copies arrive together;
+        # iterator() streams the rows instead of loading every overdue loan.
+        due = Q(reminded_on__isnull=True) | Q(reminded_on__lte=today - datetime.timedelta(days=interval))
+        return (
+            BookInstance.objects.overdue(today).filter(due).exclude(borrower=None)
+            .select_related('book', 'borrower')
+            .only('id', 'due_back', 'book__title', 'borrower__username', 'borrower__email',
+                  'borrower__first_name', 'borrower__last_name')
+            .order_by('borrower', 'due_back', 'id')
+        )
+
+    def message(self, borrower, copies, today):
+        context = {'borrower': borrower, 'copies': copies, 'today': today}
+        return mail.EmailMessage(
+            subject=f'{len(copies)} overdue book{"" if len(copies) == 1 else "s"} at the Local Library',
+            body=render_to_string('catalog/email/overdue_reminder.txt', context),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[borrower.email],
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['interval'] < 0:
+            raise CommandError('--batch-size must be positive and --interval not negative.')
+        today = options['date'] or datetime.date.today()
+        rows = self.loans(today, options['interval']).iterator(chunk_size=options['batch_size'])
+        connection = None if options['dry_run'] else mail.get_connection()
+
+        sent = copies_reminded = no_email = 0
+        messages, reminded = [], []
+
+        def flush():
+            # One connection sends the whole batch, then the batch's copies are
+            # marked so that a rerun later in the day doesn't send them again.
+            if messages:
+                connection.send_messages(messages)
+                BookInstance.objects.filter(pk__in=reminded).update(reminded_on=today)
+            messages.clear()
+            reminded.clear()
+
+        for borrower, copies in itertools.groupby(rows, key=lambda copy: copy.borrower):
+            copies = list(copies)
+            if not borrower.email:
+                no_email += 1
+                continue
+            sent += 1
+            copies_reminded += len(copies)
+            if options['dry_run']:
+                continue
+            messages.append(self.message(borrower, copies, today))
+            reminded.extend(copy.pk for copy in copies)
+            if len(reminded) >= options['batch_size']:
+                flush()
+        if not options['dry_run']:
+            flush()
+
+        verb = 'Would send' if options['dry_run'] else 'Sent'
+        self.stdout.write(f'{verb} {sent} reminders about {copies_reminded} overdue copies.')
+        if no_email:
+            self.stdout.write(self.style.WARNING(f'Skipped {no_email} borrowers without an email address.'))
@@ -0,0 +1,44 @@
+import base64
+import hashlib
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.assets import VENDOR
+
+STATIC_DIR = Path(__file__).resolve().parents[2] / 'static'
+
+def integrity(content):
+    return 'sha384-' + base64.b64encode(hashlib.sha384(content).digest()).decode()
+
+class Command(BaseCommand):
+    help = (
+        'Download the pinned Bootstrap and Font Awesome files of catalog.assets.VENDOR into '
+        'catalog/static/vendor/, checking their integrity hashes. Run collectstatic afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Download the files already present again.')
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        for path, asset in VENDOR.items():
+            target = STATIC_DIR / path
+            if target.exists() and not options['force']:
+                continue
+            try:
+                with urllib.request.urlopen(asset.url, timeout=options['timeout']) as response:
+                    content = response.read()
+            except (urllib.error.URLError, OSError) as e:
+                raise CommandError(f'{asset.url}: {e}')
+            digest = integrity(content)
+            if asset.integrity is None:
+                self.stderr.write(f'{path} is not pinned; its integrity is {digest}')
+            elif digest != asset.integrity:
+                raise CommandError(f'{asset.url}: expected {asset.integrity}, got {digest}')
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(content)
+            self.stdout.write(f'{path}: {len(content)} bytes')
+        self.stdout.write(self.style.SUCCESS('Vendor assets in place; run collectstatic to bundle them.'))
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.6 on 2026-10-18 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_alter_bookinstance_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('num_books', models.IntegerField(default=0)),
+                ('num_instances', models.IntegerField(default=0)),
+                ('num_instances_available', models.IntegerField(default=0)),
+                ('num_authors', models.IntegerField(default=0)),
+                ('num_genres', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'catalog stats',
+            },
+        ),
+    ]
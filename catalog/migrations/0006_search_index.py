@@ -0,0 +1,180 @@
+from django.db import migrations
+
+# Full-text search tables used by catalog.search, maintained by triggers so that
+# every write path (ORM, bulk_create, raw SQL) keeps them in sync.
+# The search tables deliberately have no foreign keys (the delete triggers clean
+# them up) so that flushing/truncating the catalog tables keeps working.
+# NB: on SQLite, a migration that rebuilds catalog_book or catalog_author (e.g.
+# AlterField) drops their triggers; re-run SQLITE_FORWARDS' triggers afterwards.
+
+SQLITE_FORWARDS = [
+    "CREATE VIRTUAL TABLE catalog_book_fts USING fts5(title, author, summary, isbn)",
+    "CREATE VIRTUAL TABLE catalog_author_fts USING fts5(first_name, last_name)",
+    """
+    CREATE TRIGGER catalog_book_fts_insert AFTER INSERT ON catalog_book BEGIN
+        INSERT INTO catalog_book_fts(rowid, title, author, summary, isbn)
+        SELECT new.id, new.title,
+               (SELECT first_name || ' ' || last_name FROM catalog_author WHERE id = new.author_id),
+               new.summary, new.isbn;
+    END
+    """,
+    """
+    CREATE TRIGGER catalog_book_fts_update AFTER UPDATE ON catalog_book BEGIN
+        DELETE FROM catalog_book_fts WHERE rowid = old.id;
+        INSERT INTO catalog_book_fts(rowid, title, author, summary, isbn)
+        SELECT new.id, new.title,
+               (SELECT first_name || ' ' || last_name FROM catalog_author WHERE id = new.author_id),
+               new.summary, new.isbn;
+    END
+    """,
+    """
+    CREATE TRIGGER catalog_book_fts_delete AFTER DELETE ON catalog_book BEGIN
+        DELETE FROM catalog_book_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER catalog_author_fts_insert AFTER INSERT ON catalog_author BEGIN
+        INSERT INTO catalog_author_fts(rowid, first_name, last_name)
+        VALUES (new.id, new.first_name, new.last_name);
+    END
+    """,
+    """
+    CREATE TRIGGER catalog_author_fts_update AFTER UPDATE ON catalog_author BEGIN
+        DELETE FROM catalog_author_fts WHERE rowid = old.id;
+        INSERT INTO catalog_author_fts(rowid, first_name, last_name)
+        VALUES (new.id, new.first_name, new.last_name);
+        DELETE FROM catalog_book_fts WHERE rowid IN (SELECT id FROM catalog_book WHERE author_id = new.id);
+        INSERT INTO catalog_book_fts(rowid, title, author, summary, isbn)
+        SELECT id, title, new.first_name || ' ' || new.last_name, summary, isbn
+        FROM catalog_book WHERE author_id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER catalog_author_fts_delete AFTER DELETE ON catalog_author BEGIN
+        DELETE FROM catalog_author_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    INSERT INTO catalog_book_fts(rowid, title, author, summary, isbn)
+    SELECT b.id, b.title, a.first_name || ' ' || a.last_name, b.summary, b.isbn
+    FROM catalog_book b LEFT JOIN catalog_author a ON a.id = b.author_id
+    """,
+    """
+    INSERT INTO catalog_author_fts(rowid, first_name, last_name)
+    SELECT id, first_name, last_name FROM catalog_author
+    """,
+]
+
+SQLITE_BACKWARDS = [
+    "DROP TRIGGER IF EXISTS catalog_book_fts_insert",
+    "DROP TRIGGER IF EXISTS catalog_book_fts_update",
+    "DROP TRIGGER IF EXISTS catalog_book_fts_delete",
+    "DROP TRIGGER IF EXISTS catalog_author_fts_insert",
+    "DROP TRIGGER IF EXISTS catalog_author_fts_update",
+    "DROP TRIGGER IF EXISTS catalog_author_fts_delete",
+    "DROP TABLE IF EXISTS catalog_book_fts",
+    "DROP TABLE IF EXISTS catalog_author_fts",
+]
+
+POSTGRES_FORWARDS = [
+    """
+    CREATE TABLE catalog_book_search (
+        book_id bigint PRIMARY KEY,
+        document tsvector NOT NULL
+    )
+    """,
+    "CREATE INDEX catalog_book_search_document_gin ON catalog_book_search USING gin (document)",
+    """
+    CREATE TABLE catalog_author_search (
+        author_id bigint PRIMARY KEY,
+        document tsvector NOT NULL
+    )
+    """,
+    "CREATE INDEX catalog_author_search_document_gin ON catalog_author_search USING gin (document)",
+    """
+    CREATE FUNCTION catalog_book_document(book catalog_book) RETURNS tsvector AS $$
+        SELECT setweight(to_tsvector('english', coalesce(book.title, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(book.isbn, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(
+                   (SELECT first_name || ' ' || last_name FROM catalog_author WHERE id = book.author_id), '')), 'B')
+            || setweight(to_tsvector('english', coalesce(book.summary, '')), 'C')
+    $$ LANGUAGE sql STABLE
+    """,
+    """
+    CREATE FUNCTION catalog_book_search_sync() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            DELETE FROM catalog_book_search WHERE book_id = OLD.id;
+            RETURN NULL;
+        END IF;
+        INSERT INTO catalog_book_search (book_id, document)
+        VALUES (NEW.id, catalog_book_document(NEW))
+        ON CONFLICT (book_id) DO UPDATE SET document = EXCLUDED.document;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER catalog_book_search_sync AFTER INSERT OR UPDATE OR DELETE ON catalog_book
+    FOR EACH ROW EXECUTE PROCEDURE catalog_book_search_sync()
+    """,
+    """
+    CREATE FUNCTION catalog_author_search_sync() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            DELETE FROM catalog_author_search WHERE author_id = OLD.id;
+            RETURN NULL;
+        END IF;
+        INSERT INTO catalog_author_search (author_id, document)
+        VALUES (NEW.id, to_tsvector('simple', NEW.first_name || ' ' || NEW.last_name))
+        ON CONFLICT (author_id) DO UPDATE SET document = EXCLUDED.document;
+        IF TG_OP = 'UPDATE' THEN
+            UPDATE catalog_book_search s SET document = catalog_book_document(b)
+            FROM catalog_book b WHERE b.author_id = NEW.id AND s.book_id = b.id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER catalog_author_search_sync AFTER INSERT OR UPDATE OR DELETE ON catalog_author
+    FOR EACH ROW EXECUTE PROCEDURE catalog_author_search_sync()
+    """,
+    """
+    INSERT INTO catalog_book_search (book_id, document)
+    SELECT b.id, catalog_book_document(b) FROM catalog_book b
+    """,
+    """
+    INSERT INTO catalog_author_search (author_id, document)
+    SELECT id, to_tsvector('simple', first_name || ' ' || last_name) FROM catalog_author
+    """,
+]
+
+POSTGRES_BACKWARDS = [
+    "DROP TRIGGER IF EXISTS catalog_author_search_sync ON catalog_author",
+    "DROP TRIGGER IF EXISTS catalog_book_search_sync ON catalog_book",
+    "DROP FUNCTION IF EXISTS catalog_author_search_sync()",
+    "DROP FUNCTION IF EXISTS catalog_book_search_sync()",
+    "DROP TABLE IF EXISTS catalog_book_search",
+    "DROP TABLE IF EXISTS catalog_author_search",
+    "DROP FUNCTION IF EXISTS catalog_book_document(catalog_book)",
+]
+
+def run_statements(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_catalogstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_statements({'sqlite': SQLITE_FORWARDS, 'postgresql': POSTGRES_FORWARDS}),
+            run_statements({'sqlite': SQLITE_BACKWARDS, 'postgresql': POSTGRES_BACKWARDS}),
+        ),
+    ]
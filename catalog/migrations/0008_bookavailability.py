@@ -0,0 +1,51 @@
+# Generated by Django 3.2.6 on 2026-10-18 02:36
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Q
+import django.db.models.deletion
+
+
+def populate(apps, schema_editor):
+    """Summarize the copies of every existing book (see BookAvailability.rebuild)."""
+    Book = apps.get_model('catalog', 'Book')
+    BookAvailability = apps.get_model('catalog', 'BookAvailability')
+    statuses = {'a': 'available', 'o': 'on_loan', 'r': 'reserved', 'm': 'maintenance'}
+    rows = Book.objects.order_by().values('pk').annotate(
+        total=Count('bookinstance__pk'),
+        next_due=Min('bookinstance__due_back', filter=Q(bookinstance__status='o')),
+        **{name: Count('bookinstance__pk', filter=Q(bookinstance__status=status)) for status, name in statuses.items()},
+    )
+    BookAvailability.objects.bulk_create(
+        [BookAvailability(book_id=row.pop('pk'), **row) for row in rows.iterator()],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_loan_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookAvailability',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='availability', serialize=False, to='catalog.book')),
+                ('total', models.IntegerField(default=0)),
+                ('available', models.IntegerField(default=0)),
+                ('on_loan', models.IntegerField(default=0)),
+                ('reserved', models.IntegerField(default=0)),
+                ('maintenance', models.IntegerField(default=0)),
+                ('next_due', models.DateField(blank=True, help_text='Earliest due date of the copies on loan', null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'book availability',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='bookavailability',
+            index=models.Index(fields=['available'], name='bookavailability_avail_idx'),
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
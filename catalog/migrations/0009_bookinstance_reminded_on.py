@@ -0,0 +1,18 @@
+# Generated by Django 3.2.6 on 2026-10-18 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_bookavailability'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookinstance',
+            name='reminded_on',
+            field=models.DateField(blank=True, editable=False, help_text='When the borrower was last reminded that this copy is overdue', null=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.6 on 2026-10-18 02:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalog', '0009_bookinstance_reminded_on'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ready_on', models.DateField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('w', 'Waiting'), ('r', 'Ready for pickup'), ('f', 'Collected'), ('c', 'Cancelled')], default='w', max_length=1)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='catalog.book')),
+                ('copy', models.ForeignKey(blank=True, help_text='The copy reserved for the patron once the hold is ready', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='holds', to='catalog.bookinstance')),
+                ('patron', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='hold',
+            index=models.Index(fields=['book', 'status', 'created', 'id'], name='hold_queue_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='hold',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'r')), fields=('copy',), name='hold_one_ready_per_copy'),
+        ),
+        migrations.AddConstraint(
+            model_name='hold',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['w', 'r'])), fields=('book', 'patron'), name='hold_one_active_per_patron'),
+        ),
+    ]
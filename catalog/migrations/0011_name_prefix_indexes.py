@@ -0,0 +1,30 @@
+# Generated by Django 3.2.6 on 2026-10-18 03:03
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_hold'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(django.db.models.functions.text.Lower('last_name'), django.db.models.functions.text.Lower('first_name'), name='author_last_name_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(django.db.models.functions.text.Lower('first_name'), name='author_first_name_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='genre',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='genre_name_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='language',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='language_name_prefix_idx'),
+        ),
+    ]
@@ -0,0 +1,196 @@
+"""Reusable mixins for the catalog's class-based views."""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.http import Http404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.functional import cached_property
+from django.utils.http import http_date
+
+from locallibrary.routers import replica_may_lag
+
+from .caching import CATALOG, digest, get_stamps, stamp_key
+from .forms import PaginateByForm
+from .pagination import CursorPaginator, EstimatedCountPaginator, InvalidCursor
+
+class RelatedObjectsMixin:
+    """Declare the relations a view's template reads so they are loaded up front.
+
+    select_related and prefetch_related are passed to the QuerySet methods of
+    the same name, annotations to annotate(). Views that build their own
+    queryset wrap it with with_related(); otherwise get_queryset() does it.
+    """
+    select_related = ()
+    prefetch_related = ()
+    annotations = {}
+
+    def get_prefetch_related(self):
+        return self.prefetch_related
+
+    def with_related(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        prefetch_related = self.get_prefetch_related()
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+        return queryset
+
+    def get_queryset(self):
+        return self.with_related(super().get_queryset())
+
+class PageSizeMixin:
+    """ListView mixin letting visitors choose the page size with ?paginate_by=n.
+
+    The choice is remembered in request.preferences (see catalog.preferences)
+    and offered through PaginateByForm, whose choices are the only sizes allowed.
+    """
+    page_size_kwarg = 'paginate_by'
+
+    def get_paginate_by(self, queryset):
+        choices = {int(value) for value, _ in PaginateByForm.base_fields['paginate_by'].choices}
+        try:
+            page_size = int(self.request.GET.get(self.page_size_kwarg, ''))
+        except ValueError:
+            page_size = None
+        if page_size in choices:
+            self.request.preferences['paginate_by'] = page_size
+        return self.request.preferences.get('paginate_by', self.paginate_by)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['paginate_by_form'] = PaginateByForm(self.request.preferences)
+        return context
+
+class PaginationModeMixin:
+    """ListView mixin adding keyset and estimated-count pagination.
+
+    pagination_mode is one of 'offset' (Django's Paginator), 'cursor'
+    (CursorPaginator over cursor_ordering) or 'estimated'
+    (EstimatedCountPaginator); it defaults to settings.CATALOG_PAGINATION_MODE.
+    A request carrying a cursor parameter is always served in cursor mode.
+    """
+    pagination_mode = None
+    cursor_ordering = ('id',)
+    cursor_kwarg = 'cursor'
+
+    def get_pagination_mode(self):
+        if self.cursor_kwarg in self.request.GET:
+            return 'cursor'
+        return self.pagination_mode or getattr(settings, 'CATALOG_PAGINATION_MODE', 'offset')
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        if self.get_pagination_mode() == 'estimated':
+            return EstimatedCountPaginator(queryset, per_page, orphans=orphans,
+                                           allow_empty_first_page=allow_empty_first_page, **kwargs)
+        return super().get_paginator(queryset, per_page, orphans, allow_empty_first_page, **kwargs)
+
+    def paginate_queryset(self, queryset, page_size):
+        # Relevance-ordered search results have no stable key to seek on.
+        if self.get_pagination_mode() != 'cursor' or queryset.query.extra_order_by:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size, self.cursor_ordering)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+class CachedPageMixin:
+    """Cache anonymous GETs of a page and answer conditional requests with 304.
+
+    get_cache_stamps() names the version stamps (see catalog.caching) the page
+    is rendered from. Together with the URL and get_cache_variant() they make
+    up the page's cache key and ETag, so neither a cache hit nor a 304 needs a
+    database query. Signed-in users get pages rendered per request, but the
+    templates can cache fragments keyed on cache_version (see fragment_cached).
+    Their pages carry a private, weak ETag that also names the user, so a
+    revalidation is still answered with a 304 without rendering.
+    """
+    cache_stamps = ()
+
+    def get_cache_stamps(self):
+        return [stamp_key(CATALOG), *self.cache_stamps]
+
+    def get_cache_variant(self):
+        """Request state other than the URL that changes the page."""
+        if hasattr(self, 'get_paginate_by'):
+            # the page size is remembered in the session
+            return (self.get_paginate_by(None),)
+        return ()
+
+    @cached_property
+    def stamps(self):
+        return get_stamps(self.get_cache_stamps())
+
+    @cached_property
+    def cache_version(self):
+        return digest(sorted(self.stamps.items()))
+
+    def get_cache_timeout(self):
+        if replica_may_lag(max(self.stamps.values())):
+            # Read from a replica that may not have the latest change yet: keep
+            # it out of the cache, which is keyed on that change's stamp.
+            return 0
+        return getattr(settings, 'CATALOG_PAGE_CACHE_TIMEOUT', 300)
+
+    def fragment_cached(self, fragment_name, *vary_on):
+        """Whether {% cache ... fragment_name *vary_on cache_version %} would hit."""
+        return make_template_fragment_key(fragment_name, [*vary_on, self.cache_version]) in cache
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cache_version'] = self.cache_version
+        context['cache_timeout'] = self.get_cache_timeout()
+        return context
+
+    def get_cached_response(self):
+        """A 304 or the cached page for this request, or None if it must be rendered."""
+        request = self.request
+        self.page_cache_key = self.etag = None
+        if request.method not in ('GET', 'HEAD'):
+            return None
+
+        user = request.user
+        if user.is_authenticated:
+            key = digest(request.get_full_path(), self.get_cache_variant(), self.cache_version,
+                         user.pk, user.is_staff)
+            # weak: the CSRF token in the page differs on every rendering
+            self.etag = f'W/"{key}"'
+        else:
+            key = digest(request.get_full_path(), self.get_cache_variant(), self.cache_version)
+            self.etag = f'"{key}"'
+        self.last_modified = int(max(self.stamps.values()))
+        response = get_conditional_response(request, etag=self.etag, last_modified=self.last_modified)
+        if response is not None:
+            response['ETag'] = self.etag
+            return response
+        if user.is_authenticated:
+            return None
+        self.page_cache_key = f'catalog:page:{key}'
+        return cache.get(self.page_cache_key)
+
+    def cache_response(self, response):
+        """Add the validators to a freshly rendered page and cache it (unless it is a user's)."""
+        if self.etag is None or response.status_code != 200 or not self.get_cache_timeout():
+            return response
+        response['ETag'] = self.etag
+        response['Last-Modified'] = http_date(self.last_modified)
+        if self.page_cache_key is None:
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        # let browsers and proxies keep the page, but revalidate every use
+        patch_cache_control(response, no_cache=True)
+        key, timeout = self.page_cache_key, self.get_cache_timeout()
+        if hasattr(response, 'render') and not response.is_rendered:
+            response.add_post_render_callback(lambda r: cache.set(key, r, timeout))
+        else:
+            cache.set(key, response, timeout)
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        response = self.get_cached_response()
+        if response is None:
+            response = self.cache_response(super().dispatch(request, *args, **kwargs))
+        return response
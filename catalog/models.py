@@ -1,5 +1,6 @@
 from django.db import models
 from django.db.models.base import Model
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 from datetime import date
 
@@ -10,6 +11,12 @@ class Genre(models.Model):
     """Model representing a book genre."""
     name = models.CharField(max_length=200, help_text='Enter a book genre (e.g. Science Fiction')
 
+    class Meta:
+        indexes = [
+            # prefix lookups of catalog.autocomplete
+            models.Index(Lower('name'), name='genre_name_prefix_idx'),
+        ]
+
     def __str__(self):
         """String for representing the Model object."""
         return self.name
@@ -19,6 +26,11 @@ class Language(models.Model):
     """Model representing a Language (e.g. English, French, Japanese, etc.)"""
     name = models.CharField(max_length=200, help_text='Enter the book\'s natural language (e.g. English, French, Japanese, etc.')
 
+    class Meta:
+        indexes = [
+            models.Index(Lower('name'), name='language_name_prefix_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -42,6 +54,18 @@ class Book(models.Model):
 
     language = models.ForeignKey('Language', on_delete=models.SET_NULL, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['isbn'], name='book_isbn_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # lets signal handlers see the author a book had before it was saved
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def __str__(self):
         """String for representing the Model object."""
         return self.title
@@ -59,6 +83,23 @@ class Book(models.Model):
 # BookInstance model
 import uuid # Required for unique book instances
 
+class BookInstanceQuerySet(models.QuerySet):
+    """Loan queries evaluated by the database rather than per row in Python."""
+
+    def on_loan(self):
+        return self.filter(status__exact='o')
+
+    def overdue(self, today=None):
+        """Copies on loan whose due date has passed: a range scan of bookinstance_status_due_idx."""
+        return self.on_loan().filter(due_back__lt=today or date.today())
+
+    def with_overdue(self, today=None):
+        """Annotate each copy with overdue (the SQL counterpart of is_overdue)."""
+        return self.annotate(overdue=models.ExpressionWrapper(
+            models.Q(status='o', due_back__lt=today or date.today()),
+            output_field=models.BooleanField(),
+        ))
+
 class BookInstance(models.Model):
     """Model representing a specific copy of a book (i.e. that can be borrowed from the library)."""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, help_text='Unique ID for this particular book across whole library')
@@ -66,6 +107,9 @@ class BookInstance(models.Model):
     imprint = models.CharField(max_length=200)
     due_back = models.DateField(null=True, blank=True)
     borrower = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    reminded_on = models.DateField(null=True, blank=True, editable=False, help_text='When the borrower was last reminded that this copy is overdue')
+
+    objects = BookInstanceQuerySet.as_manager()
 
     LOAN_STATUS = (
         ('m', 'Maintenance'),
@@ -85,6 +129,22 @@ class BookInstance(models.Model):
     class Meta:
         ordering = ['due_back']
         permissions = (("can_mark_returned", "Set book as returned"),)
+        indexes = [
+            # all-borrowed (status='o' ordered by due_back, id breaks ties for keyset
+            # paging) and per-status counts. Not a partial index: SQLite can't match
+            # a partial index against the bound parameter in status = %s.
+            models.Index(fields=['status', 'due_back', 'id'], name='bookinstance_status_due_idx'),
+            # my-borrowed: borrower + status='o' ordered by due_back
+            models.Index(fields=['borrower', 'status', 'due_back'], name='bookinstance_borrower_loan_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember the values loaded from the database so that signal handlers
+        # can tell what changed on save (e.g. a copy becoming available)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
     def __str__(self):
         """String for representing the Model object."""
@@ -93,6 +153,9 @@ class BookInstance(models.Model):
     # a property that you can call from your templates to tell if a particular book instance is overdue
     @property
     def is_overdue(self):
+        # computed by the query when it came from with_overdue()
+        if 'overdue' in self.__dict__:
+            return self.overdue
         if self.due_back and date.today() > self.due_back:
             return True
         return False
@@ -107,6 +170,12 @@ class Author(models.Model):
 
     class Meta:
         ordering = ['last_name', 'first_name']
+        indexes = [
+            models.Index(fields=['last_name', 'first_name', 'id'], name='author_name_idx'),
+            # prefix lookups of catalog.autocomplete, on either name
+            models.Index(Lower('last_name'), Lower('first_name'), name='author_last_name_prefix_idx'),
+            models.Index(Lower('first_name'), name='author_first_name_prefix_idx'),
+        ]
 
     def get_absolute_url(self):
         """Returns the url to access a particular author instance."""
@@ -114,4 +183,237 @@ class Author(models.Model):
 
     def __str__(self):
         """String for representing the Model object."""
-        return f'{self.last_name}, {self.first_name}'
\ No newline at end of file
+        return f'{self.last_name}, {self.first_name}'
+
+# CatalogStats model
+from django.core.cache import cache
+from django.db import transaction
+
+from .caching import expire_all
+
+class CatalogStats(models.Model):
+    """Single-row table holding the record counts shown on the home page.
+
+    The counters are kept up to date by the signal handlers in catalog.signals,
+    so the index view never has to run COUNT(*) over the catalog tables.
+    Run the reconcile_catalog_stats management command to resync them after
+    writes that bypass signals (queryset.update(), bulk_create(), raw SQL).
+    """
+    CACHE_KEY = 'catalog:stats'
+    # Bounds staleness when every worker has its own (e.g. locmem) cache.
+    CACHE_TIMEOUT = 60
+
+    num_books = models.IntegerField(default=0)
+    num_instances = models.IntegerField(default=0)
+    num_instances_available = models.IntegerField(default=0)
+    num_authors = models.IntegerField(default=0)
+    num_genres = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'catalog stats'
+
+    def __str__(self):
+        return 'Catalog stats'
+
+    def as_dict(self):
+        return {
+            'num_books': self.num_books,
+            'num_instances': self.num_instances,
+            'num_instances_available': self.num_instances_available,
+            'num_authors': self.num_authors,
+            'num_genres': self.num_genres,
+        }
+
+    @classmethod
+    def counts(cls):
+        """Return the counters as a dict, from the cache when possible."""
+        counts = cache.get(cls.CACHE_KEY)
+        if counts is None:
+            stats = cls.objects.filter(pk=1).first()
+            if stats is None:
+                stats = cls.reconcile()
+            counts = stats.as_dict()
+            cache.set(cls.CACHE_KEY, counts, cls.CACHE_TIMEOUT)
+        return counts
+
+    @classmethod
+    def reconcile(cls):
+        """Recount every table and store the exact totals.
+
+        BookAvailability is rebuilt and cached pages are retired as well:
+        whatever made the counters drift also bypassed the signals that keep
+        those up to date.
+        """
+        stats, _ = cls.objects.update_or_create(pk=1, defaults={
+            'num_books': Book.objects.count(),
+            'num_instances': BookInstance.objects.count(),
+            'num_instances_available': BookInstance.objects.filter(status__exact='a').count(),
+            'num_authors': Author.objects.count(),
+            'num_genres': Genre.objects.count(),
+        })
+        BookAvailability.rebuild()
+        cache.delete(cls.CACHE_KEY)
+        expire_all()
+        return stats
+
+    @classmethod
+    def increment(cls, **deltas):
+        """Apply the given deltas (e.g. num_books=1) to the stored counters."""
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        cls.objects.filter(pk=1).update(**{
+            name: models.F(name) + delta for name, delta in deltas.items()
+        })
+        # Drop the cached copy now and again once the write is visible to
+        # other connections, so a concurrent reader can't re-cache old values.
+        cache.delete(cls.CACHE_KEY)
+        transaction.on_commit(lambda: cache.delete(cls.CACHE_KEY))
+
+# BookAvailability model
+from django.db.models import Count, Min, Q
+
+class BookAvailability(models.Model):
+    """How many copies of a book are in each status, and when the next loan is due.
+
+    One row per Book, kept in step with BookInstance by catalog.signals so that
+    list pages can show, filter and sort on availability without reading
+    BookInstance. refresh() recomputes the rows of given books, rebuild() every
+    row (CatalogStats.reconcile() calls it after writes that bypass signals).
+    """
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='availability')
+    total = models.IntegerField(default=0)
+    available = models.IntegerField(default=0)
+    on_loan = models.IntegerField(default=0)
+    reserved = models.IntegerField(default=0)
+    maintenance = models.IntegerField(default=0)
+    next_due = models.DateField(null=True, blank=True, help_text='Earliest due date of the copies on loan')
+
+    # BookInstance.status -> counter
+    STATUS_FIELDS = {'a': 'available', 'o': 'on_loan', 'r': 'reserved', 'm': 'maintenance'}
+
+    class Meta:
+        verbose_name_plural = 'book availability'
+        indexes = [
+            # "available books only" and "most available first" on the book list
+            models.Index(fields=['available'], name='bookavailability_avail_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.available} of {self.total} available'
+
+    @classmethod
+    def aggregates(cls, prefix=''):
+        """Aggregate expressions computing the fields over BookInstance rows at prefix."""
+        return {
+            'total': Count(prefix + 'pk'),
+            **{
+                name: Count(prefix + 'pk', filter=Q(**{prefix + 'status': status}))
+                for status, name in cls.STATUS_FIELDS.items()
+            },
+            'next_due': Min(prefix + 'due_back', filter=Q(**{prefix + 'status': 'o'})),
+        }
+
+    @classmethod
+    def refresh(cls, book_ids):
+        """Recompute the rows of the given books from their copies."""
+        book_ids = {pk for pk in book_ids if pk is not None}
+        if not book_ids:
+            return
+        with transaction.atomic():
+            # Locking the books serializes concurrent refreshes of the same book,
+            # so the last one to write has seen every committed copy.
+            book_ids = list(
+                Book.objects.select_for_update().filter(pk__in=book_ids).order_by('pk').values_list('pk', flat=True)
+            )
+            rows = {
+                row.pop('book'): row
+                for row in BookInstance.objects.filter(book__in=book_ids).order_by()
+                .values('book').annotate(**cls.aggregates())
+            }
+            for pk in book_ids:
+                cls.objects.update_or_create(book_id=pk, defaults=rows.get(pk, {
+                    'total': 0, 'available': 0, 'on_loan': 0, 'reserved': 0, 'maintenance': 0, 'next_due': None,
+                }))
+
+    @classmethod
+    def rebuild(cls, batch_size=5000):
+        """Recompute every row."""
+        with transaction.atomic():
+            cls.objects.all().delete()
+            rows = Book.objects.order_by().values('pk').annotate(**cls.aggregates('bookinstance__'))
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(cls(book_id=row.pop('pk'), **row))
+                if len(batch) == batch_size:
+                    cls.objects.bulk_create(batch)
+                    batch = []
+            cls.objects.bulk_create(batch)
+
+# Hold model
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+class HoldQuerySet(models.QuerySet):
+    def waiting_ahead(self, book_id, created, id):
+        """The holds waiting for book_id that were placed before the hold (created, id)."""
+        return self.filter(book_id=book_id, status='w').filter(Q(created__lt=created) | Q(created=created, id__lt=id))
+
+    def with_position(self):
+        """Annotate each hold with position, its place in the queue (see Hold.queue_position)."""
+        ahead = Hold.objects.waiting_ahead(OuterRef('book_id'), OuterRef('created'), OuterRef('id')).order_by().values('book').annotate(count=Count('pk')).values('count')
+        return self.annotate(ahead=Subquery(ahead, output_field=models.IntegerField()))
+
+class Hold(models.Model):
+    """A patron's place in the queue for a copy of a book.
+
+    Holds are served first come, first served by catalog.holds: when a copy
+    becomes available it is reserved for the oldest waiting hold, which then
+    turns 'ready' until the patron collects the copy or cancels.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='holds')
+    patron = models.ForeignKey(User, on_delete=models.CASCADE, related_name='holds')
+    copy = models.ForeignKey(BookInstance, on_delete=models.SET_NULL, null=True, blank=True, related_name='holds',
+                             help_text='The copy reserved for the patron once the hold is ready')
+    created = models.DateTimeField(default=timezone.now)
+    ready_on = models.DateField(null=True, blank=True)
+
+    HOLD_STATUS = (
+        ('w', 'Waiting'),
+        ('r', 'Ready for pickup'),
+        ('f', 'Collected'),
+        ('c', 'Cancelled'),
+    )
+
+    status = models.CharField(max_length=1, choices=HOLD_STATUS, default='w')
+
+    objects = HoldQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['created', 'id']
+        indexes = [
+            # the queue: a book's waiting holds, oldest first
+            models.Index(fields=['book', 'status', 'created', 'id'], name='hold_queue_idx'),
+        ]
+        constraints = [
+            # the database's own guard against giving one copy to two patrons
+            models.UniqueConstraint(fields=['copy'], condition=Q(status='r'), name='hold_one_ready_per_copy'),
+            models.UniqueConstraint(fields=['book', 'patron'], condition=Q(status__in=['w', 'r']),
+                                    name='hold_one_active_per_patron'),
+        ]
+
+    def __str__(self):
+        return f'{self.book} for {self.patron} ({self.get_status_display()})'
+
+    @property
+    def is_active(self):
+        return self.status in ('w', 'r')
+
+    def queue_position(self):
+        """1 for the next patron to be served; None once the hold has left the queue."""
+        if self.status != 'w':
+            return None
+        # counted by the query when it came from with_position()
+        if 'ahead' in self.__dict__:
+            return (self.ahead or 0) + 1
+        return Hold.objects.waiting_ahead(self.book_id, self.created, self.id).count() + 1
@@ -0,0 +1,220 @@
+"""Paginators for the catalog list views.
+
+* CursorPaginator: keyset ("seek") pagination. Pages are addressed by an opaque
+  cursor holding the ordering values of the last/first row shown, so fetching a
+  page costs an index range scan instead of COUNT(*) plus OFFSET n.
+* EstimatedCountPaginator: regular numbered pages whose total comes from the
+  query planner's row estimate on PostgreSQL instead of an exact COUNT(*).
+"""
+import json
+from collections import namedtuple
+from types import SimpleNamespace
+
+from django.core import signing
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.paginator import EmptyPage, InvalidPage, Page, Paginator
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+class InvalidCursor(InvalidPage):
+    pass
+
+# One ordering field of a CursorPaginator. lookup is the field's attname,
+# prefixed with the relations leading to it; nullable is whether the ordering
+# can meet NULLs (through a LEFT JOIN too).
+Key = namedtuple('Key', 'field lookup descending nullable')
+
+def nulls_last(ordering):
+    """order_by() expressions for ordering, sorting NULLs as CursorPaginator does."""
+    return [
+        F(name[1:]).desc(nulls_last=True) if name.startswith('-') else F(name).asc(nulls_last=True)
+        for name in ordering
+    ]
+
+class CursorPage:
+    """One page of a CursorPaginator; mirrors the parts of Page the templates use."""
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page of %s items>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+class CursorPaginator:
+    """Keyset paginator over queryset ordered by ordering.
+
+    ordering is a sequence of field names (prefix '-' for descending) that must
+    end with a unique field, e.g. ('last_name', 'first_name', 'id'). Names may
+    follow relations, e.g. 'availability__available'. NULLs sort after every
+    other value in the forward direction. queryset may also be a values()
+    queryset selecting the ordering fields by attname.
+    """
+    salt = 'catalog.pagination.cursor'
+
+    def __init__(self, queryset, per_page, ordering):
+        self.per_page = int(per_page)
+        self.keys = []
+        for name in ordering:
+            *relations, field_name = name.lstrip('-').split('__')
+            model = queryset.model
+            for relation in relations:
+                model = model._meta.get_field(relation).related_model
+            field = model._meta.get_field(field_name)
+            lookup = '__'.join([*relations, field.attname])
+            self.keys.append(Key(field, lookup, name.startswith('-'), field.null or bool(relations)))
+        self.queryset = queryset.order_by(*self._order_by(reverse=False))
+
+    def _order_by(self, reverse):
+        order_by = []
+        for key in self.keys:
+            expression = F(key.lookup)
+            if key.descending != reverse:
+                order_by.append(expression.desc(nulls_last=not reverse, nulls_first=reverse))
+            else:
+                order_by.append(expression.asc(nulls_last=not reverse, nulls_first=reverse))
+        return order_by
+
+    @staticmethod
+    def key_value(obj, key):
+        """The value of key for a row: a model instance, or a values() row holding key.lookup."""
+        if isinstance(obj, dict):
+            return obj[key.lookup]
+        for name in key.lookup.split('__'):
+            try:
+                obj = getattr(obj, name)
+            except ObjectDoesNotExist:
+                # a missing reverse one-to-one, which the LEFT JOIN saw as NULL
+                return None
+            if obj is None:
+                return None
+        return obj
+
+    def encode_cursor(self, obj, direction):
+        values = []
+        for key in self.keys:
+            value = self.key_value(obj, key)
+            if value is not None:
+                value = key.field.value_to_string(SimpleNamespace(**{key.field.attname: value}))
+            values.append(value)
+        return signing.dumps([direction, values], salt=self.salt, compress=True)
+
+    def decode_cursor(self, cursor):
+        try:
+            direction, values = signing.loads(cursor, salt=self.salt)
+            if direction not in ('n', 'p') or len(values) != len(self.keys):
+                raise ValueError
+            values = [None if value is None else key.field.to_python(value)
+                      for key, value in zip(self.keys, values)]
+        except (signing.BadSignature, TypeError, ValueError):
+            raise InvalidCursor('That cursor is not valid')
+        return direction, values
+
+    def _seek(self, values, forward):
+        """Q object selecting the rows after (forward) or before the given key values."""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for key, value in zip(self.keys, values):
+            name = key.lookup
+            lookup = '__lt' if key.descending == forward else '__gt'
+            if value is None:
+                # NULLs come last going forward: nothing follows a NULL,
+                # every non-NULL value precedes it.
+                if not forward:
+                    condition |= equal & Q(**{name + '__isnull': False})
+                equal &= Q(**{name + '__isnull': True})
+            else:
+                beyond = Q(**{name + lookup: value})
+                if forward and key.nullable:
+                    beyond |= Q(**{name + '__isnull': True})
+                condition |= equal & beyond
+                equal &= Q(**{name: value})
+        return condition
+
+    def page(self, cursor=None):
+        queryset = self.queryset
+        forward = True
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+            forward = direction == 'n'
+            queryset = queryset.filter(self._seek(values, forward))
+            if not forward:
+                queryset = queryset.order_by(*self._order_by(reverse=True))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or not forward:
+                next_cursor = self.encode_cursor(rows[-1], 'n')
+            if cursor and (forward or has_more):
+                previous_cursor = self.encode_cursor(rows[0], 'p')
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+def estimate_count(queryset):
+    """Planner row estimate for queryset, or None if the database can't give one."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    try:
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts the planner's estimate for large result sets.
+
+    Small results (below exact_threshold) are still counted exactly, because
+    estimates are least reliable there and COUNT(*) is cheap anyway.
+    """
+    exact_threshold = 10000
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list) if hasattr(self.object_list, 'query') else None
+        if estimate is None or estimate < self.exact_threshold:
+            return super().count
+        return estimate
+
+    def validate_number(self, number):
+        # The estimated total may be short of the real one, so don't refuse
+        # pages past it; an empty page simply ends the listing.
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return Page(self.object_list[bottom:bottom + self.per_page], number, self)
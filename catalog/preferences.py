@@ -0,0 +1,80 @@
+"""Visitor preferences kept in a signed cookie rather than in the session.
+
+The page size of the list views and the home page's visit counter used to
+live in the session, so under the database session engine every anonymous
+page view that touched them saved a django_session row. They now travel in
+a cookie signed with SECRET_KEY (tamper-proof, but readable by the visitor),
+which is only sent again when a value actually changes.
+"""
+import json
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import cached_property
+
+from locallibrary.middleware import SyncAndAsyncMiddleware
+
+COOKIE_NAME = 'catalog_prefs'
+COOKIE_SALT = 'catalog.preferences'
+COOKIE_MAX_AGE = 60 * 60 * 24 * 365
+
+class Preferences:
+    """The mapping behind request.preferences; loaded on first use."""
+
+    def __init__(self, request):
+        self.request = request
+        self.accessed = False
+        self.modified = False
+
+    @cached_property
+    def data(self):
+        self.accessed = True
+        value = self.request.get_signed_cookie(COOKIE_NAME, None, salt=COOKIE_SALT, max_age=COOKIE_MAX_AGE)
+        try:
+            data = json.loads(value) if value else {}
+        except ValueError:
+            data = {}
+        return data if isinstance(data, dict) else {}
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __setitem__(self, key, value):
+        # Only an actual change costs a Set-Cookie.
+        if key not in self.data or self.data[key] != value:
+            self.data[key] = value
+            self.modified = True
+
+    def encode(self):
+        return json.dumps(self.data, separators=(',', ':'))
+
+class PreferencesMiddleware(SyncAndAsyncMiddleware):
+    """Provide request.preferences and write the cookie back when it changed."""
+
+    def handle(self, request):
+        request.preferences = Preferences(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def ahandle(self, request):
+        request.preferences = Preferences(request)
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        preferences = request.preferences
+        if preferences.accessed:
+            patch_vary_headers(response, ('Cookie',))
+        if preferences.modified:
+            response.set_signed_cookie(
+                COOKIE_NAME, preferences.encode(), salt=COOKIE_SALT,
+                max_age=COOKIE_MAX_AGE,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,69 @@
+"""Streaming CSV and JSON exports of the loan lists.
+
+The rows are read with values_list() and iterator(), so no model instances
+are built and only chunk_size rows are held at a time; the response is a
+StreamingHttpResponse, so the first bytes go out as soon as the first chunk
+has been read, however many loans there are.
+"""
+import csv
+import datetime
+import io
+import json
+
+from django.http import StreamingHttpResponse
+
+from .importexport import chunked
+
+FORMATS = {'csv': 'text/csv', 'json': 'application/json'}
+
+# column -> lookup on the BookInstance queryset (overdue comes from with_overdue())
+LOAN_FIELDS = {
+    'copy': 'id',
+    'title': 'book__title',
+    'isbn': 'book__isbn',
+    'imprint': 'imprint',
+    'status': 'status',
+    'due_back': 'due_back',
+    'borrower': 'borrower__username',
+    'overdue': 'overdue',
+}
+
+def loan_rows(queryset, chunk_size=2000):
+    """Yield each loan in queryset as a tuple of LOAN_FIELDS values."""
+    if 'overdue' not in queryset.query.annotations:
+        queryset = queryset.with_overdue()
+    rows = queryset.values_list(*LOAN_FIELDS.values()).iterator(chunk_size=chunk_size)
+    for copy, title, isbn, imprint, status, due_back, borrower, overdue in rows:
+        yield (str(copy), title, isbn, imprint, status, due_back.isoformat() if due_back else None,
+               borrower or '', overdue)
+
+def write_csv(rows, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(LOAN_FIELDS)
+    yield buffer.getvalue()
+    for chunk in chunked(rows, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+
+def write_json(rows, chunk_size):
+    # one array, written a chunk of objects at a time
+    yield '['
+    separator = '\n'
+    for chunk in chunked(rows, chunk_size):
+        yield separator + ',\n'.join(
+            json.dumps(dict(zip(LOAN_FIELDS, row)), ensure_ascii=False) for row in chunk
+        )
+        separator = ',\n'
+    yield '\n]\n'
+
+WRITERS = {'csv': write_csv, 'json': write_json}
+
+def export_loans(queryset, fmt, filename, chunk_size=2000):
+    """A StreamingHttpResponse downloading the loans in queryset as fmt."""
+    chunks = WRITERS[fmt](loan_rows(queryset, chunk_size), chunk_size)
+    response = StreamingHttpResponse(chunks, content_type=f'{FORMATS[fmt]}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}-{datetime.date.today()}.{fmt}"'
+    return response
@@ -0,0 +1,137 @@
+"""Full-text search backends used by the book and author list views.
+
+The backend is chosen from settings.CATALOG_SEARCH_BACKEND (a dotted path) or,
+by default, from the database vendor:
+
+* PostgreSQL: ``tsvector`` documents in ``catalog_book_search`` and
+  ``catalog_author_search`` with GIN indexes, ranked with ``ts_rank``.
+* SQLite: FTS5 virtual tables ``catalog_book_fts`` and ``catalog_author_fts``,
+  ranked with ``bm25``.
+* anything else: ``icontains`` lookups without ranking.
+
+The search tables are created by migration 0006 and kept in sync by database
+triggers, so bulk_create() and raw SQL writes are indexed as well.
+"""
+import re
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Author, Book
+
+def tokenize(search):
+    """Split a search string into lower-case word tokens."""
+    return re.findall(r'\w+', search.lower())
+
+class IContainsSearchBackend:
+    """Portable fallback: substring matches, no relevance ordering."""
+
+    def search_books(self, queryset, search):
+        q = Q()
+        for token in tokenize(search):
+            q &= (
+                Q(title__icontains=token)
+                | Q(author__first_name__icontains=token)
+                | Q(author__last_name__icontains=token)
+                | Q(summary__icontains=token)
+                | Q(isbn__icontains=token)
+            )
+        return queryset.filter(q)
+
+    def search_authors(self, queryset, search):
+        q = Q()
+        for token in tokenize(search):
+            q &= Q(first_name__icontains=token) | Q(last_name__icontains=token)
+        return queryset.filter(q)
+
+class SQLiteSearchBackend:
+    """FTS5 prefix search ordered by bm25 (lower is more relevant)."""
+
+    # bm25() column weights, in each FTS table's column order. Books weigh title
+    # and ISBN (A), author (B) and summary (C) like the PostgreSQL documents,
+    # in the proportions ts_rank gives A, B and C (1.0, 0.4, 0.2).
+    column_weights = {
+        'catalog_book_fts': (10.0, 4.0, 2.0, 10.0),  # title, author, summary, isbn
+        'catalog_author_fts': (1.0, 1.0),  # first_name, last_name
+    }
+
+    def match_expression(self, search):
+        # Quote every token so FTS5 operators in user input are taken literally,
+        # and match it as a prefix so partial words still find results.
+        return ' '.join('"%s"*' % token.replace('"', '""') for token in tokenize(search))
+
+    def _search(self, queryset, search, fts_table):
+        match = self.match_expression(search)
+        if not match:
+            return queryset
+        table = queryset.model._meta.db_table
+        weights = ', '.join(str(weight) for weight in self.column_weights[fts_table])
+        # Join the FTS table so MATCH runs once and bm25() is read off the join.
+        return queryset.extra(
+            tables=[fts_table],
+            where=[f'{fts_table}.rowid = "{table}"."id"', f'{fts_table} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'bm25({fts_table}, {weights})'},
+            order_by=['search_rank', 'pk'],
+        )
+
+    def search_books(self, queryset, search):
+        return self._search(queryset, search, 'catalog_book_fts')
+
+    def search_authors(self, queryset, search):
+        return self._search(queryset, search, 'catalog_author_fts')
+
+class PostgresSearchBackend:
+    """tsvector/GIN prefix search ordered by ts_rank (higher is more relevant)."""
+
+    def tsquery(self, search):
+        return ' & '.join('%s:*' % token for token in tokenize(search))
+
+    def _search(self, queryset, search, search_table, key):
+        tsquery = self.tsquery(search)
+        if not tsquery:
+            return queryset
+        table = queryset.model._meta.db_table
+        # Titles and summaries are stemmed with the english configuration,
+        # names and ISBNs are not, so match against both forms of the query.
+        query = "(to_tsquery('english', %s) || to_tsquery('simple', %s))"
+        return queryset.extra(
+            tables=[search_table],
+            where=[f'{search_table}.{key} = "{table}"."id"', f'{search_table}.document @@ {query}'],
+            params=[tsquery, tsquery],
+            select={'search_rank': f'ts_rank({search_table}.document, {query})'},
+            select_params=[tsquery, tsquery],
+            order_by=['-search_rank', 'pk'],
+        )
+
+    def search_books(self, queryset, search):
+        return self._search(queryset, search, 'catalog_book_search', 'book_id')
+
+    def search_authors(self, queryset, search):
+        return self._search(queryset, search, 'catalog_author_search', 'author_id')
+
+VENDOR_BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+def get_search_backend(model=Book):
+    """Return the search backend for the database that serves reads of model."""
+    if getattr(settings, 'CATALOG_SEARCH_BACKEND', None):
+        return import_string(settings.CATALOG_SEARCH_BACKEND)()
+    vendor = connections[router.db_for_read(model)].vendor
+    return VENDOR_BACKENDS.get(vendor, IContainsSearchBackend)()
+
+def search_books(search, queryset=None):
+    """Books matching search (title, author, summary, ISBN) by relevance."""
+    if queryset is None:
+        queryset = Book.objects.all()
+    return get_search_backend(Book).search_books(queryset, search)
+
+def search_authors(search, queryset=None):
+    """Authors matching search (first or last name) by relevance."""
+    if queryset is None:
+        queryset = Author.objects.all()
+    return get_search_backend(Author).search_authors(queryset, search)
@@ -0,0 +1,151 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .holds import copies_updated
+from .models import Author, Book, BookAvailability, BookInstance, CatalogStats, Genre
+
+# Keep the home page counters (CatalogStats) and BookAvailability in step with
+# the catalog tables, and pass returned copies on to the hold queue.
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        CatalogStats.increment(num_books=1)
+        BookAvailability.objects.get_or_create(book=instance)
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    CatalogStats.increment(num_books=-1)
+
+@receiver(post_save, sender=Author)
+def author_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        CatalogStats.increment(num_authors=1)
+
+@receiver(post_delete, sender=Author)
+def author_deleted(sender, instance, **kwargs):
+    CatalogStats.increment(num_authors=-1)
+
+@receiver(post_save, sender=Genre)
+def genre_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        CatalogStats.increment(num_genres=1)
+
+@receiver(post_delete, sender=Genre)
+def genre_deleted(sender, instance, **kwargs):
+    CatalogStats.increment(num_genres=-1)
+
+@receiver(post_save, sender=BookInstance)
+def book_instance_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_loaded_values', {})
+    was_available = not created and previous.get('status') == 'a'
+    is_available = instance.status == 'a'
+    CatalogStats.increment(
+        num_instances=1 if created else 0,
+        num_instances_available=int(is_available) - int(was_available),
+    )
+    book_ids = {instance.book_id, previous.get('book_id')}
+    if created or any(previous.get(name) != getattr(instance, name) for name in ('status', 'due_back', 'book_id')):
+        BookAvailability.refresh(book_ids)
+        # the book list shows availability too
+        touch_books(book_ids, stamp_key(BOOKS))
+    else:
+        # copies are listed on their book's and its author's page (touch_books below)
+        touch_books(book_ids)
+    # the saved state becomes the baseline for the next save of this object
+    instance._loaded_values = {
+        field.attname: getattr(instance, field.attname) for field in sender._meta.concrete_fields
+    }
+    if previous.get('status') != instance.status:
+        copies_updated([instance], {instance.pk: previous.get('status')})
+
+@receiver(post_delete, sender=BookInstance)
+def book_instance_deleted(sender, instance, **kwargs):
+    previous = getattr(instance, '_loaded_values', {})
+    was_available = previous.get('status', instance.status) == 'a'
+    CatalogStats.increment(num_instances=-1, num_instances_available=-int(was_available))
+    BookAvailability.refresh({instance.book_id})
+    touch_books({instance.book_id}, stamp_key(BOOKS))
+
+# Sent by catalog.loans after it changed copies with bulk_update(), which sends
+# no post_save. previous_status maps each copy's pk to its status before.
+copies_changed = Signal()
+
+@receiver(copies_changed)
+def copies_bulk_changed(sender, copies, previous_status, **kwargs):
+    was_available = sum(1 for status in previous_status.values() if status == 'a')
+    is_available = sum(1 for copy in copies if copy.status == 'a')
+    CatalogStats.increment(num_instances_available=is_available - was_available)
+    book_ids = {copy.book_id for copy in copies}
+    BookAvailability.refresh(book_ids)
+    touch_books(book_ids, stamp_key(BOOKS))
+    for copy in copies:
+        copy._loaded_values = {
+            field.attname: getattr(copy, field.attname) for field in sender._meta.concrete_fields
+        }
+    copies_updated(copies, previous_status)
+
+# Retire the cached pages and fragments (see catalog.caching) that show the changed rows.
+
+from django.db.models.signals import m2m_changed, pre_delete
+
+from .caching import AUTHORS, BOOKS, VOCABULARY, expire_all, stamp_key, touch
+from .models import Language
+
+def touch_books(book_ids, *keys):
+    """Touch the given books, their authors' pages and keys."""
+    book_ids = {pk for pk in book_ids if pk is not None}
+    author_ids = Book.objects.filter(pk__in=book_ids).exclude(author=None).values_list('author_id', flat=True)
+    touch(
+        *keys,
+        *(stamp_key('book', pk) for pk in book_ids),
+        *(stamp_key('author', pk) for pk in set(author_ids)),
+    )
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def book_changed(sender, instance, **kwargs):
+    previous = getattr(instance, '_loaded_values', {})
+    author_ids = {instance.author_id, previous.get('author_id')} - {None}
+    touch(
+        stamp_key(BOOKS),
+        stamp_key('book', instance.pk),
+        *(stamp_key('author', pk) for pk in author_ids),
+    )
+    instance._loaded_values = {
+        field.attname: getattr(instance, field.attname) for field in sender._meta.concrete_fields
+    }
+
+@receiver(m2m_changed, sender=Book.genre.through)
+def book_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        touch(stamp_key(BOOKS), stamp_key('book', instance.pk))
+    elif pk_set is not None:
+        touch(stamp_key(BOOKS), *(stamp_key('book', pk) for pk in pk_set))
+    else:
+        # genre.book_set.clear() doesn't say which books lost the genre
+        expire_all()
+
+@receiver(post_save, sender=Author)
+@receiver(pre_delete, sender=Author)
+def author_changed(sender, instance, **kwargs):
+    # the author's name is shown on each of their books; pre_delete still
+    # sees the books that deleting the author will detach
+    book_ids = instance.book_set.values_list('pk', flat=True) if instance.pk else []
+    touch(
+        stamp_key(AUTHORS),
+        stamp_key(BOOKS),
+        stamp_key('author', instance.pk),
+        *(stamp_key('book', pk) for pk in book_ids),
+    )
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=Language)
+@receiver(post_delete, sender=Language)
+def vocabulary_changed(sender, instance, **kwargs):
+    touch(stamp_key(VOCABULARY), stamp_key(BOOKS))
@@ -0,0 +1,58 @@
+// Fill the options of select[data-autocomplete-url] from the autocomplete
+// endpoint as the visitor types into the search box added above it. The
+// selected options are kept, so the form submits the same values as before.
+document.querySelectorAll('select[data-autocomplete-url]').forEach((select) => {
+    const search = document.createElement('input');
+    search.type = 'search';
+    search.className = 'form-control form-control-sm mb-1';
+    search.placeholder = 'Type to search…';
+    select.before(search);
+
+    const more = document.createElement('button');
+    more.type = 'button';
+    more.className = 'btn btn-link btn-sm p-0 mb-2';
+    more.textContent = 'More…';
+    more.hidden = true;
+    select.after(more);
+
+    let offset = 0;
+    let timer = null;
+
+    const load = async (append) => {
+        const params = new URLSearchParams({q: search.value, offset: offset, limit: 20});
+        const response = await fetch(`${select.dataset.autocompleteUrl}?${params}`);
+        if (!response.ok) {
+            return;
+        }
+        const data = await response.json();
+        if (!append) {
+            select.querySelectorAll('option:not(:checked)').forEach((option) => {
+                if (option.value) {
+                    option.remove();
+                }
+            });
+        }
+        const present = new Set(Array.from(select.options, (option) => option.value));
+        data.results.forEach((result) => {
+            if (!present.has(String(result.id))) {
+                select.add(new Option(result.text, result.id));
+            }
+        });
+        offset += data.results.length;
+        more.hidden = !data.more;
+    };
+
+    search.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(() => {
+            offset = 0;
+            load(false);
+        }, 250);
+    });
+    search.addEventListener('focus', () => {
+        if (offset === 0) {
+            load(false);
+        }
+    }, {once: true});
+    more.addEventListener('click', () => load(true));
+});
@@ -0,0 +1,129 @@
+"""Synthetic catalog data for benchmarks, written with bulk inserts."""
+import datetime
+import random
+
+from django.contrib.auth.models import User
+
+from .importexport import bulk_create_with_pks
+from .models import Author, Book, BookInstance, Genre, Language
+
+WORDS = (
+    'ancient river shadow empire garden winter silver dragon crown storm night '
+    'glass mountain secret ocean memory fire iron forest star letter voyage '
+    'machine kingdom silence harbor lantern orchard desert clock mirror island'
+).split()
+
+FIRST_NAMES = (
+    'John Jane Akira Yuki Maria Pierre Olga Ahmed Chen Laura Diego Emma Kenji '
+    'Sofia Ivan Grace Omar Hana Lucas Nora'
+).split()
+
+LAST_NAMES = (
+    'Smith Tanaka Garcia Dubois Ivanova Hassan Wang Rossi Silva Sato Novak '
+    'Kowalski Brown Mueller Suzuki Lopez Khan Berg Moreau Okafor'
+).split()
+
+# Relative weights, roughly following the skew of a public library collection.
+GENRES = {
+    'Fiction': 30, 'Mystery': 12, 'Romance': 10, 'Fantasy': 9, 'Science Fiction': 7,
+    'Biography': 6, 'History': 6, 'Children': 6, 'Poetry': 3, 'Science': 3,
+    'Travel': 2, 'Cookery': 2, 'Philosophy': 2, 'Art': 1, 'Drama': 1,
+}
+
+LANGUAGES = {
+    'English': 60, 'Japanese': 15, 'Spanish': 7, 'French': 6, 'German': 5,
+    'Chinese': 3, 'Italian': 2, 'Russian': 1, 'Korean': 1,
+}
+
+# Share of copies in each BookInstance.status
+STATUSES = {'a': 55, 'o': 35, 'r': 5, 'm': 5}
+
+def weighted(rng, weights, k=1):
+    return rng.choices(list(weights), weights=list(weights.values()), k=k)
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+def create_authors(count, batch_size=5000, seed=0):
+    """Bulk insert count authors and return their ids."""
+    rng = random.Random(seed)
+    start = Author.objects.count()
+    for offset in range(0, count, batch_size):
+        Author.objects.bulk_create([
+            Author(
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=f'{rng.choice(LAST_NAMES)}{start + i}',
+            )
+            for i in range(offset, min(offset + batch_size, count))
+        ], batch_size=batch_size)
+    return list(Author.objects.values_list('pk', flat=True))
+
+def create_genres():
+    """Create the GENRES that don't exist yet and return their {id: weight}."""
+    existing = set(Genre.objects.filter(name__in=GENRES).values_list('name', flat=True))
+    Genre.objects.bulk_create([Genre(name=name) for name in GENRES if name not in existing])
+    return {genre.pk: GENRES[genre.name] for genre in Genre.objects.filter(name__in=GENRES)}
+
+def create_languages():
+    """Create the LANGUAGES that don't exist yet and return their {id: weight}."""
+    existing = set(Language.objects.filter(name__in=LANGUAGES).values_list('name', flat=True))
+    Language.objects.bulk_create([Language(name=name) for name in LANGUAGES if name not in existing])
+    return {language.pk: LANGUAGES[language.name] for language in Language.objects.filter(name__in=LANGUAGES)}
+
+def create_users(count, batch_size=5000):
+    """Bulk insert count patrons (unusable passwords) and return their ids."""
+    start = User.objects.count()
+    for offset in range(0, count, batch_size):
+        users = []
+        for i in range(offset, min(offset + batch_size, count)):
+            user = User(username=f'patron{start + i}')
+            user.set_unusable_password()
+            users.append(user)
+        User.objects.bulk_create(users, batch_size=batch_size)
+    return list(User.objects.filter(username__startswith='patron').values_list('pk', flat=True))
+
+def create_books(count, author_ids, languages=None, genres=None, batch_size=5000, seed=0):
+    """Bulk insert count books spread over author_ids and return their ids.
+
+    languages and genres are {id: weight} dicts (see create_languages and
+    create_genres); every book gets one to three genres.
+    """
+    rng = random.Random(seed)
+    through = Book.genre.through
+    for offset in range(0, count, batch_size):
+        books = bulk_create_with_pks(Book, [
+            Book(
+                title=sentence(rng, rng.randint(2, 5)).title(),
+                author_id=rng.choice(author_ids) if author_ids else None,
+                summary=sentence(rng, 40),
+                isbn=f'978{i:010d}',
+                language_id=weighted(rng, languages)[0] if languages else None,
+            )
+            for i in range(offset, min(offset + batch_size, count))
+        ], batch_size=batch_size)
+        if genres:
+            through.objects.bulk_create([
+                through(book_id=book.pk, genre_id=genre_id)
+                for book in books
+                for genre_id in set(weighted(rng, genres, k=rng.randint(1, 3)))
+            ], batch_size=batch_size)
+    return list(Book.objects.values_list('pk', flat=True))
+
+def create_book_instances(count, book_ids, borrower_ids=(), batch_size=5000, seed=0):
+    """Bulk insert count copies of random books with STATUSES-distributed statuses."""
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    for offset in range(0, count, batch_size):
+        copies = []
+        for _ in range(min(batch_size, count - offset)):
+            status = weighted(rng, STATUSES)[0]
+            on_loan = status == 'o' and borrower_ids
+            copies.append(BookInstance(
+                book_id=rng.choice(book_ids),
+                imprint=f'{rng.choice(LAST_NAMES)} Press, {rng.randint(1950, 2021)}',
+                status=status,
+                # about one loan in ten is overdue
+                due_back=today + datetime.timedelta(days=rng.randint(-7, 60)) if on_loan else None,
+                borrower_id=rng.choice(borrower_ids) if on_loan else None,
+            ))
+        BookInstance.objects.bulk_create(copies, batch_size=batch_size)
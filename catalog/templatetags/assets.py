@@ -0,0 +1,35 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from catalog.assets import CDN_SCRIPTS, CDN_STYLESHEETS, PRELOAD_FONT, vendored
+
+register = template.Library()
+
+def cdn_attributes(asset):
+    if asset.integrity:
+        return format_html(' integrity="{}" crossorigin="anonymous"', asset.integrity)
+    return format_html(' crossorigin="anonymous"')
+
+@register.simple_tag
+def stylesheets():
+    """The <link>s of base_generic.html: the site bundle, and Bootstrap and Font Awesome
+    from their CDNs until `manage.py vendor_assets` has downloaded them."""
+    if vendored():
+        head = format_html(
+            '<link rel="preload" href="{}" as="font" type="font/woff2" crossorigin>\n', static(PRELOAD_FONT),
+        )
+    else:
+        head = format_html_join('', '<link rel="stylesheet" href="{}"{}>\n', (
+            (asset.url, cdn_attributes(asset)) for asset in CDN_STYLESHEETS
+        ))
+    return head + format_html('<link rel="stylesheet" href="{}">', static('bundles/site.css'))
+
+@register.simple_tag
+def scripts():
+    """The Bootstrap <script>: in the site bundle, or from its CDN until downloaded."""
+    if vendored():
+        return format_html('<script src="{}"></script>', static('bundles/site.js'))
+    return format_html_join('\n', '<script src="{}"{}></script>', (
+        (asset.url, cdn_attributes(asset)) for asset in CDN_SCRIPTS
+    ))
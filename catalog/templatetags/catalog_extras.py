@@ -0,0 +1,18 @@
+from django import template
+
+register = template.Library()
+
+@register.simple_tag(takes_context=True)
+def query_string(context, **kwargs):
+    """Current query string with the given parameters replaced (None removes one)."""
+    query = context['request'].GET.copy()
+    for key, value in kwargs.items():
+        query.pop(key, None)
+        if value is not None:
+            query[key] = value
+    return '?' + query.urlencode() if query else '?'
+
+@register.simple_tag
+def elided_page_range(page_obj, on_each_side=2, on_ends=1):
+    """Page numbers around page_obj with the long runs replaced by an ellipsis."""
+    return page_obj.paginator.get_elided_page_range(page_obj.number, on_each_side=on_each_side, on_ends=on_ends)
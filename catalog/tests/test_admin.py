@@ -0,0 +1,80 @@
+import datetime
+import itertools
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog.models import Author, Book, BookInstance, Genre, Hold, Language
+from catalog.tests.utils import QueryBudgetMixin
+
+class AdminQueryBudgetTest(QueryBudgetMixin, TestCase):
+    """The admin pages run a fixed number of queries with 10,000 copies in the catalog."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='3Ok!m2Rq7vXy')
+        cls.language = Language.objects.create(name='English')
+        cls.genres = [Genre.objects.create(name=name) for name in ('Fantasy', 'Poetry', 'History')]
+        User.objects.bulk_create(User(username=f'patron{number}') for number in range(50))
+        # SQLite doesn't return the keys of bulk-created rows
+        cls.patrons = list(User.objects.filter(username__startswith='patron'))
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        Book.objects.bulk_create(
+            Book(title=f'Book {number}', summary='Summary', isbn='ABCDEFG', author=cls.author, language=cls.language)
+            for number in range(100)
+        )
+        books = list(Book.objects.order_by('id'))
+        Book.genre.through.objects.bulk_create(
+            Book.genre.through(book=book, genre=genre) for book in books for genre in cls.genres
+        )
+        cls.book = books[0]
+        patrons = itertools.cycle(cls.patrons)
+        BookInstance.objects.bulk_create(
+            BookInstance(book=book, imprint='Imprint', status='o', due_back=datetime.date.today(), borrower=next(patrons))
+            for book in books for _ in range(100)
+        )
+        cls.copy = BookInstance.objects.filter(book=cls.book).first()
+        Hold.objects.bulk_create(
+            Hold(book=book, patron=patron, status='w') for book in books[:20] for patron in cls.patrons
+        )
+
+    def setUp(self):
+        self.client.login(username='admin', password='3Ok!m2Rq7vXy')
+        # looked up once per process by the change pages
+        ContentType.objects.get_for_models(Author, Book, BookInstance, Hold)
+
+    def add_books(self, count=3):
+        for number in range(count):
+            book = Book.objects.create(title='Another', summary='Summary', isbn='ABCDEFG', author=self.author, language=self.language)
+            book.genre.set(self.genres)
+
+    def add_copies(self, count=3):
+        for patron in self.patrons[:count]:
+            BookInstance.objects.create(book=self.book, imprint='Imprint', status='o', borrower=patron)
+
+    def add_holds(self):
+        book = Book.objects.create(title='Another', summary='Summary', isbn='ABCDEFG', author=self.author)
+        for patron in self.patrons[:3]:
+            Hold.objects.create(book=book, patron=patron, copy=self.copy if patron == self.patrons[0] else None)
+
+    def test_changelists(self):
+        self.assertQueryBudget(8, reverse('admin:catalog_book_changelist'), self.add_books)
+        self.assertQueryBudget(5, reverse('admin:catalog_bookinstance_changelist'), self.add_copies)
+        self.assertQueryBudget(5, reverse('admin:catalog_hold_changelist'), self.add_holds)
+        self.assertQueryBudget(5, reverse('admin:catalog_author_changelist'), self.add_books)
+
+    def test_change_pages_with_inlines(self):
+        self.assertQueryBudget(9, reverse('admin:catalog_author_change', args=[self.author.pk]), self.add_books)
+        self.assertQueryBudget(11, reverse('admin:catalog_book_change', args=[self.book.pk]), self.add_copies)
+
+    def test_change_pages(self):
+        self.assertQueryBudget(7, reverse('admin:catalog_bookinstance_change', args=[self.copy.pk]), self.add_copies)
+        hold = Hold.objects.first()
+        self.assertQueryBudget(9, reverse('admin:catalog_hold_change', args=[hold.pk]), self.add_holds)
+
+    def test_str_reads_the_selected_book(self):
+        copy = BookInstance.objects.select_related('book').get(pk=self.copy.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(str(copy), f'{copy.id} (Book 0)')
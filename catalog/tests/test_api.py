@@ -0,0 +1,108 @@
+import datetime
+
+from django.contrib.auth.models import Permission, User
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog.models import Author, Book, BookInstance, Genre
+from catalog.tests.utils import QueryBudgetMixin
+
+class ApiTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.smith = Author.objects.create(first_name='John', last_name='Smith')
+        self.doe = Author.objects.create(first_name='Jane', last_name='Doe')
+        self.fantasy = Genre.objects.create(name='Fantasy')
+        self.books = []
+        for number in range(5):
+            book = Book.objects.create(title=f'Book {number}', summary='Summary', isbn='ABCDEFG',
+                                       author=self.smith if number % 2 else self.doe)
+            book.genre.set([self.fantasy])
+            self.books.append(book)
+        self.reader = User.objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+        self.librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        self.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        due = datetime.date.today() + datetime.timedelta(days=7)
+        self.loan = BookInstance.objects.create(book=self.books[0], imprint='Imprint', status='o',
+                                                borrower=self.reader, due_back=due)
+        BookInstance.objects.create(book=self.books[1], imprint='Imprint', status='o',
+                                    borrower=self.librarian, due_back=due)
+
+    def get(self, name, *args, **params):
+        return self.client.get(reverse(name, args=args), params)
+
+    def test_sparse_fields_and_includes(self):
+        response = self.get('api-list', 'books', fields='title', include='author,genre', limit=2)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['data'][0], {'id': self.books[0].pk, 'title': 'Book 0', 'author': self.doe.pk,
+                                           'genre': [self.fantasy.pk]})
+        self.assertEqual({author['id'] for author in data['included']['authors']}, {self.smith.pk, self.doe.pk})
+        self.assertEqual(data['included']['genres'], [{'id': self.fantasy.pk, 'name': 'Fantasy'}])
+
+        response = self.get('api-detail', 'authors', self.smith.pk, include='books', **{'fields[books]': 'title'})
+        data = response.json()
+        self.assertEqual(data['data']['books'], [self.books[1].pk, self.books[3].pk])
+        self.assertEqual(data['included']['books'], [{'id': self.books[1].pk, 'title': 'Book 1'},
+                                                     {'id': self.books[3].pk, 'title': 'Book 3'}])
+
+    def test_cursor_pagination(self):
+        titles, url = [], reverse('api-list', args=['books']) + '?fields=title&limit=2'
+        while url:
+            data = self.client.get(url).json()
+            titles += [book['title'] for book in data['data']]
+            url = data['next']
+        self.assertEqual(titles, [f'Book {number}' for number in range(5)])
+
+        data = self.get('api-list', 'books', fields='title', limit=2).json()
+        data = self.client.get(data['next']).json()
+        previous = self.client.get(data['previous']).json()
+        self.assertEqual([book['title'] for book in previous['data']], ['Book 0', 'Book 1'])
+
+    def test_batch(self):
+        ids = f'{self.books[3].pk},999,{self.books[1].pk}'
+        data = self.get('api-batch', 'books', ids=ids, fields='title', include='author').json()
+        self.assertEqual([book['title'] for book in data['data']], ['Book 3', 'Book 1'])
+        self.assertEqual(data['missing'], [999])
+        self.assertEqual([author['id'] for author in data['included']['authors']], [self.smith.pk])
+
+        data = self.get('api-batch', 'copies', ids=str(self.loan.pk)).json()
+        self.assertEqual(data['data'][0]['id'], str(self.loan.pk))
+
+    def test_errors(self):
+        for name, args, params in (
+            ('api-list', ['books'], {'fields': 'title,secret'}),
+            ('api-list', ['books'], {'include': 'summary'}),
+            ('api-list', ['books'], {'limit': '1000'}),
+            ('api-list', ['books'], {'cursor': 'nonsense'}),
+            ('api-batch', ['books'], {'ids': '1,two'}),
+            ('api-batch', ['books'], {'ids': ','.join(map(str, range(1, 200)))}),
+            ('api-detail', ['copies', 'not-a-uuid'], {}),
+        ):
+            with self.subTest(args=args, params=params):
+                response = self.client.get(reverse(name, args=args), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('__all__', response.json()['errors'])
+        self.assertEqual(self.get('api-detail', 'books', 999).status_code, 404)
+        self.assertEqual(self.get('api-list', 'users').status_code, 404)
+        self.assertEqual(self.client.post(reverse('api-list', args=['books'])).status_code, 405)
+
+    def test_loans_need_sign_in(self):
+        self.assertEqual(self.get('api-list', 'loans').status_code, 403)
+
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        data = self.get('api-list', 'loans', fields='title,borrower,overdue').json()
+        self.assertEqual(data['data'], [{'id': str(self.loan.pk), 'title': 'Book 0', 'borrower': 'reader',
+                                         'overdue': False}])
+
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        self.assertEqual(len(self.get('api-list', 'loans').json()['data']), 2)
+
+    def test_query_budget(self):
+        def grow():
+            for number in range(5):
+                book = Book.objects.create(title=f'More {number}', summary='Summary', isbn='ABCDEFG',
+                                           author=Author.objects.create(first_name='A', last_name=f'Author {number}'))
+                book.genre.set([self.fantasy])
+
+        # the page, its genre ids, and each include
+        self.assertQueryBudget(4, reverse('api-list', args=['books']), grow, {'include': 'author,genre'})
@@ -0,0 +1,114 @@
+import json
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+
+from catalog.assets import CDN_SCRIPTS, CDN_STYLESHEETS, VENDOR, minify_css, minify_js, rebase_urls, vendored
+from catalog.models import Author, Book
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+class MinifyTest(SimpleTestCase):
+    def test_css(self):
+        css = '/* note */\na :hover ,\nb > i {\n    content: "a  ;  b";\n    color: red;\n}\n'
+        self.assertEqual(minify_css(css), 'a :hover,b>i{content: "a  ;  b";color: red}')
+
+    def test_js(self):
+        self.assertEqual(minify_js('// note\nif (a) {\n    b();\n}\n\nc()\n'), 'if (a) {\nb();\n}\nc()')
+
+    def test_urls_are_rebased_on_the_bundle(self):
+        css = 'a{src:url(../webfonts/x.woff2?v=1#f)}b{background:url("data:image/svg+xml,x")}'
+        self.assertEqual(
+            rebase_urls(css, 'vendor/fontawesome/css/solid.min.css', 'bundles/site.css'),
+            'a{src:url(../vendor/fontawesome/webfonts/x.woff2?v=1#f)}b{background:url("data:image/svg+xml,x")}',
+        )
+
+class CdnLinksTest(SimpleTestCase):
+    def test_cdn_links_are_pinned(self):
+        # the pages link these until vendor_assets has downloaded them
+        for asset in (*CDN_STYLESHEETS, *CDN_SCRIPTS):
+            with self.subTest(asset.url):
+                self.assertRegex(asset.url, r'@\d+\.\d+\.\d+')
+                self.assertRegex(asset.integrity or '', r'^sha384-[A-Za-z0-9+/]{64}$')
+
+class SelfHostedAssetsTest(TestCase):
+    """collectstatic with stand-ins for the vendor files, as after `manage.py vendor_assets`."""
+
+    @classmethod
+    def setUpClass(cls):
+        tmp = Path(tempfile.mkdtemp())
+        cls.addClassCleanup(shutil.rmtree, tmp)
+        for path in VENDOR:
+            target = tmp / 'vendor_src' / path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if path.endswith('solid.min.css'):
+                target.write_text('@font-face{src:url(../webfonts/fa-solid-900.woff2) format("woff2")}')
+            elif path.endswith('.css') or path.endswith('.js'):
+                target.write_text('/* stand-in */' + '.x{color:red}' * 200 + '\n/*# sourceMappingURL=x.map */')
+            else:
+                target.write_bytes(b'font')
+        settings = override_settings(
+            STATICFILES_DIRS=[tmp / 'vendor_src'],
+            STATIC_ROOT=tmp / 'static_root',
+            ASSET_BUILD_DIR=tmp / 'build',
+            ALLOWED_HOSTS=['testserver'],
+        )
+        settings.enable()
+        cls.addClassCleanup(settings.disable)
+        vendored.cache_clear()
+        cls.addClassCleanup(vendored.cache_clear)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        super().setUpClass()
+
+    def setUp(self):
+        # WhiteNoise reads STATIC_ROOT when the middleware is loaded
+        self.client = Client()
+
+    def test_bundle_points_at_hashed_fonts(self):
+        with staticfiles_storage.open(staticfiles_storage.stored_name('bundles/site.css')) as f:
+            css = f.read().decode()
+        font = staticfiles_storage.stored_name('vendor/fontawesome/webfonts/fa-solid-900.woff2')
+        self.assertIn(f'url("../{font}")', css)
+        self.assertNotIn('sourceMappingURL', css)
+
+    def test_pages_link_the_bundles_and_preload_the_font(self):
+        response = self.client.get('/catalog/')
+        self.assertContains(response, staticfiles_storage.url('bundles/site.css'))
+        self.assertContains(response, staticfiles_storage.url('bundles/site.js'))
+        self.assertContains(response, 'rel="preload"')
+        self.assertNotContains(response, 'cdn.jsdelivr.net')
+
+    def test_hashed_files_are_immutable(self):
+        response = self.client.get(staticfiles_storage.url('bundles/site.css'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Cache-Control'], 'max-age=315360000, public, immutable')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        response = self.client.get('/static/bundles/site.css')
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    @unittest.skipIf(brotli is None, 'Brotli is not installed')
+    def test_brotli(self):
+        response = self.client.get(staticfiles_storage.url('bundles/site.css'), HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(response['Content-Encoding'], 'br')
+
+    def test_page_weight(self):
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        Book.objects.create(title='Title', summary='Summary', isbn='ABCDEFG', author=author)
+        out = StringIO()
+        call_command('page_weight', stdout=out, stderr=StringIO())
+        pages = json.loads(out.getvalue())['pages']
+        self.assertEqual(set(pages), {'index', 'books', 'book-detail'})
+        for page in pages.values():
+            self.assertEqual(page['external'], [])
+            self.assertEqual(page['total_bytes'], page['html_bytes'] + sum(asset['bytes'] for asset in page['assets']))
+        with self.assertRaises(CommandError):
+            call_command('page_weight', routes=['index'], budget=1, stdout=StringIO(), stderr=StringIO())
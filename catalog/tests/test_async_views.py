@@ -0,0 +1,69 @@
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.http import Http404
+from django.test import RequestFactory, TransactionTestCase
+
+from catalog import async_views
+from catalog.models import Author, Book, BookInstance, Genre
+from catalog.preferences import Preferences
+
+# The async views query from worker threads with connections of their own,
+# which only see committed rows; hence TransactionTestCase.
+
+class AsyncViewsTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = Author.objects.create(first_name='John', last_name='Smith')
+        self.book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=self.author)
+        self.book.genre.add(Genre.objects.create(name='Fantasy'), Genre.objects.create(name='Poetry'))
+        for status in ('a', 'o'):
+            BookInstance.objects.create(book=self.book, imprint=f'Imprint {status}', status=status)
+        for number in range(6):
+            Book.objects.create(title=f'Other {number}', summary='Summary', isbn='ABCDEFG', author=self.author)
+
+    def get(self, view, *args, data=None):
+        request = RequestFactory().get('/', data or {})
+        request.user = AnonymousUser()
+        request.session = SessionStore()
+        request.preferences = Preferences(request)
+        return async_to_sync(view)(request, *args)
+
+    def test_index(self):
+        response = self.get(async_views.index)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '<strong>Books:</strong> 7')
+        self.assertContains(response, '<strong>Copies:</strong> 2')
+
+    def test_book_detail(self):
+        response = self.get(async_views.book_detail, self.book.pk)
+        self.assertEqual(response.status_code, 200)
+        for text in ('Book Title', 'Smith, John', 'Fantasy, Poetry', 'Imprint a', 'Imprint o'):
+            self.assertContains(response, text)
+
+    def test_author_detail(self):
+        response = self.get(async_views.author_detail, self.author.pk)
+        self.assertContains(response, 'Book Title</a>(1 of 2 available)')
+        self.assertContains(response, 'Other 5</a>(0 of 0 available)')
+
+    def test_list_pages(self):
+        first = self.get(async_views.book_list)
+        second = self.get(async_views.book_list, data={'page': 2})
+        self.assertEqual(first.status_code, 200)
+        titles = {book.title for book in Book.objects.all()}
+        shown = {title for title in titles if title in first.content.decode() + second.content.decode()}
+        self.assertEqual(shown, titles)
+        self.assertContains(self.get(async_views.author_list), 'Smith, John')
+
+    def test_missing_object_and_page(self):
+        with self.assertRaises(Http404):
+            self.get(async_views.book_detail, self.book.pk + 100)
+        with self.assertRaises(Http404):
+            self.get(async_views.book_list, data={'page': 99})
+
+    def test_served_from_page_cache(self):
+        first = self.get(async_views.book_detail, self.book.pk)
+        with self.assertNumQueries(0):
+            second = self.get(async_views.book_detail, self.book.pk)
+        self.assertEqual(second['ETag'], first['ETag'])
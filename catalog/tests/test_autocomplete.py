@@ -0,0 +1,74 @@
+from django.contrib.auth.models import Permission, User
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog.models import Author, Genre, Language
+from catalog.tests.utils import QueryBudgetMixin
+
+class AutocompleteEndpointTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for first_name, last_name in (('John', 'Smith'), ('Jane', 'Smithers'), ('Adam', 'Smyth'), ('Smita', 'Patel')):
+            Author.objects.create(first_name=first_name, last_name=last_name)
+        for name in ('Fantasy', 'Fairy tales', 'Poetry'):
+            Genre.objects.create(name=name)
+
+    def lookup(self, source, **params):
+        response = self.client.get(reverse('autocomplete', args=[source]), params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [result['text'] for result in data['results']], data['more']
+
+    def test_prefix_matches_in_index_order(self):
+        self.assertEqual(self.lookup('authors', q='SMITH'), (['Smith, John', 'Smithers, Jane'], False))
+        # either name
+        self.assertEqual(self.lookup('authors', q='smit')[0], ['Patel, Smita', 'Smith, John', 'Smithers, Jane'])
+        self.assertEqual(self.lookup('genres', q='fa'), (['Fairy tales', 'Fantasy'], False))
+        self.assertEqual(self.lookup('genres', q='tales'), ([], False))
+        self.assertEqual(self.lookup('languages'), ([], False))
+
+    def test_limit_and_offset(self):
+        self.assertEqual(self.lookup('authors', q='s', limit=2), (['Patel, Smita', 'Smith, John'], True))
+        self.assertEqual(self.lookup('authors', q='s', limit=2, offset=2), (['Smithers, Jane', 'Smyth, Adam'], False))
+        self.assertEqual(len(self.lookup('genres', limit=1000)[0]), 3)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get(reverse('autocomplete', args=['users'])).status_code, 404)
+        for params in ({'limit': 'ten'}, {'limit': 0}, {'offset': -1}):
+            self.assertEqual(self.client.get(reverse('autocomplete', args=['authors']), params).status_code, 400)
+
+    def test_admin_autocomplete_uses_prefixes(self):
+        User.objects.create_superuser(username='admin', password='3Ok!m2Rq7vXy')
+        self.client.login(username='admin', password='3Ok!m2Rq7vXy')
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'smit', 'app_label': 'catalog', 'model_name': 'book', 'field_name': 'author',
+        })
+        self.assertEqual([result['text'] for result in response.json()['results']],
+                         ['Patel, Smita', 'Smith, John', 'Smithers, Jane'])
+
+class AutocompleteFormTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.language = Language.objects.create(name='English')
+        self.genre = Genre.objects.create(name='Fantasy')
+        user = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        user.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+
+    def grow(self):
+        for number in range(50):
+            Author.objects.create(first_name='Jane', last_name=f'Doe {number}')
+            Genre.objects.create(name=f'Genre {number}')
+            Language.objects.create(name=f'Language {number}')
+
+    def test_forms_render_only_the_selected_options(self):
+        response = self.assertQueryBudget(4, reverse('book-create'), self.grow)
+        self.assertContains(response, 'data-autocomplete-url="/catalog/autocomplete/authors/"')
+        self.assertNotContains(response, 'Doe 0')
+
+        # the book list offers genres as facets, only those with books
+        response = self.assertQueryBudget(6, reverse('books'), self.grow, {'genre_select': self.genre.pk})
+        self.assertNotContains(response, 'Genre 0')
+        # not a key: the form is shown again with an error
+        response = self.client.post(reverse('book-create'), {'title': 'Title', 'author': 'x', 'genre': ['x']})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('author', response.context['form'].errors)
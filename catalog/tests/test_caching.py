@@ -0,0 +1,137 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog.models import Author, Book, BookInstance, CatalogStats, Genre, Language
+
+class CachedPageTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = Author.objects.create(first_name='John', last_name='Smith')
+        self.genre = Genre.objects.create(name='Fantasy')
+        self.book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=self.author)
+        self.book.genre.add(self.genre)
+        self.copy = BookInstance.objects.create(book=self.book, imprint='First Imprint', status='a')
+        self.book_url = reverse('book-detail', args=[self.book.pk])
+        self.author_url = reverse('author-detail', args=[self.author.pk])
+
+    def test_repeat_request_runs_no_queries(self):
+        for url in (self.book_url, self.author_url, reverse('books'), reverse('authors')):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(second.content, first.content)
+            self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_conditional_requests(self):
+        response = self.client.get(self.book_url)
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(self.book_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        since = self.client.get(self.book_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+        self.copy.imprint = 'Second Imprint'
+        self.copy.save()
+        response = self.client.get(self.book_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Second Imprint')
+
+    def test_changes_retire_cached_pages(self):
+        self.client.get(self.book_url)
+        self.client.get(self.author_url)
+        self.client.get(reverse('books'))
+
+        BookInstance.objects.create(book=self.book, imprint='Added Imprint', status='m')
+        self.assertContains(self.client.get(self.book_url), 'Added Imprint')
+        self.assertContains(self.client.get(self.author_url), '(1 of 2 available)')
+
+        self.author.last_name = 'Smythe'
+        self.author.save()
+        self.assertContains(self.client.get(self.book_url), 'Smythe')
+        self.assertContains(self.client.get(reverse('books')), 'Smythe')
+
+        self.book.genre.add(Genre.objects.create(name='Poetry'))
+        self.assertContains(self.client.get(self.book_url), 'Poetry')
+
+        self.genre.name = 'High Fantasy'
+        self.genre.save()
+        self.assertContains(self.client.get(self.book_url), 'High Fantasy')
+
+        self.book.language = Language.objects.create(name='English')
+        self.book.save()
+        self.assertContains(self.client.get(self.book_url), 'English')
+
+    def test_moving_a_book_updates_both_authors(self):
+        other = Author.objects.create(first_name='Jane', last_name='Doe')
+        self.assertContains(self.client.get(self.author_url), 'Book Title')
+        book = Book.objects.get(pk=self.book.pk)
+        book.author = other
+        book.save()
+        self.assertNotContains(self.client.get(self.author_url), 'Book Title')
+        self.assertContains(self.client.get(reverse('author-detail', args=[other.pk])), 'Book Title')
+
+    def test_reconcile_retires_pages(self):
+        self.client.get(self.book_url)
+        BookInstance.objects.filter(pk=self.copy.pk).update(imprint='Bulk Imprint')
+        CatalogStats.reconcile()
+        self.assertContains(self.client.get(self.book_url), 'Bulk Imprint')
+
+    def test_page_size_preference_is_part_of_the_key(self):
+        for number in range(6):
+            Author.objects.create(first_name='Jane', last_name=f'Doe {number}')
+        self.assertEqual(len(self.client.get(reverse('authors')).context['author_list']), 5)
+        self.client.get(reverse('authors'), {'paginate_by': 10})
+        self.assertEqual(len(self.client.get(reverse('authors')).context['author_list']), 7)
+
+    def test_signed_in_users_get_cached_fragments(self):
+        User.objects.create_user(username='reader', password='2HJ1vRV0Z&3iD')
+        self.client.login(username='reader', password='2HJ1vRV0Z&3iD')
+        first = self.client.get(self.book_url)
+        self.assertContains(first, 'First Imprint')
+        with self.assertNumQueries(4):
+            # session, user, book and genres: the copies come from the fragment cache
+            second = self.client.get(self.book_url)
+        self.assertContains(second, 'User: reader')
+        self.assertContains(second, 'First Imprint')
+
+class CachedNavigationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(username='staff', password='1X<ISRUkw+tuK', is_staff=True)
+        User.objects.create_user(username='member', password='1X<ISRUkw+tuK')
+
+    def sidebar(self, url):
+        content = self.client.get(url).content.decode()
+        return content[content.index('id="sidebarMenu"'):content.index('</nav>', content.index('id="sidebarMenu"'))]
+
+    def test_sidebar_is_rendered_per_role_and_page(self):
+        anonymous = self.sidebar(reverse('index'))
+        self.assertNotIn('My Borrowed', anonymous)
+        self.assertIn('Login', anonymous)
+        self.assertIn('nav-link active" href="/catalog/"', anonymous)
+        self.assertIn('nav-link active" href="/catalog/books/"', self.sidebar(reverse('books')))
+
+        self.client.login(username='staff', password='1X<ISRUkw+tuK')
+        staff = self.sidebar(reverse('index'))
+        self.assertIn('Loan desk', staff)
+        self.assertIn('User: staff', staff)
+
+        self.client.login(username='member', password='1X<ISRUkw+tuK')
+        member = self.sidebar(reverse('index'))
+        self.assertIn('My Borrowed', member)
+        self.assertNotIn('Loan desk', member)
+        # the username is not part of the cached links
+        self.assertIn('User: member', member)
+        self.assertIn('?next=/catalog/', member)
+
+    def test_links_are_reused(self):
+        self.client.get(reverse('index'))
+        key = make_template_fragment_key('sidebar', ['anonymous', 'index'])
+        self.assertIn('href="/catalog/authors/"', cache.get(key))
+        cache.set(key, '<p>cached links</p>')
+        self.assertIn('cached links', self.sidebar(reverse('index')))
@@ -0,0 +1,84 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+
+from catalog import urls
+from catalog.management.commands.benchmark_urls import POST_ONLY_ROUTES
+from catalog.models import Author, Book, BookInstance, CatalogStats, Genre
+
+class SeedLibraryCommandTest(TestCase):
+    def test_seeds_requested_sizes(self):
+        call_command(
+            'seed_library', authors=20, books=50, instances=120, users=5, batch_size=16,
+            stdout=StringIO(),
+        )
+        self.assertEqual(Author.objects.count(), 20)
+        self.assertEqual(Book.objects.count(), 50)
+        self.assertEqual(BookInstance.objects.count(), 120)
+        # every book has at least one genre
+        self.assertFalse(Book.objects.filter(genre__isnull=True).exists())
+        self.assertFalse(BookInstance.objects.filter(status='o', borrower__isnull=True).exists())
+        self.assertEqual(CatalogStats.counts()['num_instances'], 120)
+        self.assertEqual(CatalogStats.counts()['num_genres'], Genre.objects.count())
+
+class BenchmarkUrlsCommandTest(TransactionTestCase):
+    # the workers are other threads, so the rows must be committed for them to see
+    def test_requests_every_route(self):
+        call_command('seed_library', authors=5, books=10, instances=20, users=3, stdout=StringIO())
+        out = StringIO()
+        call_command('benchmark_urls', workers=1, requests=1, warmup=0, stdout=out, stderr=StringIO())
+        routes = json.loads(out.getvalue())['routes']
+        names = {pattern.name for pattern in urls.urlpatterns if pattern.name} - POST_ONLY_ROUTES
+        self.assertEqual(set(routes), names)
+        for name, route in routes.items():
+            self.assertEqual(route['errors'], 0, f"{name}: {route['url']} answered {route['status']}")
+
+class ExplainViewsCommandTest(TestCase):
+    def test_loan_lists_use_indexes(self):
+        call_command('seed_library', authors=20, books=50, instances=200, users=5, stdout=StringIO())
+        out = StringIO()
+        call_command('explain_views', stdout=out)
+        lines = out.getvalue().splitlines()
+        for label in ('authors', 'my-borrowed', 'all-borrowed', 'available copies'):
+            self.assertIn(f'{label}: ok', lines)
+
+import datetime
+
+from django.contrib.auth.models import User
+from django.core import mail
+
+class SendOverdueRemindersCommandTest(TestCase):
+    def setUp(self):
+        self.today = datetime.date.today()
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=author)
+        reader = User.objects.create_user(username='reader', email='reader@example.com')
+        no_email = User.objects.create_user(username='noemail')
+        for days, borrower in ((3, reader), (10, reader), (-1, reader), (5, no_email)):
+            BookInstance.objects.create(book=book, imprint='Imprint', status='o', borrower=borrower,
+                                        due_back=self.today - datetime.timedelta(days=days))
+
+    def run_command(self, **options):
+        out = StringIO()
+        call_command('send_overdue_reminders', batch_size=1, stdout=out, **options)
+        return out.getvalue()
+
+    def test_one_reminder_per_borrower(self):
+        self.assertIn('Would send 1 reminders about 2 overdue copies.', self.run_command(dry_run=True))
+        self.assertEqual(mail.outbox, [])
+
+        out = self.run_command()
+        self.assertIn('Sent 1 reminders about 2 overdue copies.', out)
+        self.assertIn('Skipped 1 borrowers without an email address.', out)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['reader@example.com'])
+        self.assertEqual(mail.outbox[0].body.count('Book Title'), 2)
+        self.assertEqual(BookInstance.objects.filter(reminded_on=self.today).count(), 2)
+
+    def test_not_reminded_again_within_interval(self):
+        self.run_command()
+        self.assertIn('Sent 0 reminders', self.run_command())
+        self.assertIn('Sent 1 reminders', self.run_command(date=self.today + datetime.timedelta(days=7)))
+        self.assertEqual(len(mail.outbox), 2)
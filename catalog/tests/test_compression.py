@@ -0,0 +1,107 @@
+import gzip
+import json
+import unittest
+import zlib
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from catalog.models import Author, Book
+from locallibrary.compression import brotli, choose_encoding, compress_stream, decompress
+
+class EncodingTest(SimpleTestCase):
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(choose_encoding('deflate'), None)
+        self.assertEqual(choose_encoding(''), None)
+        self.assertEqual(choose_encoding('gzip;q=0, *;q=0'), None)
+        self.assertEqual(choose_encoding('*'), 'br' if brotli else 'gzip')
+        self.assertEqual(choose_encoding('br;q=0.5, gzip'), 'gzip')
+
+    def test_streams_are_flushed_per_chunk(self):
+        chunks = list(compress_stream(iter([b'a' * 1000, b'b' * 1000]), 'gzip'))
+        self.assertEqual(len(chunks), 3)
+        # what has arrived so far can already be decoded
+        partial = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(chunks[0])
+        self.assertEqual(partial, b'a' * 1000)
+        self.assertEqual(gzip.decompress(b''.join(chunks)), b'a' * 1000 + b'b' * 1000)
+
+class CompressionMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        for number in range(10):
+            Book.objects.create(title=f'Book {number}', summary='Summary', isbn='ABCDEFG', author=author)
+
+    def test_pages_are_compressed(self):
+        response = self.client.get(reverse('books'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertIn(b'Book list', decompress(response.content, 'gzip'))
+        self.assertTrue(response['ETag'].startswith('W/"'))
+
+        response = self.client.get(reverse('books'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    @unittest.skipIf(brotli is None, 'Brotli is not installed')
+    def test_brotli_is_preferred(self):
+        response = self.client.get(reverse('books'), HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn(b'Book list', decompress(response.content, 'br'))
+
+    @override_settings(COMPRESSION_MIN_SIZE=10 ** 6)
+    def test_small_responses_are_left_alone(self):
+        response = self.client.get(reverse('books'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_exports_are_compressed(self):
+        User.objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('my-borrowed-export', args=['csv']), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        content = decompress(b''.join(response.streaming_content), 'gzip').decode()
+        self.assertTrue(content.startswith('copy,'))
+
+    def test_benchmark(self):
+        out = StringIO()
+        call_command('benchmark_compression', requests=1, routes=['books'], gzip_levels=[1], brotli_qualities=[1],
+                     stdout=out, stderr=StringIO())
+        books = json.loads(out.getvalue())['routes']['books']
+        self.assertLess(books['codecs']['gzip-1']['bytes'], books['identity_bytes'])
+        self.assertLess(books['served_bytes'], books['identity_bytes'])
+
+    def test_compressed_pages_revalidate(self):
+        etag = self.client.get(reverse('books'), HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('books'), HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+class SignedInValidatorsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        self.book = Book.objects.create(title='Title', summary='Summary', isbn='ABCDEFG', author=author)
+        User.objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+        User.objects.create_user(username='other', password='1X<ISRUkw+tuK')
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+
+    def test_user_pages_get_private_weak_etags(self):
+        response = self.client.get(self.book.get_absolute_url())
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.client.get(self.book.get_absolute_url(), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        # another user, or the book changed: rendered again
+        self.client.login(username='other', password='1X<ISRUkw+tuK')
+        self.assertEqual(self.client.get(self.book.get_absolute_url(), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        self.book.title = 'New title'
+        self.book.save()
+        self.assertEqual(self.client.get(self.book.get_absolute_url(), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
@@ -0,0 +1,108 @@
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog.facets import AUTHOR_FACET_SIZE, facet_counts, selected_facets
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.tests.utils import QueryBudgetMixin
+
+class BookFacetTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.smith = Author.objects.create(first_name='John', last_name='Smith')
+        self.doe = Author.objects.create(first_name='Jane', last_name='Doe')
+        self.fantasy = Genre.objects.create(name='Fantasy')
+        self.poetry = Genre.objects.create(name='Poetry')
+        self.english = Language.objects.create(name='English')
+        self.french = Language.objects.create(name='French')
+        for title, author, genres, language, status in (
+            ('Dragons', self.smith, (self.fantasy, self.poetry), self.english, 'a'),
+            ('Elves', self.smith, (self.fantasy,), self.french, 'm'),
+            ('Sonnets', self.doe, (self.poetry,), self.english, 'a'),
+        ):
+            book = Book.objects.create(title=title, summary='Summary', isbn='ABCDEFG', author=author, language=language)
+            book.genre.set(genres)
+            BookInstance.objects.create(book=book, imprint='Imprint', status=status)
+
+    def get(self, **params):
+        return self.client.get(reverse('books'), {'paginate_by': 10, **params})
+
+    def titles(self, **params):
+        return sorted(book.title for book in self.get(**params).context['book_list'])
+
+    def counts(self, **params):
+        return {
+            facet['param']: {option['label']: option['count'] for option in facet['options']}
+            for facet in self.get(**params).context['facets']
+        }
+
+    def test_values_of_a_facet_are_ored_without_duplicates(self):
+        genres = [self.fantasy.pk, self.poetry.pk]
+        self.assertEqual(self.titles(genre_select=genres), ['Dragons', 'Elves', 'Sonnets'])
+        self.assertEqual(self.titles(genre_select=self.poetry.pk), ['Dragons', 'Sonnets'])
+
+    def test_facets_are_anded(self):
+        self.assertEqual(self.titles(genre_select=self.fantasy.pk, language_select=self.english.pk), ['Dragons'])
+        self.assertEqual(self.titles(author_select=self.smith.pk, available='on'), ['Dragons'])
+        self.assertEqual(self.titles(book_title='o', author_select=self.doe.pk), ['Sonnets'])
+        # not ids: ignored
+        self.assertEqual(self.titles(genre_select='fantasy'), ['Dragons', 'Elves', 'Sonnets'])
+
+    def test_counts(self):
+        self.assertEqual(self.counts(), {
+            'genre_select': {'Fantasy': 2, 'Poetry': 2},
+            'language_select': {'English': 2, 'French': 1},
+            'author_select': {'Smith, John': 2, 'Doe, Jane': 1},
+            'available': {'Available copies only': 2},
+        })
+
+    def test_counts_leave_out_their_own_facet(self):
+        self.assertEqual(self.counts(genre_select=self.poetry.pk), {
+            'genre_select': {'Fantasy': 2, 'Poetry': 2},
+            'language_select': {'English': 2},
+            'author_select': {'Smith, John': 1, 'Doe, Jane': 1},
+            'available': {'Available copies only': 2},
+        })
+        self.assertEqual(self.counts(available='on')['genre_select'], {'Fantasy': 1, 'Poetry': 2})
+
+    def test_counts_follow_the_search(self):
+        self.assertEqual(self.counts(search='dragons')['author_select'], {'Smith, John': 1})
+
+    def test_only_the_top_authors_and_the_chosen_ones_are_offered(self):
+        authors = [Author.objects.create(first_name='Prolific', last_name=f'Author {number}')
+                   for number in range(AUTHOR_FACET_SIZE)]
+        for author in authors:
+            for _ in range(2):
+                Book.objects.create(title='More', summary='Summary', isbn='ABCDEFG', author=author)
+        labels = self.counts()['author_select']
+        self.assertEqual(len(labels), AUTHOR_FACET_SIZE)
+        self.assertNotIn('Doe, Jane', labels)
+        self.assertIn('Doe, Jane', self.counts(author_select=self.doe.pk)['author_select'])
+
+    def test_sidebar_shows_counts_and_chosen_values(self):
+        response = self.get(genre_select=self.poetry.pk)
+        self.assertContains(response, '(2)')
+        self.assertContains(
+            response,
+            f'<input class="form-check-input" type="checkbox" name="genre_select" value="{self.poetry.pk}" '
+            f'id="genre_select_{self.poetry.pk}" checked>',
+            html=True,
+        )
+
+    def test_counts_are_one_query(self):
+        def grow():
+            for number in range(20):
+                genre = Genre.objects.create(name=f'Genre {number}')
+                book = Book.objects.create(title=f'Book {number}', summary='Summary', isbn='ABCDEFG',
+                                           author=self.doe, language=self.french)
+                book.genre.add(genre, self.poetry)
+            cache.clear()
+
+        params = {'genre_select': [self.fantasy.pk, self.poetry.pk], 'available': 'on'}
+        selected = selected_facets(QueryDict(urlencode(params, doseq=True)))
+        with self.assertNumQueries(1):
+            self.assertEqual(len(facet_counts(Book.objects.all(), selected)), 4)
+        self.assertQueryBudget(6, reverse('books'), grow, params)
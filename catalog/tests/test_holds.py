@@ -0,0 +1,127 @@
+import datetime
+import itertools
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from catalog.holds import cancel_hold, place_hold
+from catalog.loans import process_loans
+from catalog.models import Author, Book, BookAvailability, BookInstance, Hold
+
+class HoldQueueTest(TestCase):
+    def setUp(self):
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        self.book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=author)
+        self.copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='o',
+                                                due_back=datetime.date.today())
+        self.patrons = [User.objects.create_user(username=f'patron{number}') for number in range(3)]
+
+    def test_returned_copy_goes_to_the_oldest_hold(self):
+        first, second, third = (place_hold(self.book, patron) for patron in self.patrons)
+        self.assertEqual([first.status, first.queue_position(), third.queue_position()], ['w', 1, 3])
+        self.assertEqual(place_hold(self.book, self.patrons[0]), first)
+
+        process_loans('return', [self.copy.pk])
+        first.refresh_from_db()
+        self.copy.refresh_from_db()
+        self.assertEqual((first.status, first.copy), ('r', self.copy))
+        self.assertEqual((self.copy.status, self.copy.borrower), ('r', self.patrons[0]))
+        self.assertEqual(BookAvailability.objects.get(book=self.book).reserved, 1)
+        second.refresh_from_db()
+        self.assertEqual(second.queue_position(), 1)
+
+        # only the patron it is held for can check the copy out
+        due_back = datetime.date.today() + datetime.timedelta(weeks=2)
+        self.assertFalse(process_loans('checkout', [self.copy.pk], self.patrons[1], due_back)[0].ok)
+        self.assertTrue(process_loans('checkout', [self.copy.pk], self.patrons[0], due_back)[0].ok)
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'f')
+
+    def test_cancelling_a_ready_hold_passes_the_copy_on(self):
+        first, second = (place_hold(self.book, patron) for patron in self.patrons[:2])
+        self.copy.status = 'a'
+        self.copy.save()
+        self.assertEqual(self.copy.status, 'r')
+        cancel_hold(first)
+        second.refresh_from_db()
+        self.copy.refresh_from_db()
+        self.assertEqual((first.status, second.status), ('c', 'r'))
+        self.assertEqual(self.copy.borrower, self.patrons[1])
+
+    def test_hold_is_ready_at_once_when_a_copy_is_available(self):
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        self.assertEqual(place_hold(self.book, self.patrons[0]).status, 'r')
+
+    def test_views(self):
+        self.client.force_login(self.patrons[0])
+        self.client.post(reverse('book-hold', args=[self.book.pk]))
+        response = self.client.get(reverse('my-borrowed'))
+        self.assertContains(response, 'number 1 in the queue')
+        hold = response.context['hold_list'][0]
+        self.assertEqual(self.client.get(reverse('hold-cancel', args=[hold.pk])).status_code, 405)
+        self.client.post(reverse('hold-cancel', args=[hold.pk]))
+        self.assertNotContains(self.client.get(reverse('my-borrowed')), 'in the queue')
+
+def retry_when_locked(function, *args):
+    # SQLite locks the whole database; writers that collide back off and try
+    # again. PostgreSQL takes row locks and waits instead, so this never
+    # triggers there.
+    deadline = time.monotonic() + 60
+    for attempt in itertools.count():
+        try:
+            return function(*args)
+        except OperationalError as e:
+            if 'locked' not in str(e) or time.monotonic() > deadline:
+                raise
+            time.sleep(random.uniform(0, min(0.05, 0.001 * 2 ** attempt)))
+
+class HoldStressTest(TransactionTestCase):
+    """Many threads placing holds on one book while its copies come back."""
+    copies = 8
+    patrons = 60
+
+    def setUp(self):
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        self.book = Book.objects.create(title='Popular', summary='Summary', isbn='ABCDEFG', author=author)
+        self.users = [User.objects.create_user(username=f'patron{number}') for number in range(self.patrons)]
+        self.copy_ids = [
+            BookInstance.objects.create(book=self.book, imprint='Imprint', status='o', borrower=self.users[0],
+                                        due_back=datetime.date.today()).pk
+            for _ in range(self.copies)
+        ]
+
+    def test_no_copy_is_given_twice(self):
+        tasks = [(place_hold, self.book, user) for user in self.users]
+        tasks += [(process_loans, 'return', [copy_id]) for copy_id in self.copy_ids]
+        # every third patron asks twice; the second request must find the first hold
+        tasks += [(place_hold, self.book, user) for user in self.users[::3]]
+        random.Random(15).shuffle(tasks)
+
+        def run(task):
+            function, *args = task
+            try:
+                retry_when_locked(function, *args)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(run, tasks))
+
+        holds = list(Hold.objects.filter(book=self.book).order_by('created', 'id'))
+        ready = [hold for hold in holds if hold.status == 'r']
+        self.assertEqual(len(holds), self.patrons)
+        self.assertEqual(len({hold.patron_id for hold in holds}), self.patrons)
+        self.assertEqual(len(ready), self.copies)
+        self.assertEqual(len({hold.copy_id for hold in ready}), self.copies)
+        # first come, first served
+        self.assertEqual(ready, holds[:self.copies])
+        for hold in ready:
+            copy = BookInstance.objects.get(pk=hold.copy_id)
+            self.assertEqual((copy.status, copy.borrower_id), ('r', hold.patron_id))
+        self.assertFalse(BookInstance.objects.filter(book=self.book).exclude(status='r').exists())
+        self.assertEqual(BookAvailability.objects.get(book=self.book).reserved, self.copies)
@@ -0,0 +1,97 @@
+import datetime
+import io
+import json
+
+from django.test import TestCase
+
+from catalog.importexport import export_catalog, import_catalog
+from catalog.models import Author, Book, BookInstance, CatalogStats, Genre, Language
+
+RECORDS = [
+    {
+        'title': 'The Hobbit', 'summary': 'There and back again', 'isbn': '9780261102217',
+        'author_first_name': 'John', 'author_last_name': 'Tolkien', 'language': 'English',
+        'genres': ['Fantasy', 'Children'],
+        'copies': [
+            {'imprint': 'Allen & Unwin, 1937', 'status': 'a', 'due_back': None},
+            {'imprint': 'Allen & Unwin, 1937', 'status': 'o', 'due_back': '2021-07-01'},
+        ],
+    },
+    {
+        'title': 'Dune', 'summary': 'Desert planet', 'isbn': '9780441172719',
+        'author_first_name': 'Frank', 'author_last_name': 'Herbert', 'language': 'English',
+        'genres': ['Science Fiction'], 'copies': [],
+    },
+]
+
+def jsonl(records):
+    return io.StringIO(''.join(json.dumps(record) + '\n' for record in records))
+
+class CatalogImportTest(TestCase):
+    def test_import_jsonl(self):
+        existing = Author.objects.create(first_name='John', last_name='Tolkien')
+        Genre.objects.create(name='Fantasy')
+        stats = import_catalog(jsonl(RECORDS), 'jsonl', batch_size=1)
+
+        self.assertEqual(stats['books'], 2)
+        self.assertEqual(stats['copies'], 2)
+        self.assertEqual(stats['authors'], 1)  # Tolkien already existed
+        self.assertEqual(stats['genres'], 2)
+        hobbit = Book.objects.get(isbn='9780261102217')
+        self.assertEqual(hobbit.author, existing)
+        self.assertEqual(hobbit.language, Language.objects.get(name='English'))
+        self.assertEqual(sorted(g.name for g in hobbit.genre.all()), ['Children', 'Fantasy'])
+        self.assertEqual(
+            sorted((c.status, c.due_back) for c in hobbit.bookinstance_set.all()),
+            [('a', None), ('o', datetime.date(2021, 7, 1))],
+        )
+        self.assertEqual(CatalogStats.counts()['num_books'], 2)
+
+    def test_existing_isbns_are_skipped(self):
+        import_catalog(jsonl(RECORDS[:1]), 'jsonl')
+        stats = import_catalog(jsonl(RECORDS + RECORDS), 'jsonl')
+        self.assertEqual(stats['books'], 1)
+        self.assertEqual(stats['skipped'], 3)
+        self.assertEqual(Book.objects.count(), 2)
+
+    def test_import_csv(self):
+        data = io.StringIO(
+            'title,author_first_name,author_last_name,summary,isbn,language,genres,copies,imprint,status\n'
+            'Dune,Frank,Herbert,Desert planet,9780441172719,English,Science Fiction;Classic,3,Chilton,a\n'
+        )
+        import_catalog(data, 'csv')
+        dune = Book.objects.get()
+        self.assertEqual(dune.genre.count(), 2)
+        self.assertEqual(BookInstance.objects.filter(book=dune, status='a', imprint='Chilton').count(), 3)
+
+    def test_import_marc(self):
+        data = io.StringIO(
+            '=245  The Hobbit\n=100  Tolkien, John\n=020  9780261102217\n=650  Fantasy\n'
+            '=520  There and back again\n=852  Allen & Unwin|o|2021-07-01\n\n'
+            '=245  Dune\n=100  Herbert, Frank\n=020  9780441172719\n'
+        )
+        import_catalog(data, 'marc')
+        self.assertEqual(str(Book.objects.get(isbn='9780261102217').author), 'Tolkien, John')
+        self.assertEqual(BookInstance.objects.get().due_back, datetime.date(2021, 7, 1))
+        self.assertEqual(Book.objects.count(), 2)
+
+class CatalogExportTest(TestCase):
+    def test_round_trip(self):
+        import_catalog(jsonl(RECORDS), 'jsonl')
+        for fmt in ('jsonl', 'marc'):
+            exported = ''.join(export_catalog(fmt, chunk_size=1))
+            Book.objects.all().delete()
+            import_catalog(io.StringIO(exported), fmt)
+            again = ''.join(export_catalog(fmt))
+            self.assertEqual(again, exported, fmt)
+
+        records = [json.loads(line) for line in export_catalog('jsonl')]
+        self.assertEqual([r['title'] for r in records], ['The Hobbit', 'Dune'])
+        self.assertEqual(sorted(records[0]['genres']), ['Children', 'Fantasy'])
+        self.assertEqual(len(records[0]['copies']), 2)
+
+    def test_csv_export(self):
+        import_catalog(jsonl(RECORDS), 'jsonl')
+        lines = ''.join(export_catalog('csv')).splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn('Science Fiction', lines[2])
@@ -0,0 +1,140 @@
+import time
+from unittest import mock
+
+from django.core.handlers.asgi import ASGIHandler
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from catalog.models import Author
+from locallibrary.db_connections import check_connections, connection_opened, stats
+from locallibrary.metrics import RollingHistogram, registry
+
+class RollingHistogramTest(TestCase):
+    def test_summary(self):
+        histogram = RollingHistogram(window=100)
+        for value in range(1, 201):
+            histogram.add(value)
+        summary = histogram.summary()
+        # only the last 100 samples (101..200) are kept
+        self.assertEqual(summary['count'], 100)
+        self.assertEqual(summary['p50'], 151)
+        self.assertEqual(summary['p99'], 200)
+        self.assertEqual(summary['max'], 200)
+        self.assertEqual(summary['buckets']['le_250'], 100)
+
+class RequestMetricsMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        User.objects.create_user(username='staff', password='1X<ISRUkw+tuK', is_staff=True)
+        User.objects.create_user(username='reader', password='2HJ1vRV0Z&3iD')
+
+    def setUp(self):
+        registry.reset()
+
+    def test_records_per_url_name(self):
+        self.client.get(reverse('author-detail', args=[self.author.pk]))
+        self.client.get(reverse('author-detail', args=[self.author.pk]))
+        metrics = registry.snapshot()['author-detail']
+        self.assertEqual(metrics['requests'], 2)
+        self.assertEqual(metrics['sql_count']['count'], 2)
+        self.assertGreaterEqual(metrics['sql_count']['max'], 1)
+        self.assertGreater(metrics['template_ms']['max'], 0)
+        self.assertGreaterEqual(metrics['total_ms']['p50'], metrics['template_ms']['p50'])
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('authors'))
+        self.assertRegex(response['Server-Timing'], r'^sql;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING=False)
+    def test_server_timing_header_can_be_disabled(self):
+        response = self.client.get(reverse('authors'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_metrics_endpoint_is_staff_only(self):
+        self.client.get(reverse('authors'))
+        self.client.login(username='reader', password='2HJ1vRV0Z&3iD')
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 302)
+
+        self.client.login(username='staff', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('authors', response.json())
+
+class AsyncMiddlewareTest(TestCase):
+    @override_settings(DEBUG=True)
+    def test_no_middleware_is_adapted_under_asgi(self):
+        # Django logs each middleware it has to run in a thread
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+    async def test_asgi_requests(self):
+        registry.reset()
+        # the async client takes header names as they are sent
+        response = await self.async_client.get(reverse('authors'), **{'accept-encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        # the view's queries ran in another thread, and were still counted
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+        self.assertEqual(registry.snapshot()['authors']['requests'], 1)
+
+class ConnectionHealthTest(TransactionTestCase):
+    def setUp(self):
+        stats.reset()
+        connection.ensure_connection()
+
+    def test_broken_connection_is_closed(self):
+        with mock.patch.object(connection, 'is_usable', return_value=False), \
+                mock.patch.object(connection, 'close') as close:
+            check_connections()
+        close.assert_called_once_with()
+        self.assertEqual(stats.snapshot()['default']['unhealthy'], 1)
+
+    @override_settings(DATABASE_HEALTH_CHECK_INTERVAL=60)
+    def test_checks_are_spaced_out(self):
+        connection.health_checked_at = time.monotonic()
+        with mock.patch.object(connection, 'is_usable') as is_usable:
+            check_connections()
+        is_usable.assert_not_called()
+
+    def test_lifetimes_are_staggered(self):
+        class Wrapper:
+            alias, connection, settings_dict, close_at = 'default', None, {'CONN_MAX_AGE': 100}, 1000
+        wrapper = Wrapper()
+        connection_opened(sender=None, connection=wrapper)
+        self.assertTrue(990 <= wrapper.close_at <= 1000)
+        self.assertEqual(stats.snapshot()['default']['opened'], 1)
+
+    def test_endpoint(self):
+        User.objects.create_user(username='staff', password='1X<ISRUkw+tuK', is_staff=True)
+        self.client.login(username='staff', password='1X<ISRUkw+tuK')
+        report = self.client.get(reverse('db-metrics')).json()
+        self.assertEqual(set(report['default']), {'max_age', 'open', 'oldest_s', 'opened', 'health_checks', 'unhealthy'})
+
+from locallibrary.template_profiling import profiles
+
+@override_settings(TEMPLATE_PROFILING=1)
+class TemplateProfilingTest(TestCase):
+    def setUp(self):
+        profiles.reset()
+
+    def test_render_time_by_template_and_tag(self):
+        self.client.get(reverse('index'))
+        report = profiles.snapshot()['index']
+        self.assertEqual(report['requests'], 1)
+        self.assertTrue({'index.html', 'base_generic.html'} <= set(report['templates_ms']))
+        self.assertTrue({'url', 'cache', 'variable', 'extends'} <= set(report['tags_ms']))
+
+    @override_settings(TEMPLATE_PROFILING=0)
+    def test_off(self):
+        self.client.get(reverse('index'))
+        self.assertEqual(profiles.snapshot(), {})
+
+    def test_endpoint(self):
+        self.assertEqual(self.client.get(reverse('template-metrics')).status_code, 302)
+        User.objects.create_user(username='staff', password='1X<ISRUkw+tuK', is_staff=True)
+        self.client.login(username='staff', password='1X<ISRUkw+tuK')
+        report = self.client.get(reverse('template-metrics')).json()
+        self.assertIn('template-metrics', report)
@@ -46,4 +46,117 @@ class AuthorModelTest(TestCase):
     def test_get_absolute_url(self):
         author = Author.objects.get(id=1)
         " This will also fail if the urlconf is not defined"
-        self.assertEqual(author.get_absolute_url(), '/catalog/author/1')
\ No newline at end of file
+        self.assertEqual(author.get_absolute_url(), '/catalog/author/1')
+from django.core.cache import cache
+
+from catalog.models import Book, BookInstance, CatalogStats, Genre
+
+class CatalogStatsModelTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = Author.objects.create(first_name='John', last_name='Smith')
+        self.book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=self.author)
+        Genre.objects.create(name='Fantasy')
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='o')
+
+    def test_counts_match_tables(self):
+        CatalogStats.objects.all().delete()
+        self.assertEqual(CatalogStats.counts(), {
+            'num_books': 1,
+            'num_instances': 2,
+            'num_instances_available': 1,
+            'num_authors': 1,
+            'num_genres': 1,
+        })
+
+    def test_counts_follow_creates_and_deletes(self):
+        CatalogStats.reconcile()
+        Author.objects.create(first_name='Jane', last_name='Doe')
+        Genre.objects.get(name='Fantasy').delete()
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        counts = CatalogStats.counts()
+        self.assertEqual(counts['num_authors'], 2)
+        self.assertEqual(counts['num_genres'], 0)
+        self.assertEqual(counts['num_instances'], 3)
+        self.assertEqual(counts['num_instances_available'], 2)
+
+    def test_available_count_follows_status_changes(self):
+        CatalogStats.reconcile()
+        copy = BookInstance.objects.get(status='o')
+        copy.status = 'a'
+        copy.save()
+        self.assertEqual(CatalogStats.counts()['num_instances_available'], 2)
+        copy.status = 'm'
+        copy.save()
+        self.assertEqual(CatalogStats.counts()['num_instances_available'], 1)
+        BookInstance.objects.get(status='a').delete()
+        self.assertEqual(CatalogStats.counts()['num_instances_available'], 0)
+
+    def test_counts_served_from_cache(self):
+        CatalogStats.counts()
+        with self.assertNumQueries(0):
+            CatalogStats.counts()
+
+import datetime
+
+from catalog.models import BookAvailability
+
+class BookAvailabilityModelTest(TestCase):
+    def setUp(self):
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        self.book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=author)
+        self.other = Book.objects.create(title='Other', summary='Summary', isbn='ABCDEFG', author=author)
+        self.due = datetime.date.today() + datetime.timedelta(days=3)
+        for status, due_back in (('a', None), ('a', None), ('o', self.due + datetime.timedelta(days=7)), ('o', self.due), ('r', None)):
+            BookInstance.objects.create(book=self.book, imprint='Imprint', status=status, due_back=due_back)
+
+    def summary(self, book):
+        row = BookAvailability.objects.get(book=book)
+        return (row.total, row.available, row.on_loan, row.reserved, row.maintenance, row.next_due)
+
+    def test_follows_copies(self):
+        self.assertEqual(self.summary(self.book), (5, 2, 2, 1, 0, self.due))
+        self.assertEqual(self.summary(self.other), (0, 0, 0, 0, 0, None))
+
+        copy = BookInstance.objects.get(status='o', due_back=self.due)
+        copy.status = 'm'
+        copy.save()
+        self.assertEqual(self.summary(self.book), (5, 2, 1, 1, 1, self.due + datetime.timedelta(days=7)))
+
+        copy = BookInstance.objects.filter(status='a').first()
+        copy.book = self.other
+        copy.save()
+        self.assertEqual(self.summary(self.book), (4, 1, 1, 1, 1, self.due + datetime.timedelta(days=7)))
+        self.assertEqual(self.summary(self.other), (1, 1, 0, 0, 0, None))
+
+        copy.delete()
+        self.assertEqual(self.summary(self.other), (0, 0, 0, 0, 0, None))
+
+    def test_imprint_change_does_not_refresh(self):
+        copy = BookInstance.objects.filter(book=self.book).first()
+        copy.imprint = 'Another Imprint'
+        with self.assertNumQueries(2):
+            # the UPDATE and the author lookup for the cached pages
+            copy.save()
+
+    def test_rebuild_after_bulk_writes(self):
+        BookInstance.objects.filter(status='a').update(status='o')
+        CatalogStats.reconcile()
+        self.assertEqual(self.summary(self.book), (5, 0, 4, 1, 0, self.due))
+        self.assertEqual(self.summary(self.other), (0, 0, 0, 0, 0, None))
+
+class BookInstanceOverdueTest(TestCase):
+    def setUp(self):
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=author)
+        today = datetime.date.today()
+        self.late = BookInstance.objects.create(book=book, imprint='Late', status='o', due_back=today - datetime.timedelta(days=1))
+        BookInstance.objects.create(book=book, imprint='Due today', status='o', due_back=today)
+        BookInstance.objects.create(book=book, imprint='Returned', status='a', due_back=today - datetime.timedelta(days=3))
+
+    def test_overdue_is_computed_in_the_database(self):
+        self.assertEqual(list(BookInstance.objects.overdue()), [self.late])
+        self.assertEqual(BookInstance.objects.overdue(datetime.date.today() + datetime.timedelta(days=1)).count(), 2)
+        copies = {copy.imprint: copy.is_overdue for copy in BookInstance.objects.with_overdue()}
+        self.assertEqual(copies, {'Late': True, 'Due today': False, 'Returned': False})
@@ -0,0 +1,90 @@
+import datetime
+
+from django.contrib.auth.models import Permission, User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from catalog.models import Author, Book, BookInstance
+from catalog.pagination import CursorPaginator, EstimatedCountPaginator, InvalidCursor
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG')
+        today = datetime.date.today()
+        for i in range(23):
+            # several copies share a due date and a few have none at all
+            due_back = None if i % 7 == 0 else today + datetime.timedelta(days=i % 4)
+            BookInstance.objects.create(book=book, imprint='Imprint', due_back=due_back, status='o')
+        cls.expected = sorted(
+            BookInstance.objects.all(),
+            key=lambda copy: (copy.due_back is None, copy.due_back or today, copy.id),
+        )
+
+    def walk_forward(self, paginator):
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        return pages
+
+    def test_forward_pages_cover_ordering_once(self):
+        paginator = CursorPaginator(BookInstance.objects.all(), 5, ('due_back', 'id'))
+        pages = self.walk_forward(paginator)
+        self.assertEqual([copy for page in pages for copy in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+        self.assertFalse(pages[0].has_previous())
+
+    def test_backward_pages_match_forward_pages(self):
+        paginator = CursorPaginator(BookInstance.objects.all(), 5, ('due_back', 'id'))
+        pages = self.walk_forward(paginator)
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = paginator.page(page.previous_cursor)
+            self.assertEqual(list(page), list(expected))
+        self.assertFalse(page.has_previous())
+
+    def test_descending_ordering(self):
+        for i in range(7):
+            Author.objects.create(first_name=f'First {i % 2}', last_name=f'Last {i % 3}')
+        expected = list(Author.objects.order_by('-last_name', 'first_name', 'id'))
+        paginator = CursorPaginator(Author.objects.all(), 3, ('-last_name', 'first_name', 'id'))
+        self.assertEqual([author for page in self.walk_forward(paginator) for author in page], expected)
+
+    def test_tampered_cursor_is_rejected(self):
+        paginator = CursorPaginator(BookInstance.objects.all(), 5, ('due_back', 'id'))
+        cursor = paginator.page().next_cursor
+        with self.assertRaises(InvalidCursor):
+            paginator.page(cursor[:-2] + 'xx')
+
+    def test_estimated_paginator_counts_exactly_without_planner_estimate(self):
+        paginator = EstimatedCountPaginator(BookInstance.objects.all(), 5)
+        self.assertEqual(paginator.count, 23)
+        self.assertEqual(len(paginator.page(2)), 5)
+
+class CursorPaginationViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(13):
+            Author.objects.create(first_name=f'Christian {i}', last_name=f'Surname {i:02d}')
+
+    @override_settings(CATALOG_PAGINATION_MODE='cursor')
+    def test_author_list_cursor_links(self):
+        response = self.client.get(reverse('authors'), {'paginate_by': 5})
+        page = response.context['page_obj']
+        self.assertEqual([a.last_name for a in page], [f'Surname {i:02d}' for i in range(5)])
+        self.assertContains(response, 'cursor=')
+
+        response = self.client.get(reverse('authors'), {'cursor': page.next_cursor})
+        self.assertEqual([a.last_name for a in response.context['author_list']], [f'Surname {i:02d}' for i in range(5, 10)])
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse('authors'), {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_links_are_windowed_and_keep_query(self):
+        for i in range(13, 80):
+            Author.objects.create(first_name=f'Christian {i}', last_name=f'Surname {i:02d}')
+        response = self.client.get(reverse('authors'), {'search': 'christian', 'page': 8, 'paginate_by': 5})
+        self.assertContains(response, '…')
+        self.assertContains(response, 'search=christian')
+        self.assertNotContains(response, 'page=4"')
@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from catalog.models import Book
+from locallibrary.routers import PIN_COOKIE, PrimaryPinMiddleware, ReplicaRouter, replica_may_lag, replica_reads
+
+router = ReplicaRouter()
+
+def routes(request):
+    """Where this request's reads and writes would go, and whether a fresh page could be cached."""
+    write_first = request.GET.get('write')
+    if write_first:
+        router.db_for_write(Book)
+    return HttpResponse(' '.join([
+        router.db_for_read(Book) or 'default',
+        router.db_for_read(User) or 'default',
+        str(replica_may_lag(time.time())),
+    ]))
+
+@replica_reads
+def replica_routes(request):
+    return routes(request)
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], DATABASE_REPLICA_PIN_SECONDS=10)
+class ReplicaRoutingTest(SimpleTestCase):
+    def request(self, method='get', view=replica_routes, cookies=None, **data):
+        request = getattr(RequestFactory(), method)('/', data)
+        request.COOKIES.update(cookies or {})
+        middleware = PrimaryPinMiddleware(lambda request: middleware.process_view(request, view, (), {}) or view(request))
+        response = middleware(request)
+        return response.content.decode().split(), response.cookies
+
+    def test_marked_views_read_catalog_from_a_replica(self):
+        (catalog, users, may_lag), cookies = self.request()
+        self.assertIn(catalog, ('replica1', 'replica2'))
+        self.assertEqual((users, may_lag), ('default', 'True'))
+        self.assertNotIn(PIN_COOKIE, cookies)
+
+    def test_everything_else_reads_the_primary(self):
+        self.assertEqual(self.request(view=routes)[0], ['default', 'default', 'False'])
+        self.assertEqual(self.request(method='post')[0][0], 'default')
+        self.assertEqual(self.request(cookies={PIN_COOKIE: '1'})[0][0], 'default')
+        # reads after a write in the same request see the write
+        self.assertEqual(self.request(write='1')[0][0], 'default')
+
+    def test_writers_are_pinned_to_the_primary(self):
+        _, cookies = self.request(method='post')
+        self.assertEqual(cookies[PIN_COOKIE]['max-age'], 10)
+        _, cookies = self.request(write='1')
+        self.assertIn(PIN_COOKIE, cookies)
+
+    def test_async_mode(self):
+        async def get_response(request):
+            await middleware.process_view(request, replica_routes, (), {})
+            return replica_routes(request)
+
+        middleware = PrimaryPinMiddleware(get_response)
+        # Django awaits both without handing them to a thread
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        self.assertTrue(asyncio.iscoroutinefunction(middleware.process_view))
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertIn(response.content.decode().split()[0], ('replica1', 'replica2'))
+        response = async_to_sync(middleware)(RequestFactory().get('/', {'write': '1'}))
+        self.assertEqual(response.content.decode().split()[0], 'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        self.assertEqual(self.request()[0][0], 'default')
+
+    def test_migrations_and_relations(self):
+        self.assertIs(router.allow_migrate('replica1', 'catalog'), False)
+        self.assertIsNone(router.allow_migrate('default', 'catalog'))
+        book, other = Book(), Book()
+        book._state.db, other._state.db = 'replica1', 'default'
+        self.assertTrue(router.allow_relation(book, other))
@@ -1,4 +1,5 @@
 from logging import log
+from django.core.cache import cache
 from django.http import response
 from django.test import TestCase
 from django.urls import reverse
@@ -17,6 +18,10 @@ class AuthorListViewTest(TestCase):
                 last_name=f'Surname {author_id}',
             )
 
+    def setUp(self):
+        # pages cached by earlier tests may show rows rolled back since
+        cache.clear()
+
     def test_view_url_exists_at_desired_location(self):
         response = self.client.get('/catalog/authors/')
         self.assertEqual(response.status_code, 200)
@@ -50,7 +55,7 @@ import datetime
 from django.utils import timezone
 from django.contrib.auth.models import User # Required to assign User as a borrower
 
-from catalog.models import BookInstance, Book, Genre, Language
+from catalog.models import BookInstance, Book, CatalogStats, Genre, Language
 
 class LoanedBookInstancesByUserListViewTest(TestCase):
     def setUp(self):
@@ -343,4 +348,367 @@ class AuthorCreateViewTest(TestCase):
         response = self.client.post(reverse('author-create'), {'first_name': 'Christian Name', 'last_name': 'Surname'})
         # Manually check redirect because we don't know what author was created
         self.assertEqual(response.status_code, 302)
-        self.assertTrue(response.url.startswith('/catalog/author/'))
\ No newline at end of file
+        self.assertTrue(response.url.startswith('/catalog/author/'))
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+class IndexViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        test_author = Author.objects.create(first_name='John', last_name='Smith')
+        test_book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG', author=test_author)
+        for status in ('a', 'o', 'm'):
+            BookInstance.objects.create(book=test_book, imprint='Unlikely Imprint, 2016', status=status)
+
+    def test_counts_in_context(self):
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['num_books'], 1)
+        self.assertEqual(response.context['num_instances'], 3)
+        self.assertEqual(response.context['num_instances_available'], 1)
+        self.assertEqual(response.context['num_authors'], 1)
+
+    def test_no_aggregate_queries(self):
+        self.client.get(reverse('index'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('index'))
+        self.assertFalse([q for q in queries.captured_queries if 'COUNT(' in q['sql'].upper()])
+
+class BookSearchViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tolkien = Author.objects.create(first_name='John', last_name='Tolkien')
+        herbert = Author.objects.create(first_name='Frank', last_name='Herbert')
+        cls.hobbit = Book.objects.create(title='The Hobbit', summary='A dragon guards treasure', isbn='9780261102217', author=tolkien)
+        cls.dune = Book.objects.create(title='Dune', summary='Desert planet and a dragon-free epic', isbn='9780441172719', author=herbert)
+        cls.dragons = Book.objects.create(title='Dragon Dragon Dragon', summary='Dragons', isbn='9780000000001', author=herbert)
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query):
+        response = self.client.get(reverse('books'), {'search': query, 'paginate_by': 50})
+        self.assertEqual(response.status_code, 200)
+        return list(response.context['book_list'])
+
+    def test_search_title_prefix(self):
+        self.assertEqual(self.search('hobb'), [self.hobbit])
+
+    def test_search_author_name(self):
+        self.assertEqual(set(self.search('herbert')), {self.dune, self.dragons})
+
+    def test_search_summary_and_isbn(self):
+        self.assertEqual(self.search('treasure'), [self.hobbit])
+        self.assertEqual(self.search('9780441172719'), [self.dune])
+
+    def test_search_orders_by_relevance(self):
+        self.assertEqual(self.search('dragon')[0], self.dragons)
+
+    def test_title_hit_outranks_summary_hit(self):
+        author = Author.objects.get(last_name='Herbert')
+        titled = Book.objects.create(title='The Castle of the Old Mountain King', isbn='9780000000002', author=author,
+                                     summary='A long journey across the northern hills and through the forests of the west')
+        mentioned = Book.objects.create(title='Walls', summary='Castle', isbn='9780000000003', author=author)
+        self.assertEqual(self.search('castle'), [titled, mentioned])
+
+    def test_search_operators_are_literal(self):
+        self.assertEqual(self.search('"dune" OR NEAR('), [])
+
+    def test_author_rename_updates_book_search(self):
+        author = Author.objects.get(last_name='Tolkien')
+        author.last_name = 'Tolkien-Reuel'
+        author.save()
+        self.assertEqual(self.search('reuel'), [self.hobbit])
+
+    def test_author_list_search(self):
+        response = self.client.get(reverse('authors'), {'search': 'tolk'})
+        self.assertEqual([str(a) for a in response.context['author_list']], ['Tolkien, John'])
+
+from catalog.tests.utils import QueryBudgetMixin
+
+class CatalogQueryBudgetTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.author = Author.objects.create(first_name='John', last_name='Smith')
+        self.language = Language.objects.create(name='English')
+        self.genres = [Genre.objects.create(name='Fantasy'), Genre.objects.create(name='Poetry')]
+        self.book = self.add_book()
+        self.librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        self.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+
+    def add_book(self):
+        author = Author.objects.create(first_name='Jane', last_name=f'Doe {Author.objects.count()}')
+        book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=author, language=self.language)
+        book.genre.set(self.genres)
+        return book
+
+    def add_copies(self, book=None):
+        for status in ('a', 'o', 'o'):
+            BookInstance.objects.create(
+                book=book or self.book,
+                imprint='Imprint',
+                status=status,
+                due_back=datetime.date.today(),
+                borrower=self.librarian,
+            )
+
+    def test_book_list(self):
+        self.assertQueryBudget(4, reverse('books'), lambda: [self.add_book() for _ in range(3)])
+
+    def test_book_detail(self):
+        self.assertQueryBudget(3, reverse('book-detail', args=[self.book.pk]), self.add_copies)
+
+    def test_author_detail(self):
+        def grow():
+            book = Book.objects.create(title='Another', summary='Summary', isbn='ABCDEFG', author=self.author)
+            self.add_copies(book)
+        self.assertQueryBudget(2, reverse('author-detail', args=[self.author.pk]), grow)
+
+    def test_loan_lists(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        self.add_copies()
+        self.assertQueryBudget(6, reverse('all-borrowed'), self.add_copies)
+        self.assertQueryBudget(5, reverse('my-borrowed'), self.add_copies)
+
+from catalog.management.commands.benchmark_urls import count_writes
+
+class AnonymousPreferencesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        for number in range(12):
+            Book.objects.create(title=f'Book {number}', summary='Summary', isbn='ABCDEFG', author=author)
+        # the counters' row is created on first use
+        CatalogStats.reconcile()
+
+    def test_anonymous_pages_write_nothing(self):
+        urls = [reverse('index'), reverse('index'), reverse('books') + '?paginate_by=10', reverse('books'), reverse('authors')]
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(count_writes(queries.captured_queries), 0, url)
+        self.assertNotIn('sessionid', self.client.cookies)
+
+    def test_preferences_are_remembered(self):
+        self.assertEqual(self.client.get(reverse('index')).context['num_visits'], 0)
+        self.assertEqual(self.client.get(reverse('index')).context['num_visits'], 1)
+        self.client.get(reverse('books'), {'paginate_by': 10})
+        self.assertEqual(len(self.client.get(reverse('books')).context['book_list']), 10)
+
+    def test_unchanged_preference_is_not_sent_again(self):
+        self.assertIn('catalog_prefs', self.client.get(reverse('books'), {'paginate_by': 10}).cookies)
+        self.assertNotIn('catalog_prefs', self.client.get(reverse('books'), {'paginate_by': 10}).cookies)
+
+    def test_invalid_page_size_is_ignored(self):
+        for value in ('abc', '100000'):
+            response = self.client.get(reverse('books'), {'paginate_by': value})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['book_list']), 5)
+
+class BookAvailabilityFilterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        self.books = {}
+        for title, statuses in (('None', 'om'), ('One', 'ao'), ('Two', 'aa'), ('Empty', '')):
+            book = self.books[title] = Book.objects.create(title=title, summary='Summary', isbn='ABCDEFG', author=author)
+            for status in statuses:
+                BookInstance.objects.create(book=book, imprint='Imprint', status=status,
+                                            due_back=datetime.date.today() if status == 'o' else None)
+
+    def titles(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('books'), {'paginate_by': 10, **params})
+        self.assertFalse([q for q in queries.captured_queries if 'catalog_bookinstance' in q['sql']])
+        return [book.title for book in response.context['book_list']]
+
+    def test_available_only(self):
+        self.assertEqual(sorted(self.titles(available='on')), ['One', 'Two'])
+
+    def test_sort_by_availability(self):
+        self.assertEqual(self.titles(sort='available'), ['Two', 'One', 'Empty', 'None'])
+
+    def test_cursor_pages_keep_the_sort(self):
+        author = Author.objects.get()
+        for number, status in enumerate('aoaomo'):
+            book = Book.objects.create(title=f'Extra {number}', summary='Summary', isbn='ABCDEFG', author=author)
+            BookInstance.objects.create(book=book, imprint='Imprint', status=status,
+                                        due_back=datetime.date.today() + datetime.timedelta(days=number) if status == 'o' else None)
+        for sort in ('available', 'due'):
+            with self.subTest(sort=sort):
+                expected = self.titles(sort=sort)
+                titles, cursor = [], ''
+                while cursor is not None:
+                    response = self.client.get(reverse('books'), {'paginate_by': 5, 'sort': sort, 'cursor': cursor})
+                    titles += [book.title for book in response.context['book_list']]
+                    cursor = response.context['page_obj'].next_cursor
+                self.assertEqual(titles, expected)
+
+    def test_list_shows_availability(self):
+        response = self.client.get(reverse('books'))
+        self.assertContains(response, '2 of 2 available')
+
+import json
+
+from catalog.models import BookAvailability
+
+class LoanDeskViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        self.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.patron = User.objects.create_user(username='patron', password='1X<ISRUkw+tuK')
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        self.book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=author)
+        self.copies = [
+            BookInstance.objects.create(book=self.book, imprint='Imprint', status=status)
+            for status in ('a', 'a', 'a', 'm')
+        ]
+        CatalogStats.reconcile()
+        self.due_back = datetime.date.today() + datetime.timedelta(weeks=2)
+
+    def post(self, **data):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        return self.client.post(reverse('loan-desk'), data)
+
+    def test_requires_permission(self):
+        response = self.client.get(reverse('loan-desk'))
+        self.assertRedirects(response, '/accounts/login/?next=/catalog/loans/')
+        self.client.login(username='patron', password='1X<ISRUkw+tuK')
+        self.assertEqual(self.client.get(reverse('loan-desk')).status_code, 403)
+
+    def test_checkout_and_return(self):
+        ids = '\n'.join(str(copy.pk) for copy in self.copies[:3])
+        response = self.post(action='checkout', copies=ids, borrower='patron', due_back=self.due_back)
+        self.assertContains(response, '3 copies processed, 0 failed')
+        self.assertEqual(BookInstance.objects.filter(status='o', borrower=self.patron, due_back=self.due_back).count(), 3)
+        self.assertEqual(CatalogStats.counts()['num_instances_available'], 0)
+        availability = BookAvailability.objects.get(book=self.book)
+        self.assertEqual((availability.available, availability.on_loan, availability.next_due), (0, 3, self.due_back))
+
+        response = self.post(action='return', copies=f'{self.copies[0].pk}, {self.copies[1].pk}')
+        self.assertContains(response, '2 copies processed, 0 failed')
+        self.assertEqual(BookInstance.objects.filter(status='a', borrower=None, due_back=None).count(), 2)
+        self.assertEqual(CatalogStats.counts()['num_instances_available'], 2)
+        self.assertEqual(BookAvailability.objects.get(book=self.book).available, 2)
+
+    def test_per_item_results(self):
+        ids = [str(self.copies[0].pk), str(self.copies[0].pk), str(self.copies[3].pk), 'not-a-copy', str(uuid.uuid4())]
+        response = self.post(action='checkout', copies=' '.join(ids), borrower='patron', due_back=self.due_back)
+        self.assertEqual(
+            [(result.ok, result.message) for result in response.context['results']],
+            [(True, 'OK'), (False, 'Listed twice'), (False, 'Not available (Maintenance)'),
+             (False, 'No such copy'), (False, 'No such copy')],
+        )
+        self.assertEqual(BookInstance.objects.filter(status='o').count(), 1)
+
+    def test_due_date_rules(self):
+        response = self.post(action='renew', copies=str(self.copies[0].pk), due_back=datetime.date.today() - datetime.timedelta(days=1))
+        self.assertFormError(response, 'form', 'due_back', 'Invalid date - renewal in past')
+        response = self.post(action='checkout', copies=str(self.copies[0].pk), due_back=self.due_back)
+        self.assertFormError(response, 'form', 'borrower', 'Required to check out')
+
+    def test_json(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        payload = {'action': 'checkout', 'copies': [str(copy.pk) for copy in self.copies], 'borrower': 'patron', 'due_back': str(self.due_back)}
+        response = self.client.post(reverse('loan-desk'), json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['processed'], response.json()['failed']), (3, 1))
+
+        payload['due_back'] = str(datetime.date.today() + datetime.timedelta(weeks=5))
+        response = self.client.post(reverse('loan-desk'), json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('due_back', response.json()['errors'])
+
+    def test_json_must_be_an_object(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        for body in ('[1, 2]', '"x"', 'null', '{'):
+            with self.subTest(body=body):
+                response = self.client.post(reverse('loan-desk'), body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('__all__', response.json()['errors'])
+
+class LoanedBooksOverdueFilterTest(TestCase):
+    def setUp(self):
+        librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG', author=author)
+        today = datetime.date.today()
+        self.copies = [
+            BookInstance.objects.create(book=book, imprint='Imprint', status='o', borrower=librarian,
+                                        due_back=today + datetime.timedelta(days=days))
+            for days in (-5, -1, 0, 3)
+        ]
+
+    def test_overdue_only(self):
+        response = self.client.get(reverse('all-borrowed'), {'overdue': 1})
+        self.assertEqual(list(response.context['bookinstance_list']), self.copies[:2])
+        self.assertTrue(all(copy.overdue for copy in response.context['bookinstance_list']))
+        self.assertContains(response, 'text-danger', count=2)
+
+    def test_sort_latest_due_first(self):
+        response = self.client.get(reverse('all-borrowed'), {'sort': '-due'})
+        self.assertEqual(list(response.context['bookinstance_list']), self.copies[::-1])
+        # keyset pages (an empty cursor is the first page) follow the same order
+        response = self.client.get(reverse('all-borrowed'), {'sort': '-due', 'overdue': 1, 'cursor': ''})
+        self.assertEqual(list(response.context['bookinstance_list']), self.copies[1::-1])
+
+import csv
+import io
+
+class LoanExportTest(TestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='2HJ1vRV0Z&3iD')
+        self.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        reader = User.objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        self.book = Book.objects.create(title='Book, "Title"', summary='Summary', isbn='ABCDEFG', author=author)
+        today = datetime.date.today()
+        self.late = BookInstance.objects.create(book=self.book, imprint='Imprint', status='o', borrower=reader,
+                                                due_back=today - datetime.timedelta(days=2))
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='o', borrower=self.librarian,
+                                    due_back=today + datetime.timedelta(days=2))
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+
+    def export(self, name, fmt, data=None):
+        response = self.client.get(reverse(name, args=[fmt]), data)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        response, content = self.export('all-borrowed-export', 'csv')
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertIn('attachment; filename="all-borrowed-', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([row['copy'] for row in rows][:1], [str(self.late.pk)])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual((rows[0]['title'], rows[0]['borrower'], rows[0]['overdue']), ('Book, "Title"', 'reader', 'True'))
+
+    def test_json_follows_the_list_filters(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        _, content = self.export('all-borrowed-export', 'json', {'overdue': 1})
+        self.assertEqual([row['copy'] for row in json.loads(content)], [str(self.late.pk)])
+        _, content = self.export('my-borrowed-export', 'json')
+        loans = json.loads(content)
+        self.assertEqual([(loan['borrower'], loan['overdue']) for loan in loans], [('librarian', False)])
+
+    def test_one_query_however_many_rows(self):
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        for count in (2, 40):
+            while BookInstance.objects.filter(status='o').count() < count:
+                BookInstance.objects.create(book=self.book, imprint='Imprint', status='o', borrower=self.librarian,
+                                            due_back=datetime.date.today())
+            with self.assertNumQueries(5):
+                # session, user, two for permissions, then the loans
+                _, content = self.export('all-borrowed-export', 'csv')
+            self.assertEqual(content.count('\n'), count + 1)
+
+    def test_access(self):
+        self.assertEqual(self.client.get(reverse('my-borrowed-export', args=['csv'])).status_code, 302)
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        self.assertEqual(self.client.get(reverse('all-borrowed-export', args=['csv'])).status_code, 403)
+        self.assertEqual(self.client.get(reverse('my-borrowed-export', args=['xml'])).status_code, 404)
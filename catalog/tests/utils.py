@@ -0,0 +1,22 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+class QueryBudgetMixin:
+    """TestCase mixin for checking that a page's query count doesn't grow with the data."""
+
+    def assertQueryBudget(self, budget, url, grow, data=None):
+        """Request url, call grow() to add rows, request it again.
+
+        Both requests must succeed, run the same number of queries and stay
+        within budget.
+        """
+        counts = []
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, data)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+            grow()
+        self.assertEqual(counts[0], counts[1], f'{url} ran {counts[0]} queries, then {counts[1]} with more rows')
+        self.assertLessEqual(counts[1], budget, f'{url} ran {counts[1]} queries, budget is {budget}')
+        return response
@@ -1,22 +1,50 @@
+from django.conf import settings
 from django.urls import path
 from django.views.generic.base import View
+from locallibrary.routers import replica_reads
 from . import views
 
-urlpatterns = [
-    path('', views.index, name='index'),
-    path('books/', views.BookListView.as_view(), name='books'),
-    path('book/<int:pk>', views.BookDetailView.as_view(), name='book-detail'),
-    path('authors/', views.AuthorListView.as_view(), name='authors'),
-    path('author/<int:pk>', views.AuthorDetailView.as_view(), name='author-detail'),
-]
+# The read-only pages below may be served from a read replica (see locallibrary.routers).
+
+if getattr(settings, 'CATALOG_ASYNC_VIEWS', False):
+    from . import async_views
+
+    urlpatterns = [
+        path('', replica_reads(async_views.index), name='index'),
+        path('books/', replica_reads(async_views.book_list), name='books'),
+        path('book/<int:pk>', replica_reads(async_views.book_detail), name='book-detail'),
+        path('authors/', replica_reads(async_views.author_list), name='authors'),
+        path('author/<int:pk>', replica_reads(async_views.author_detail), name='author-detail'),
+    ]
+else:
+    urlpatterns = [
+        path('', replica_reads(views.index), name='index'),
+        path('books/', replica_reads(views.BookListView.as_view()), name='books'),
+        path('book/<int:pk>', replica_reads(views.BookDetailView.as_view()), name='book-detail'),
+        path('authors/', replica_reads(views.AuthorListView.as_view()), name='authors'),
+        path('author/<int:pk>', replica_reads(views.AuthorDetailView.as_view()), name='author-detail'),
+    ]
 
 urlpatterns += [
     path('mybooks/', views.LoanedBooksByUserListView.as_view(), name='my-borrowed'),
     path('borrowed/', views.LoanedBooksAllListView.as_view(), name='all-borrowed'),
+    path('mybooks/export.<str:format>', views.LoanedBooksByUserExportView.as_view(), name='my-borrowed-export'),
+    path('borrowed/export.<str:format>', views.LoanedBooksAllExportView.as_view(), name='all-borrowed-export'),
 ]
 
 urlpatterns += [
     path('book/<uuid:pk>/renew/', views.renew_book_librarian, name='renew-book-librarian'),
+    path('loans/', views.loan_desk, name='loan-desk'),
+    path('book/<int:pk>/hold/', views.hold_book, name='book-hold'),
+    path('hold/<int:pk>/cancel/', views.cancel_hold, name='hold-cancel'),
+    path('autocomplete/<str:source>/', replica_reads(views.autocomplete), name='autocomplete'),
+]
+
+# The read-only JSON API (see catalog.api).
+urlpatterns += [
+    path('api/<str:resource>/', replica_reads(views.api_list), name='api-list'),
+    path('api/<str:resource>/batch/', replica_reads(views.api_batch), name='api-batch'),
+    path('api/<str:resource>/<str:pk>/', replica_reads(views.api_detail), name='api-detail'),
 ]
 
 urlpatterns += [
@@ -1,37 +1,25 @@
 from django.shortcuts import render
 
 # Create your views here.
-from .models import Book, Author, BookInstance, Genre, Language
+from .models import Book, Author, BookInstance, Genre, Language, CatalogStats
 
 def index(request):
     """View function for home page of site."""
 
-    # Generate counts of some of the main objects
-    num_books = Book.objects.all().count()
-    num_instances = BookInstance.objects.all().count()
-
-    # Available books (status = 'a')
-    num_instances_available = BookInstance.objects.filter(status__exact='a').count()
-
-    # The 'all()' is implied by default
-    num_authors = Author.objects.count()
-
-    # Genres
-    num_genres = Genre.objects.all().count()
+    # Counts of the main objects (num_books, num_instances, num_instances_available,
+    # num_authors, num_genres) are maintained by signals, so no COUNT(*) is run here.
+    counts = CatalogStats.counts()
 
     #  books that contain a word "a"
     # num_books_contain_a = Book.objects.filter(title__contains='a').count()
 
-    # Number of visits to this view, as in the session variable.
-    num_visits = request.session.get('num_visits', 0)
-    request.session['num_visits'] = num_visits + 1
+    # Number of visits to this view, kept in the preferences cookie so that
+    # counting them doesn't save the session on every visit.
+    num_visits = request.preferences.get('num_visits', 0)
+    request.preferences['num_visits'] = num_visits + 1
 
     context = {
-        'num_books': num_books,
-        'num_instances': num_instances_available,
-        'num_instances_available': num_instances_available,
-        'num_authors': num_authors,
-        'num_genres': num_genres,
+        **counts,
         # 'num_books_contain_a': num_books_contain_a,
         'num_visits': num_visits,
     }
@@ -40,12 +28,30 @@ def index(request):
     return render(request, 'index.html', context=context)
 
 from django.views import generic
-from django.db.models import Q
-from .forms import BookFilterForm, PaginateByForm
-
-class BookListView(generic.ListView):
+from django.db.models import Prefetch, Q
+from .forms import BookFilterForm
+from .facets import apply_facets, facet_counts, selected_facets
+from .search import search_authors, search_books
+from .mixins import CachedPageMixin, PageSizeMixin, PaginationModeMixin, RelatedObjectsMixin
+from .caching import AUTHORS, BOOKS, VOCABULARY, stamp_key
+from .pagination import nulls_last
+
+class BookListView(CachedPageMixin, RelatedObjectsMixin, PageSizeMixin, PaginationModeMixin, generic.ListView):
     model = Book
     paginate_by = 5
+    cache_stamps = (stamp_key(BOOKS),)
+    select_related = ('author', 'availability')
+
+    # ?sort= values; availability comes from BookAvailability, not BookInstance.
+    # They end with the id so cursor pages can seek on them too.
+    sort_orderings = {
+        'available': ('-availability__available', 'title', 'id'),
+        'due': ('availability__next_due', 'title', 'id'),
+    }
+
+    @property
+    def cursor_ordering(self):
+        return self.sort_orderings.get(self.request.GET.get('sort'), ('id',))
 
     def get_queryset(self):
 
@@ -69,14 +75,6 @@ class BookListView(generic.ListView):
         if filter_last_name:
             f_kwargs['author__last_name__icontains'] = filter_last_name
 
-        filter_genre = self.request.GET.get('genre_select')
-        if filter_genre:
-            f_kwargs['genre__pk'] = filter_genre
-
-        filter_language =  self.request.GET.get('language_select')
-        if filter_language:
-            f_kwargs['language__pk'] = filter_language
-
         queries = [] # Qオブジェクトを格納するリスト
 
         if f_kwargs:
@@ -90,86 +88,132 @@ class BookListView(generic.ListView):
                 base_query &= query
             book_list = book_list.filter(base_query)
 
-        print(book_list)
-
         if search:
-            # グローバル検索値からクエリを返す
-            return Book.objects.filter(Q(title__icontains=search) | Q(author__first_name__icontains=search) | Q(author__last_name__icontains=search))
+            # グローバル検索値からクエリを返す (関連度順)
+            book_list = search_books(search)
         elif search == '':
             # グローバル検索値が空白の時、すべてのオブジェクトを返す
-            return Book.objects.all()
+            book_list = Book.objects.all()
         else:
             # Filterの検索値からクエリを返す
-            return book_list
+            ordering = self.sort_orderings.get(self.request.GET.get('sort'))
+            if ordering:
+                book_list = book_list.order_by(*nulls_last(ordering))
+
+        # ジャンル・言語・著者・在庫のファセット (件数はfacet_countsで一度に数える)
+        self.facet_base = book_list
+        self.selected_facets = selected_facets(self.request.GET)
+        return self.with_related(apply_facets(book_list, self.selected_facets))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['book_filter_form'] = BookFilterForm(self.request.GET)
-        context['paginate_by_form'] = PaginateByForm(self.request.session)
+        context['facets'] = facet_counts(self.facet_base, self.selected_facets)
         return context
 
-    def get_paginate_by(self, queryset):
-        if 'paginate_by' in self.request.GET:
-            self.request.session['paginate_by'] = int(self.request.GET.get('paginate_by'))
-        if 'paginate_by' in self.request.session:
-            return self.request.session.get('paginate_by')
-        else:
-            print(int(self.request.GET.get('paginate_by', self.paginate_by)))
-            return int(self.request.GET.get('paginate_by', self.paginate_by))
-
-class BookDetailView(generic.DetailView):
+class BookDetailView(CachedPageMixin, RelatedObjectsMixin, generic.DetailView):
     model = Book
+    select_related = ('author', 'language', 'availability')
 
-class AuthorListView(generic.ListView):
+    def get_cache_stamps(self):
+        return [*super().get_cache_stamps(), stamp_key('book', self.kwargs['pk']), stamp_key(VOCABULARY)]
+
+    def get_prefetch_related(self):
+        # The copies are only read to render the book_copies fragment.
+        if self.fragment_cached('book_copies', self.kwargs['pk']):
+            return ('genre',)
+        return ('genre', 'bookinstance_set')
+
+class AuthorListView(CachedPageMixin, PageSizeMixin, PaginationModeMixin, generic.ListView):
     model = Author
     paginate_by = 5
+    cursor_ordering = ('last_name', 'first_name', 'id')
+    cache_stamps = (stamp_key(AUTHORS),)
 
     def get_queryset(self):
         search = self.request.GET.get('search')
 
         if search:
-            return Author.objects.filter(Q(first_name__icontains=search) | Q(last_name__icontains=search))
+            return search_authors(search)
         else:
             return Author.objects.all()
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context["paginate_by_form"] = PaginateByForm(self.request.session)
-        return context
+class AuthorDetailView(CachedPageMixin, RelatedObjectsMixin, generic.DetailView):
+    model = Author
 
-    def get_paginate_by(self, queryset):
-        if 'paginate_by' in self.request.GET:
-            self.request.session['paginate_by'] = int(self.request.GET.get('paginate_by'))
-        if 'paginate_by' in self.request.session:
-            return self.request.session.get('paginate_by')
-        else:
-            print(int(self.request.GET.get('paginate_by', self.paginate_by)))
-            return int(self.request.GET.get('paginate_by', self.paginate_by))
+    def get_cache_stamps(self):
+        return [*super().get_cache_stamps(), stamp_key('author', self.kwargs['pk'])]
 
-class AuthorDetailView(generic.DetailView):
-    model = Author
+    def get_prefetch_related(self):
+        if self.fragment_cached('author_books', self.kwargs['pk']):
+            return ()
+        # Each book is shown with its availability, read from BookAvailability.
+        return [Prefetch('book_set', queryset=Book.objects.select_related('availability'))]
 
 from django.contrib.auth.mixins import LoginRequiredMixin
 
-class LoanedBooksByUserListView(LoginRequiredMixin, generic.ListView):
+class LoanedBooksByUserListView(LoginRequiredMixin, RelatedObjectsMixin, PaginationModeMixin, generic.ListView):
     """Generic class-based view listing books on loan to current user."""
     model = BookInstance
     template_name = 'catalog/bookinstance_list_borrowed_user.html'
     paginate_by = 10
+    cursor_ordering = ('due_back', 'id')
+    select_related = ('book',)
 
     def get_queryset(self):
-        return BookInstance.objects.filter(borrower=self.request.user).filter(status__exact='o').order_by('due_back')
+        return self.with_related(BookInstance.objects.with_overdue().filter(borrower=self.request.user).on_loan().order_by('due_back'))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['hold_list'] = self.request.user.holds.filter(status__in=('w', 'r')).select_related('book').with_position()
+        return context
 
 from django.contrib.auth.mixins import PermissionRequiredMixin
 
-class LoanedBooksAllListView(PermissionRequiredMixin, generic.ListView):
+class LoanedBooksAllListView(PermissionRequiredMixin, RelatedObjectsMixin, PaginationModeMixin, generic.ListView):
     model = BookInstance
     permission_required = 'catalog.can_mark_returned'
     template_name = 'catalog/bookinstance_list_borrowed_all.html'
     paginate_by = 10
+    select_related = ('book', 'borrower')
+
+    # ?sort= values; both are served by bookinstance_status_due_idx
+    sort_orderings = {
+        'due': ('due_back', 'id'),
+        '-due': ('-due_back', '-id'),
+    }
+
+    @property
+    def cursor_ordering(self):
+        return self.sort_orderings.get(self.request.GET.get('sort'), self.sort_orderings['due'])
 
     def get_queryset(self):
-        return BookInstance.objects.filter(status__exact='o').order_by('due_back')
+        '''延滞の判定はテンプレートではなくデータベースで行う'''
+        copies = BookInstance.objects.with_overdue()
+        if self.request.GET.get('overdue'):
+            copies = copies.overdue()
+        else:
+            copies = copies.on_loan()
+        return self.with_related(copies.order_by(*self.cursor_ordering))
+
+from django.http import Http404
+
+from catalog.reports import FORMATS, export_loans
+
+class LoanExportMixin:
+    """Stream the view's whole list as CSV or JSON (see catalog.reports) instead of a page."""
+    export_filename = 'loans'
+
+    def get(self, request, *args, **kwargs):
+        if self.kwargs['format'] not in FORMATS:
+            raise Http404(f"Unknown export format {self.kwargs['format']!r}")
+        return export_loans(self.get_queryset(), self.kwargs['format'], self.export_filename)
+
+class LoanedBooksByUserExportView(LoanExportMixin, LoanedBooksByUserListView):
+    export_filename = 'my-borrowed'
+
+class LoanedBooksAllExportView(LoanExportMixin, LoanedBooksAllListView):
+    export_filename = 'all-borrowed'
 
 import datetime
 
@@ -196,7 +240,7 @@ def renew_book_librarian(request, pk):
         if form.is_valid():
             # process the data in form.cleaned_data as required (here we just write it to the model due_back field)
             book_instance.due_back = form.cleaned_data['renewal_date']
-            book_instance.save()
+            book_instance.save(update_fields=['due_back'])
 
             # redirect to a new URL
             return HttpResponseRedirect(reverse('all-borrowed'))
@@ -213,6 +257,140 @@ def renew_book_librarian(request, pk):
 
     return render(request, 'catalog/book_renew_librarian.html', context)
 
+import json
+
+from django.http import JsonResponse
+
+from catalog.forms import LoanBatchForm
+from catalog.loans import process_loans
+
+@login_required
+@permission_required('catalog.can_mark_returned', raise_exception=True)
+def loan_desk(request):
+    """Check out, return or renew many copies in one request.
+
+    Accepts the form on the page, or a JSON body with the same fields (copies
+    as a list) from scanners and scripts, which is answered with JSON.
+    """
+    wants_json = request.content_type == 'application/json'
+    results = None
+
+    if request.method == 'POST':
+        if wants_json:
+            try:
+                data = json.loads(request.body)
+            except ValueError:
+                return JsonResponse({'errors': {'__all__': ['Invalid JSON']}}, status=400)
+            if not isinstance(data, dict):
+                return JsonResponse({'errors': {'__all__': ['Expected a JSON object']}}, status=400)
+            if isinstance(data.get('copies'), list):
+                data['copies'] = '\n'.join(str(copy_id) for copy_id in data['copies'])
+        else:
+            data = request.POST
+        form = LoanBatchForm(data)
+
+        if form.is_valid():
+            results = process_loans(
+                form.cleaned_data['action'],
+                form.cleaned_data['copies'],
+                borrower=form.cleaned_data['borrower'],
+                due_back=form.cleaned_data['due_back'],
+            )
+            if wants_json:
+                return JsonResponse({
+                    'processed': sum(1 for result in results if result.ok),
+                    'failed': sum(1 for result in results if not result.ok),
+                    'results': [
+                        {'copy': str(result.copy_id), 'ok': result.ok, 'message': result.message}
+                        for result in results
+                    ],
+                })
+            # keep the action, borrower and date for the next cart
+            form = LoanBatchForm(initial={
+                'action': form.cleaned_data['action'],
+                'borrower': form.cleaned_data['borrower'].username if form.cleaned_data['borrower'] else '',
+                'due_back': form.cleaned_data['due_back'],
+            })
+        elif wants_json:
+            return JsonResponse({'errors': form.errors}, status=400)
+
+    # if this is a GET (or any other method) create the default form.
+    else:
+        proposed_due_date = datetime.date.today() + datetime.timedelta(weeks=3)
+        form = LoanBatchForm(initial={'action': 'return', 'due_back': proposed_due_date})
+
+    context = {
+        'form': form,
+        'results': results,
+        'failed': [result for result in results if not result.ok] if results else [],
+    }
+
+    return render(request, 'catalog/bookinstance_loan_desk.html', context)
+
+from django.views.decorators.http import require_POST
+
+from catalog import holds
+from catalog.models import Hold
+
+@login_required
+@require_POST
+def hold_book(request, pk):
+    """Join the queue for a copy of the book (see catalog.holds)."""
+    holds.place_hold(get_object_or_404(Book, pk=pk), request.user)
+    return HttpResponseRedirect(reverse('my-borrowed'))
+
+@login_required
+@require_POST
+def cancel_hold(request, pk):
+    """Leave the queue; a copy already reserved goes to the next patron."""
+    holds.cancel_hold(get_object_or_404(Hold, pk=pk, patron=request.user))
+    return HttpResponseRedirect(reverse('my-borrowed'))
+
+from .autocomplete import DEFAULT_LIMIT, MAX_LIMIT, SOURCES
+
+def autocomplete(request, source):
+    """One page of the objects whose names start with ?q=, as JSON for the autocomplete widgets.
+
+    ?limit= (at most MAX_LIMIT) and ?offset= page through the matches; "more"
+    says whether there is another page.
+    """
+    if source not in SOURCES:
+        raise Http404(f'Unknown autocomplete source {source!r}')
+    try:
+        limit = min(int(request.GET.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        offset = int(request.GET.get('offset', 0))
+    except ValueError:
+        return JsonResponse({'errors': {'__all__': ['limit and offset must be integers']}}, status=400)
+    if limit < 1 or offset < 0:
+        return JsonResponse({'errors': {'__all__': ['limit must be positive and offset not negative']}}, status=400)
+    objects, more = SOURCES[source].search(request.GET.get('q', ''), offset, limit)
+    return JsonResponse({
+        'results': [{'id': obj.pk, 'text': str(obj)} for obj in objects],
+        'more': more,
+    })
+
+from django.views.decorators.http import require_safe
+
+from . import api
+
+@require_safe
+@api.json_api
+def api_list(request, resource):
+    """A page of the resource's objects as JSON (see catalog.api)."""
+    return api.list_objects(request, resource)
+
+@require_safe
+@api.json_api
+def api_batch(request, resource):
+    """The resource's objects with the ?ids= given, as JSON."""
+    return api.batch_objects(request, resource)
+
+@require_safe
+@api.json_api
+def api_detail(request, resource, pk):
+    """One of the resource's objects as JSON."""
+    return api.get_object(request, resource, pk)
+
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 
@@ -0,0 +1,40 @@
+"""Select widgets whose options are looked up as the visitor types.
+
+A plain Select lists every row of the related table in the page. These
+widgets render only the selected options and leave the rest to
+static/js/autocomplete.js, which fetches matches from the autocomplete
+endpoint (see catalog.autocomplete), so the cost of rendering a form doesn't
+grow with the table.
+"""
+from django import forms
+from django.urls import reverse
+
+class AutocompleteSelect(forms.Select):
+    def __init__(self, source, attrs=None):
+        super().__init__(attrs)
+        self.source = source
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['data-autocomplete-url'] = reverse('autocomplete', args=[self.source])
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        # self.choices is the field's ModelChoiceIterator; only the selected
+        # objects are read from its queryset.
+        selected = [v for v in value if v not in ('', None)]
+        options = []
+        if not self.allow_multiple_selected:
+            options.append(self.create_option(name, '', self.choices.field.empty_label or '', not selected, 0))
+        if selected:
+            try:
+                objects = list(self.choices.queryset.filter(pk__in=selected))
+            except (TypeError, ValueError):
+                # not a key (e.g. typed into the query string); the field reports it
+                objects = []
+            for obj in objects:
+                options.append(self.create_option(name, obj.pk, str(obj), True, len(options)))
+        return [(None, options, 0)]
+
+class AutocompleteSelectMultiple(AutocompleteSelect, forms.SelectMultiple):
+    pass
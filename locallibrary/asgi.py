@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'locallibrary.settings')
+# Route the catalog's read-only pages to their async variants (catalog.async_views).
+os.environ.setdefault('CATALOG_ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
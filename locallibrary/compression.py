@@ -0,0 +1,137 @@
+"""Brotli or gzip compression of the pages, JSON and CSV the site generates.
+
+CompressionMiddleware compresses a response when the client accepts it, its
+type is textual and it is at least COMPRESSION_MIN_SIZE bytes. Brotli
+(COMPRESSION_BROTLI_QUALITY) is preferred when the Brotli package is
+installed, gzip (COMPRESSION_GZIP_LEVEL) otherwise. Streaming responses (such
+as the loan exports) are compressed a chunk at a time, and each chunk is
+flushed so it still reaches the client without waiting for the next.
+
+Static files are served by WhiteNoise, precompressed, before this middleware
+runs. Strong ETags are made weak, since the compressed body is not the one the
+tag was computed for. Conditional requests are answered before anything is
+rendered by catalog.mixins.CachedPageMixin, from version stamps.
+"""
+import gzip
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from .middleware import SyncAndAsyncMiddleware
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+
+ACCEPT_ENCODING = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*(?:,|$)')
+
+def accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header."""
+    encodings = {}
+    for coding, q in ACCEPT_ENCODING.findall(header or ''):
+        try:
+            encodings[coding.lower()] = float(q) if q else 1.0
+        except ValueError:
+            continue
+    return encodings
+
+def choose_encoding(header):
+    """'br', 'gzip' or None: the best coding we can produce that the client accepts."""
+    accepted = accepted_encodings(header)
+    available = ('br', 'gzip') if brotli is not None else ('gzip',)
+    best, best_q = None, 0
+    for coding in available:
+        q = accepted.get(coding, accepted.get('*', 0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+def gzip_level():
+    return getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6)
+
+def brotli_quality():
+    return getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+
+def compress(content, encoding, level=None):
+    if encoding == 'br':
+        return brotli.compress(content, quality=brotli_quality() if level is None else level)
+    return gzip.compress(content, compresslevel=gzip_level() if level is None else level, mtime=0)
+
+def decompress(content, encoding):
+    """content as it was before compress() (encoding None: not compressed)."""
+    if encoding == 'br':
+        return brotli.decompress(content)
+    if encoding == 'gzip':
+        return gzip.decompress(content)
+    return content
+
+def compress_stream(chunks, encoding, level=None):
+    """Compress an iterator of chunks, flushing after each one."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=brotli_quality() if level is None else level)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(gzip_level() if level is None else level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+def compressible(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return (
+        response.status_code == 200
+        and not response.has_header('Content-Encoding')
+        and 'no-transform' not in response.get('Cache-Control', '')
+        and content_type.startswith(COMPRESSIBLE_TYPES)
+    )
+
+class CompressionMiddleware(SyncAndAsyncMiddleware):
+    def handle(self, request):
+        return self.process_response(request, self.get_response(request))
+
+    async def ahandle(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if not compressible(response):
+            return response
+        # the response depends on Accept-Encoding whether or not it is compressed
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            if len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 512):
+                return response
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,113 @@
+"""Persistent database connections: health checks, staggered lifetimes and metrics.
+
+Django keeps a thread's connection open between requests for CONN_MAX_AGE
+seconds (DATABASE_CONN_MAX_AGE; 0 connects per request), so each worker
+process holds a small pool of its own: one connection per database and
+thread. ConnectionHealthMiddleware adds what Django 3.2 lacks:
+
+* a health check of each kept connection before a request uses it
+  (DATABASE_HEALTH_CHECKS), so a connection broken by a database failover or
+  restart is replaced instead of failing the request;
+* jitter on the lifetime, so workers started together don't all reconnect
+  at once;
+* counters and the current pool size, served as JSON at /metrics/db/.
+
+Pooling across processes is PgBouncer's job; DATABASE_POOLER=pgbouncer turns
+off server-side cursors, which transaction pooling can't keep.
+"""
+import random
+import threading
+import time
+import weakref
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .middleware import SyncAndAsyncMiddleware
+
+# Connections live between (1 - LIFETIME_JITTER) * CONN_MAX_AGE and CONN_MAX_AGE seconds.
+LIFETIME_JITTER = 0.1
+
+class ConnectionStats:
+    """Connection counters of this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self.wrappers = weakref.WeakSet()
+
+    def increment(self, alias, name):
+        with self.lock:
+            self.counters[alias, name] += 1
+
+    def opened(self, wrapper):
+        wrapper.opened_at = wrapper.health_checked_at = time.monotonic()
+        with self.lock:
+            self.counters[wrapper.alias, 'opened'] += 1
+            self.wrappers.add(wrapper)
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self.lock:
+            counters = dict(self.counters)
+            wrappers = list(self.wrappers)
+        report = {}
+        for alias in connections:
+            ages = [now - wrapper.opened_at for wrapper in wrappers
+                    if wrapper.alias == alias and wrapper.connection is not None]
+            report[alias] = {
+                'max_age': connections.databases[alias].get('CONN_MAX_AGE', 0),
+                'open': len(ages),
+                'oldest_s': round(max(ages), 1) if ages else None,
+                **{name: counters.get((alias, name), 0) for name in ('opened', 'health_checks', 'unhealthy')},
+            }
+        return report
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+
+stats = ConnectionStats()
+
+def connection_opened(sender, connection, **kwargs):
+    if connection.close_at is not None:
+        max_age = connection.settings_dict['CONN_MAX_AGE']
+        connection.close_at -= random.uniform(0, max_age * LIFETIME_JITTER)
+    stats.opened(connection)
+
+connection_created.connect(connection_opened, dispatch_uid='locallibrary.db_connections')
+
+def check_connections():
+    """Close this thread's kept connections that no longer work; they reopen on first use."""
+    interval = getattr(settings, 'DATABASE_HEALTH_CHECK_INTERVAL', 0)
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if now - getattr(connection, 'health_checked_at', 0) < interval:
+            continue
+        connection.health_checked_at = now
+        stats.increment(connection.alias, 'health_checks')
+        if not connection.is_usable():
+            stats.increment(connection.alias, 'unhealthy')
+            connection.close()
+
+class ConnectionHealthMiddleware(SyncAndAsyncMiddleware):
+    """Health-check the kept database connections before each request.
+
+    Under ASGI the check runs, briefly, in the thread Django runs sync code in,
+    since that thread holds the connections.
+    """
+
+    def handle(self, request):
+        if getattr(settings, 'DATABASE_HEALTH_CHECKS', True):
+            check_connections()
+        return self.get_response(request)
+
+    async def ahandle(self, request):
+        if getattr(settings, 'DATABASE_HEALTH_CHECKS', True):
+            await sync_to_async(check_connections, thread_sensitive=True)()
+        return await self.get_response(request)
@@ -0,0 +1,75 @@
+"""In-memory request metrics, aggregated per view over a rolling window.
+
+Each worker process keeps its own registry; the numbers describe the last
+WINDOW requests served by that process for each view.
+"""
+import bisect
+import threading
+from collections import defaultdict, deque
+
+WINDOW = 1000
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is unbounded.
+BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+class RollingHistogram:
+    """The last `window` samples of one measurement."""
+
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+
+    def add(self, value):
+        self.samples.append(value)
+
+    def summary(self):
+        samples = sorted(self.samples)
+        if not samples:
+            return {'count': 0}
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))], 3)
+
+        buckets = [0] * (len(BUCKETS) + 1)
+        for value in samples:
+            buckets[bisect.bisect_left(BUCKETS, value)] += 1
+        return {
+            'count': len(samples),
+            'mean': round(sum(samples) / len(samples), 3),
+            'p50': percentile(0.50),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+            'max': round(samples[-1], 3),
+            'buckets': dict(zip([f'le_{bound}' for bound in BUCKETS] + ['inf'], buckets)),
+        }
+
+class MetricsRegistry:
+    """Rolling histograms keyed by view name and measurement."""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.histograms = defaultdict(lambda: defaultdict(lambda: RollingHistogram(self.window)))
+
+    def record(self, view_name, **measurements):
+        with self.lock:
+            self.requests[view_name] += 1
+            for name, value in measurements.items():
+                self.histograms[view_name][name].add(value)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                view_name: {
+                    'requests': self.requests[view_name],
+                    **{name: histogram.summary() for name, histogram in sorted(histograms.items())},
+                }
+                for view_name, histograms in sorted(self.histograms.items())
+            }
+
+    def reset(self):
+        with self.lock:
+            self.requests.clear()
+            self.histograms.clear()
+
+registry = MetricsRegistry()
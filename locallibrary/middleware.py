@@ -0,0 +1,169 @@
+import asyncio
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .metrics import registry
+from .template_profiling import TemplateProfile, current_profile, install, profiles
+
+# The RequestTimer of the request being handled, for code outside the middleware
+# (e.g. the template backend) to report into.
+current_timer = ContextVar('current_timer', default=None)
+
+class RequestTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_time += time.perf_counter() - start
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+def time_sql(execute, sql, params, many, context):
+    """Report a query to the timer of the request it runs for, if any.
+
+    Every connection runs its queries through this (see install_sql_timer), so
+    they are counted whichever thread runs them: sync_to_async() carries
+    current_timer into its threads.
+    """
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer.sql_wrapper(execute, sql, params, many, context)
+
+def install_sql_timer(sender, connection, **kwargs):
+    # first, so that execute_wrapper() blocks, which pop the last wrapper, leave it alone
+    if time_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, time_sql)
+
+# catalog.apps imports this module at startup, before any connection is opened
+connection_created.connect(install_sql_timer, dispatch_uid='locallibrary.middleware')
+
+class SyncAndAsyncMiddleware:
+    """Base for the site's middleware, which Django can run in either mode.
+
+    Under ASGI get_response is a coroutine function. __call__ then returns the
+    coroutine ahandle(request) for Django to await in the event loop, as
+    Django's MiddlewareMixin does, rather than Django running the middleware,
+    and the rest of the chain inside it, in a thread. Subclasses implement
+    handle() and ahandle().
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # lets Django recognise the instance itself as a coroutine function
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.ahandle(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        raise NotImplementedError
+
+    async def ahandle(self, request):
+        raise NotImplementedError
+
+class StaticFilesMiddleware(SyncAndAsyncMiddleware, WhiteNoiseMiddleware):
+    """WhiteNoise, able to run in the event loop.
+
+    Looking a file up is a dictionary lookup, unless WHITENOISE_AUTOREFRESH (on
+    with DEBUG) has it look on disk, which is left to a thread.
+    """
+
+    def __init__(self, get_response):
+        WhiteNoiseMiddleware.__init__(self, get_response)
+        SyncAndAsyncMiddleware.__init__(self, get_response)
+
+    def handle(self, request):
+        return WhiteNoiseMiddleware.__call__(self, request)
+
+    async def ahandle(self, request):
+        if self.autorefresh:
+            response = await sync_to_async(self.process_request, thread_sensitive=True)(request)
+        else:
+            response = self.process_request(request)
+        return response or await self.get_response(request)
+
+class RequestMetricsMiddleware(SyncAndAsyncMiddleware):
+    """Measure SQL count/time, template render time and total time per request.
+
+    Measurements are aggregated per URL name in locallibrary.metrics.registry
+    (see the staff-only /metrics/ endpoint); a TEMPLATE_PROFILING share of
+    requests is also profiled per template and tag (see
+    locallibrary.template_profiling). Unless REQUEST_METRICS_SERVER_TIMING is
+    False, the timings are also reported to the client in a Server-Timing
+    header.
+    """
+
+    def handle(self, request):
+        timer, profile, tokens = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(tokens)
+        return self.finish(request, response, timer, profile)
+
+    async def ahandle(self, request):
+        timer, profile, tokens = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop(tokens)
+        return self.finish(request, response, timer, profile)
+
+    def start(self):
+        timer = RequestTimer()
+        profile = None
+        sample_rate = getattr(settings, 'TEMPLATE_PROFILING', 0)
+        if sample_rate and random.random() < sample_rate:
+            install()
+            profile = TemplateProfile()
+        return timer, profile, (current_timer.set(timer), current_profile.set(profile))
+
+    def stop(self, tokens):
+        timer_token, profile_token = tokens
+        current_profile.reset(profile_token)
+        current_timer.reset(timer_token)
+
+    def finish(self, request, response, timer, profile):
+        total_ms = timer.total_time * 1000
+        sql_ms = timer.sql_time * 1000
+        template_ms = timer.template_time * 1000
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        if profile is not None:
+            profiles.record(view_name, profile)
+        registry.record(
+            view_name,
+            sql_count=timer.sql_count,
+            sql_ms=sql_ms,
+            template_ms=template_ms,
+            total_ms=total_ms,
+        )
+        if getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', True):
+            response['Server-Timing'] = ', '.join([
+                f'sql;dur={sql_ms:.2f};desc="{timer.sql_count} queries"',
+                f'tpl;dur={template_ms:.2f}',
+                f'total;dur={total_ms:.2f}',
+            ])
+        return response
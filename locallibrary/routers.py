@@ -0,0 +1,109 @@
+"""Read-replica routing for the catalog's read-only pages.
+
+Views marked with @replica_reads read the catalog app's tables from one of
+settings.DATABASE_REPLICAS (picked per request); every other read, every
+write, and everything outside the catalog app (sessions, users) stays on
+'default', the primary. A client that writes is pinned to the primary for
+DATABASE_REPLICA_PIN_SECONDS by a cookie, so it reads its own changes while
+the replicas catch up. Replicas are configured from DATABASE_REPLICA_URLS
+(see settings and README).
+"""
+import asyncio
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .middleware import SyncAndAsyncMiddleware
+
+PIN_COOKIE = 'db_pin'
+
+class RoutingState:
+    def __init__(self, replica=None):
+        self.replica = replica
+        self.wrote = False
+
+# The RoutingState of the request being handled (None outside requests).
+current_state = ContextVar('current_routing_state', default=None)
+
+def replica_reads(view):
+    """Mark view (a function, or the result of as_view()) as safe to serve from a replica."""
+    view.replica_reads = True
+    return view
+
+def replica_may_lag(since):
+    """Whether this request reads from a replica that may not have the changes made at since (a timestamp)."""
+    state = current_state.get()
+    return bool(state and state.replica) and time.time() - since < settings.DATABASE_REPLICA_PIN_SECONDS
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = current_state.get()
+        if state and state.replica and not state.wrote and model._meta.app_label == 'catalog':
+            return state.replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = current_state.get()
+        if state:
+            # read our own writes for the rest of the request
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # replicas get their schema from the primary
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+class PrimaryPinMiddleware(SyncAndAsyncMiddleware):
+    """Route marked views' reads to a replica unless the client recently wrote."""
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if asyncio.iscoroutinefunction(get_response):
+            # Django would run a sync process_view in a thread
+            self.process_view = self.aprocess_view
+
+    def handle(self, request):
+        state = RoutingState()
+        token = current_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_state.reset(token)
+        return self.process_response(request, response, state)
+
+    async def ahandle(self, request):
+        state = RoutingState()
+        token = current_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_state.reset(token)
+        return self.process_response(request, response, state)
+
+    def process_response(self, request, response, state):
+        if state.wrote or request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        replicas = settings.DATABASE_REPLICAS
+        if (replicas and getattr(view_func, 'replica_reads', False)
+                and request.method in ('GET', 'HEAD') and PIN_COOKIE not in request.COOKIES):
+            current_state.get().replica = random.choice(replicas)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        PrimaryPinMiddleware.process_view(self, request, view_func, view_args, view_kwargs)
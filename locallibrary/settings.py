@@ -42,13 +42,19 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.humanize',
     'catalog.apps.CatalogConfig', # register the catalog application
 ]
 
 MIDDLEWARE = [
+    'locallibrary.db_connections.ConnectionHealthMiddleware', # replace broken kept connections (see /metrics/db/)
+    'locallibrary.middleware.RequestMetricsMiddleware', # per-view SQL/template/total timings (see /metrics/)
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware', # install WhiteNoise to our Django application
+    'locallibrary.middleware.StaticFilesMiddleware', # WhiteNoise, able to run in the event loop under ASGI
+    'locallibrary.compression.CompressionMiddleware', # Brotli/gzip for pages and exports (static files are precompressed)
+    'locallibrary.routers.PrimaryPinMiddleware', # catalog reads from replicas, unless the client just wrote
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'catalog.preferences.PreferencesMiddleware', # request.preferences: page size etc. in a signed cookie
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -58,22 +64,36 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'locallibrary.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'locallibrary.template_backends.TimedDjangoTemplates', # DjangoTemplates + render timings
         'DIRS': [os.path.join(BASE_DIR, 'templates')], # added in order to make the templates directory visible to the template loader
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'catalog.context_processors.navigation',
             ],
+            # Templates are compiled once per process and kept by the cached loader;
+            # with DEBUG they are read again on every render so edits show up.
+            'loaders': TEMPLATE_LOADERS if DEBUG else [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
         },
     },
 ]
 
+# How long the rendered sidebar is kept per role and page (see catalog.context_processors).
+NAVIGATION_CACHE_TIMEOUT = int(os.environ.get('NAVIGATION_CACHE_TIMEOUT', 300))
+
+# Share of requests profiled per template and tag (0 to 1, see locallibrary.template_profiling).
+TEMPLATE_PROFILING = float(os.environ.get('TEMPLATE_PROFILING', 0))
+
 WSGI_APPLICATION = 'locallibrary.wsgi.application'
 
 
@@ -88,6 +108,48 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Holds the catalog counters shown on the home page (see catalog.models.CatalogStats).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'locallibrary',
+    }
+}
+
+# Seconds anonymous catalog pages and template fragments stay cached. Signals
+# retire them as soon as the catalog changes, but only in the process that made
+# the change unless CACHES points at a shared cache (memcached, Redis).
+CATALOG_PAGE_CACHE_TIMEOUT = int(os.environ.get('CATALOG_PAGE_CACHE_TIMEOUT', 300))
+
+# Sessions are only written for signed-in users now (visitor preferences live in
+# a signed cookie, see catalog.preferences). With a cache shared by every worker,
+# 'django.contrib.sessions.backends.cached_db' also saves the session read per request;
+# with the per-process default cache it would let a worker miss a logout.
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+
+
+# Send per-request SQL/template/total timings in a Server-Timing response header.
+REQUEST_METRICS_SERVER_TIMING = os.environ.get('REQUEST_METRICS_SERVER_TIMING', '') != 'False'
+
+# Compression of generated responses (see locallibrary.compression): Brotli when
+# the Brotli package is installed, else gzip, for bodies of at least MIN_SIZE bytes.
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 512))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+
+# Pagination of the catalog list views: 'offset', 'cursor' (keyset) or 'estimated'
+# (planner row estimates instead of COUNT(*), PostgreSQL only).
+CATALOG_PAGINATION_MODE = os.environ.get('CATALOG_PAGINATION_MODE', 'offset')
+
+# Serve the read-only catalog pages from catalog.async_views. Only worth it
+# under ASGI (locallibrary/asgi.py turns it on); under WSGI each async view
+# would get an event loop of its own.
+CATALOG_ASYNC_VIEWS = os.environ.get('CATALOG_ASYNC_VIEWS', '') == 'True'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -132,11 +194,38 @@ LOGIN_REDIRECT_URL = '/'
 # Allow you to test sending email to the console
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Sender of the overdue reminders (manage.py send_overdue_reminders)
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'library@localhost')
+
 # Heroku: Update database configuration from $DATABASE_URL.
 import dj_database_url
-db_from_env = dj_database_url.config(conn_max_age=500)
+# Connections are kept open between requests for DATABASE_CONN_MAX_AGE seconds
+# (0: a new one per request) and health-checked before reuse (see
+# locallibrary.db_connections and /metrics/db/).
+DATABASE_CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', 500))
+db_from_env = dj_database_url.config(conn_max_age=DATABASE_CONN_MAX_AGE)
 DATABASES['default'].update(db_from_env)
 
+# Read replicas for the catalog's read-only pages (see locallibrary.routers), e.g.
+# DATABASE_REPLICA_URLS="postgres://replica-1/... postgres://replica-2/...".
+# Tests run the replicas against the test copy of the primary.
+DATABASE_REPLICAS = []
+for number, url in enumerate(os.environ.get('DATABASE_REPLICA_URLS', '').split(), start=1):
+    DATABASES[f'replica{number}'] = {**dj_database_url.parse(url, conn_max_age=DATABASE_CONN_MAX_AGE), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['locallibrary.routers.ReplicaRouter']
+# How long a client that wrote keeps reading from the primary (about the replicas' worst lag)
+DATABASE_REPLICA_PIN_SECONDS = int(os.environ.get('DATABASE_REPLICA_PIN_SECONDS', 10))
+
+DATABASE_HEALTH_CHECKS = os.environ.get('DATABASE_HEALTH_CHECKS', '') != 'False'
+# Seconds between health checks of a kept connection (0: before every request)
+DATABASE_HEALTH_CHECK_INTERVAL = float(os.environ.get('DATABASE_HEALTH_CHECK_INTERVAL', 0))
+# 'pgbouncer' when the DATABASE_URLs point at PgBouncer in transaction pooling mode
+DATABASE_POOLER = os.environ.get('DATABASE_POOLER', '')
+if DATABASE_POOLER == 'pgbouncer':
+    for database in DATABASES.values():
+        database['DISABLE_SERVER_SIDE_CURSORS'] = True
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
@@ -148,4 +237,11 @@ STATIC_URL = '/static/'
 
 # Simplified static file serving.
 # https://warehouse.python.org/project/whitenoise/
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
\ No newline at end of file
+STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# The bundles of catalog/assets.py are built here and collected from here.
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    'catalog.assets.BundleFinder',
+]
+ASSET_BUILD_DIR = os.environ.get('ASSET_BUILD_DIR', BASE_DIR / 'build' / 'static')
@@ -0,0 +1,28 @@
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from .middleware import current_timer
+
+class TimedTemplate(Template):
+    """Template that adds its render time to the current request's timer."""
+
+    def render(self, context=None, request=None):
+        timer = current_timer.get()
+        if timer is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timer.template_time += time.perf_counter() - start
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render times reported to RequestMetricsMiddleware."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
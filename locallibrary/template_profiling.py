@@ -0,0 +1,118 @@
+"""Where template render time goes, per template and per tag.
+
+With TEMPLATE_PROFILING set to a sample rate above 0, RequestMetricsMiddleware
+attaches a TemplateProfile to that share of requests, and install() wraps the
+render of every template node (tags and {{ variables }}). The profile records
+each node's self time: its render time less that of the nodes inside it. The
+time is charged to the template file the node is written in and to its tag
+('url', 'if', 'cache', 'variable', 'text', ...).
+
+The profiles are aggregated per view in `profiles`. Staff can read them at
+/metrics/templates/, and the profile_templates command collects them for
+every catalog page. Requests that aren't sampled pay one ContextVar lookup
+per node. With TEMPLATE_PROFILING at 0 (the default) nothing is wrapped at
+all.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.template.base import Node
+
+# The TemplateProfile of the request being profiled, if any.
+current_profile = ContextVar('current_template_profile', default=None)
+
+class TemplateProfile:
+    """Self time (seconds) of the nodes rendered for one request, by template and by tag."""
+
+    def __init__(self):
+        self.templates = defaultdict(float)
+        self.tags = defaultdict(float)
+        # time spent in the children of each node being rendered
+        self.stack = []
+
+    def render(self, node, render_annotated, context):
+        self.stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return render_annotated(node, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            own = elapsed - self.stack.pop()
+            if self.stack:
+                self.stack[-1] += elapsed
+            origin = getattr(node, 'origin', None)
+            self.templates[getattr(origin, 'template_name', None) or '<string>'] += own
+            self.tags[tag_name(node)] += own
+
+def tag_name(node):
+    token = getattr(node, 'token', None)
+    if token is None:
+        return type(node).__name__
+    if token.token_type.name == 'BLOCK':
+        return token.contents.split()[0]
+    return {'VAR': 'variable', 'TEXT': 'text'}.get(token.token_type.name, token.token_type.name.lower())
+
+_installed = False
+_install_lock = threading.Lock()
+
+def install():
+    """Wrap Node.render_annotated, once per process (on the first sampled request)."""
+    global _installed
+    if _installed:
+        return
+    with _install_lock:
+        if _installed:
+            return
+        render_annotated = Node.render_annotated
+
+        def profiled_render_annotated(self, context):
+            profile = current_profile.get()
+            if profile is None:
+                return render_annotated(self, context)
+            return profile.render(self, render_annotated, context)
+
+        Node.render_annotated = profiled_render_annotated
+        _installed = True
+
+class ProfileRegistry:
+    """Template and tag times summed per view over the profiled requests."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.templates = defaultdict(lambda: defaultdict(float))
+        self.tags = defaultdict(lambda: defaultdict(float))
+
+    def record(self, view_name, profile):
+        with self.lock:
+            self.requests[view_name] += 1
+            for name, seconds in profile.templates.items():
+                self.templates[view_name][name] += seconds
+            for name, seconds in profile.tags.items():
+                self.tags[view_name][name] += seconds
+
+    def snapshot(self):
+        """Mean milliseconds per profiled request, slowest first."""
+        def means(times, requests):
+            return {name: round(seconds * 1000 / requests, 3)
+                    for name, seconds in sorted(times.items(), key=lambda item: -item[1])}
+
+        with self.lock:
+            return {
+                view_name: {
+                    'requests': requests,
+                    'templates_ms': means(self.templates[view_name], requests),
+                    'tags_ms': means(self.tags[view_name], requests),
+                }
+                for view_name, requests in sorted(self.requests.items())
+            }
+
+    def reset(self):
+        with self.lock:
+            self.requests.clear()
+            self.templates.clear()
+            self.tags.clear()
+
+profiles = ProfileRegistry()
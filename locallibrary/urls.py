@@ -19,8 +19,13 @@ from django.urls import path
 # Use include() to add paths from the catalog application
 from django.conf.urls import include
 
+from . import views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', views.metrics, name='metrics'),
+    path('metrics/db/', views.db_metrics, name='db-metrics'),
+    path('metrics/templates/', views.template_metrics, name='template-metrics'),
 ]
 
 urlpatterns += [
@@ -0,0 +1,21 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from .db_connections import stats as connection_stats
+from .metrics import registry
+from .template_profiling import profiles
+
+@staff_member_required
+def metrics(request):
+    '''リクエストごとの計測値 (ビュー名別)'''
+    return JsonResponse(registry.snapshot())
+
+@staff_member_required
+def db_metrics(request):
+    '''このプロセスのデータベース接続 (エイリアス別)'''
+    return JsonResponse(connection_stats.snapshot())
+
+@staff_member_required
+def template_metrics(request):
+    '''テンプレート・タグ別の描画時間 (TEMPLATE_PROFILING でサンプリング)'''
+    return JsonResponse(profiles.snapshot())